@@ -0,0 +1,374 @@
+# KnowledgeBase/ingest.py
+"""
+Incremental knowledge-base ingestion: directory -> chunks -> embeddings ->
+Mongo (Atlas collection) or the local index format (see local_index.py).
+
+    python -m KnowledgeBase.ingest docs/ --target mongo
+    python -m KnowledgeBase.ingest docs/ --target local --out KnowledgeBase/local_index
+
+- Files whose size/mtime (or content hash) match the manifest are not read again.
+- Chunk ids are the sha256 of the chunk text, so chunks already in the target
+  are never re-embedded, whichever file they came from.
+- Embeddings run in batches with bounded concurrency; every group of batches
+  is written before the next one starts (bulk upserts / one index append).
+- Resumable: written chunks are found in the target on restart, and a file
+  enters the manifest only once all its chunks are written.
+- Mongo: documents from before content-hash ids (ObjectId _id) are re-keyed
+  by the hash of their text on the first run instead of being duplicated.
+  --prune deletes chunks that left a re-ingested file unless a current file
+  still contains them (the manifest keeps each file's chunk ids).
+- The local index is append-only; rebuild it into a fresh --out directory
+  to drop removed chunks.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from .local_index import CHUNKS_FILE, LocalIndexWriter
+from .vector_store import COLLECTION_NAME, DB_NAME, LOCAL_INDEX_PATH
+
+MANIFEST_FILE = "ingest_manifest.json"
+DEFAULT_PATTERNS = ("*.txt", "*.md")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# ---------- manifest ----------
+
+class Manifest:
+    """
+    relative path -> {size, mtime, sha256, chunks} of fully ingested files,
+    plus the chunk ids a re-ingest dropped ("stale") until a prune run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.files = json.load(f)
+
+    def unchanged(self, rel: str, full: str) -> bool:
+        entry = self.files.get(rel)
+        if not entry:
+            return False
+        st = os.stat(full)
+        if entry["size"] == st.st_size and entry["mtime"] == st.st_mtime:
+            return True
+        if entry["size"] == st.st_size and entry["sha256"] == file_hash(full):
+            entry["mtime"] = st.st_mtime  # touched, not changed
+            return True
+        return False
+
+    def chunks(self, rel: str) -> Optional[Set[str]]:
+        """Chunk ids of the file as last ingested; None for entries from before they were recorded."""
+        entry = self.files.get(rel)
+        return set(entry["chunks"]) if entry and "chunks" in entry else None
+
+    def mark(self, rel: str, full: str, chunks: Set[str]) -> None:
+        old = self.files.get(rel) or {}
+        stale = set(old.get("stale", []))
+        if "chunks" in old:
+            stale |= set(old["chunks"])
+        st = os.stat(full)
+        entry = {"size": st.st_size, "mtime": st.st_mtime, "sha256": file_hash(full), "chunks": sorted(chunks)}
+        if stale - chunks:
+            entry["stale"] = sorted(stale - chunks)
+        if (old and "chunks" not in old) or old.get("stale_source"):
+            entry["stale_source"] = True  # old chunk ids unknown: look them up by source when pruning
+        self.files[rel] = entry
+
+    def save(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.files, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+# ---------- sinks ----------
+
+class MongoSink:
+    """Bulk upserts keyed by content hash, in the layout Atlas vector search reads."""
+
+    def __init__(self, collection, text_key: str = "text", embedding_key: str = "embedding"):
+        self.collection = collection
+        self.text_key = text_key
+        self.embedding_key = embedding_key
+
+    def existing_hashes(self) -> Set[str]:
+        return {doc["_id"] for doc in self.collection.find({}, {"_id": 1}).batch_size(5000)}
+
+    def migrate_legacy(self, batch_size: int = 500) -> int:
+        """
+        One-off: documents written before content-hash ids (ObjectId _id, e.g.
+        by MongoDBAtlasVectorSearch.from_documents) get the hash of their text
+        as _id, so the first incremental run doesn't embed and store them again.
+        Copies of the same text collapse into one. Safe to interrupt and rerun.
+        """
+        from pymongo import UpdateOne
+
+        moved = 0
+        batch: List[tuple] = []
+
+        def rekey():
+            self.collection.bulk_write(
+                [UpdateOne({"_id": new_id}, {"$setOnInsert": doc}, upsert=True) for _, new_id, doc in batch],
+                ordered=False,
+            )
+            self.collection.delete_many({"_id": {"$in": [old_id for old_id, _, _ in batch]}})
+            return len(batch)
+
+        for doc in self.collection.find({"_id": {"$type": "objectId"}}).batch_size(batch_size):
+            text = doc.get(self.text_key)
+            if not text:
+                continue
+            batch.append((doc.pop("_id"), content_hash(text), doc))
+            if len(batch) >= batch_size:
+                moved += rekey()
+                batch = []
+        if batch:
+            moved += rekey()
+        return moved
+
+    def write(self, vectors: List[List[float]], chunks: List[Dict[str, Any]]) -> None:
+        from pymongo import UpdateOne
+
+        ops = [
+            UpdateOne(
+                {"_id": chunk["id"]},
+                {"$set": {self.text_key: chunk["text"], self.embedding_key: vector, **chunk["metadata"]}},
+                upsert=True,
+            )
+            for vector, chunk in zip(vectors, chunks)
+        ]
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
+
+    def ids_for_source(self, source: str) -> Set[str]:
+        return {doc["_id"] for doc in self.collection.find({"source": source}, {"_id": 1})}
+
+    def delete(self, ids: Set[str]) -> int:
+        result = self.collection.delete_many({"_id": {"$in": list(ids)}})
+        return result.deleted_count
+
+
+class LocalSink:
+    """
+    Appends to a local index directory; existing rows are never rewritten, so
+    there is no prune: rebuild into a fresh directory to drop removed chunks.
+    """
+
+    def __init__(self, path: str, embedding_model: str = "", source: str = ""):
+        self.writer = LocalIndexWriter(path, embedding_model=embedding_model, source=source)
+
+    def existing_hashes(self) -> Set[str]:
+        hashes = set()
+        chunks_path = os.path.join(self.writer.path, CHUNKS_FILE)
+        if os.path.exists(chunks_path):
+            with open(chunks_path, encoding="utf-8") as f:
+                for line in f:
+                    hashes.add(json.loads(line)["id"])
+        return hashes
+
+    def write(self, vectors: List[List[float]], chunks: List[Dict[str, Any]]) -> None:
+        self.writer.append(vectors, chunks)
+
+
+# ---------- pipeline ----------
+
+def iter_files(root: str, patterns=DEFAULT_PATTERNS) -> Iterator[str]:
+    import fnmatch
+
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if any(fnmatch.fnmatch(name, p) for p in patterns):
+                yield os.path.join(dirpath, name)
+
+
+class Ingestor:
+    def __init__(
+        self,
+        embedding,
+        sink,
+        manifest: Manifest,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 150,
+        batch_size: int = 64,
+        concurrency: int = 4,
+        prune: bool = False,
+    ):
+        self.embedding = embedding
+        self.sink = sink
+        self.manifest = manifest
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.prune = prune and hasattr(sink, "delete")
+        self.stats = {
+            "files": 0, "files_skipped": 0, "chunks": 0, "chunks_skipped": 0, "chunks_embedded": 0,
+            "migrated": 0, "pruned": 0,
+        }
+
+    def _split(self, full: str) -> List[str]:
+        with open(full, encoding="utf-8", errors="replace") as f:
+            return self.splitter.split_text(f.read())
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        sem = asyncio.Semaphore(self.concurrency)
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+        async def one(batch):
+            async with sem:
+                return await self.embedding.aembed_documents(batch)
+
+        results = await asyncio.gather(*(one(b) for b in batches))
+        return [vector for batch in results for vector in batch]
+
+    async def _flush(self, pending: List[Dict[str, Any]]) -> None:
+        if not pending:
+            return
+        vectors = await self._embed([chunk["text"] for chunk in pending])
+        await asyncio.to_thread(self.sink.write, vectors, pending)
+        self.stats["chunks_embedded"] += len(pending)
+
+    def _prune(self, present: Dict[str, str]) -> int:
+        """
+        Deletes chunks that left re-ingested files, except those a current
+        file still contains (chunks are shared by content hash).
+        """
+        live: Set[str] = set()
+        for rel, full in present.items():
+            chunks = self.manifest.chunks(rel)
+            if chunks is None:  # entry from before chunk ids were recorded
+                chunks = {content_hash(chunk) for chunk in self._split(full)}
+                self.manifest.files[rel]["chunks"] = sorted(chunks)
+            live |= chunks
+        pruned = 0
+        for rel, entry in self.manifest.files.items():
+            stale = set(entry.pop("stale", []))
+            if entry.pop("stale_source", False):
+                stale |= self.sink.ids_for_source(rel)
+            stale -= live
+            if stale:
+                pruned += self.sink.delete(stale)
+        self.manifest.save()
+        return pruned
+
+    async def run(self, root: str, patterns=DEFAULT_PATTERNS) -> Dict[str, int]:
+        if hasattr(self.sink, "migrate_legacy"):
+            self.stats["migrated"] = await asyncio.to_thread(self.sink.migrate_legacy)
+        seen = await asyncio.to_thread(self.sink.existing_hashes)
+        group = self.batch_size * self.concurrency
+        pending: List[Dict[str, Any]] = []
+        queued_files: List[tuple] = []  # (rel, full, chunk ids) fully in `pending`
+        present: Dict[str, str] = {}  # every file found, for the prune's live set
+
+        async def commit():
+            await self._flush(pending)
+            pending.clear()
+            for rel, full, ids in queued_files:
+                self.manifest.mark(rel, full, ids)
+            queued_files.clear()
+            self.manifest.save()
+
+        for full in iter_files(root, patterns):
+            rel = os.path.relpath(full, root).replace(os.sep, "/")
+            present[rel] = full
+            if self.manifest.unchanged(rel, full):
+                self.stats["files_skipped"] += 1
+                continue
+            self.stats["files"] += 1
+            ids = set()
+            for position, chunk in enumerate(self._split(full)):
+                chunk_id = content_hash(chunk)
+                ids.add(chunk_id)
+                self.stats["chunks"] += 1
+                if chunk_id in seen:
+                    self.stats["chunks_skipped"] += 1
+                    continue
+                seen.add(chunk_id)
+                pending.append({"id": chunk_id, "text": chunk, "metadata": {"source": rel, "chunk": position}})
+                if len(pending) >= group:
+                    await self._flush(pending)
+                    pending.clear()
+            queued_files.append((rel, full, ids))
+            if len(pending) >= group // 2:
+                await commit()
+        await commit()
+        if self.prune:
+            self.stats["pruned"] = await asyncio.to_thread(self._prune, present)
+        return self.stats
+
+
+def main():
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+    from langchain_openai import OpenAIEmbeddings
+    import key_param
+
+    ap = argparse.ArgumentParser(description="Ingest a directory of documents into the knowledge base.")
+    ap.add_argument("source", help="Directory to ingest")
+    ap.add_argument("--target", choices=["mongo", "local"], default="mongo")
+    ap.add_argument("--out", default=LOCAL_INDEX_PATH, help="Local index directory (--target local)")
+    ap.add_argument("--db", default=DB_NAME)
+    ap.add_argument("--collection", default=COLLECTION_NAME)
+    ap.add_argument("--pattern", action="append", help=f"File glob, repeatable (default: {' '.join(DEFAULT_PATTERNS)})")
+    ap.add_argument("--manifest", help="Manifest path (default: next to the target)")
+    ap.add_argument("--chunk-size", type=int, default=1000)
+    ap.add_argument("--chunk-overlap", type=int, default=150)
+    ap.add_argument("--batch-size", type=int, default=64, help="Texts per embedding request")
+    ap.add_argument("--concurrency", type=int, default=4, help="Embedding requests in flight")
+    ap.add_argument("--prune", action="store_true", help="Mongo only: delete chunks that left re-ingested files and no current file has")
+    args = ap.parse_args()
+
+    embedding = OpenAIEmbeddings(openai_api_key=key_param.openai_api_key)
+    client = None
+    if args.target == "mongo":
+        from pymongo import MongoClient
+
+        client = MongoClient(key_param.MONGO_URI)
+        sink = MongoSink(client[args.db][args.collection])
+        manifest_path = args.manifest or os.path.join(os.path.dirname(__file__), f"{MANIFEST_FILE[:-5]}.{args.db}.{args.collection}.json")
+    else:
+        sink = LocalSink(args.out, embedding_model=embedding.model, source=os.path.abspath(args.source))
+        manifest_path = args.manifest or os.path.join(args.out, MANIFEST_FILE)
+
+    ingestor = Ingestor(
+        embedding,
+        sink,
+        Manifest(manifest_path),
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        prune=args.prune,
+    )
+    start = time.perf_counter()
+    try:
+        stats = asyncio.run(ingestor.run(args.source, tuple(args.pattern or DEFAULT_PATTERNS)))
+    finally:
+        if client is not None:
+            client.close()
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
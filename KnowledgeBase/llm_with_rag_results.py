@@ -2,26 +2,21 @@ from pymongo import MongoClient
 from langchain_community.document_loaders import DirectoryLoader, TextLoader 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings 
-from langchain_mongodb import MongoDBAtlasVectorSearch
 import key_param
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from KnowledgeBase.vector_store import build_vectorstore, RETRIEVAL_BACKEND
 from openai import OpenAI
 
 
 client = MongoClient(key_param.MONGO_URI)
-DB_NAME = "Depression_Knowledge_Base"
-COLLECTION_NAME = "depression"
-collection = client[DB_NAME][COLLECTION_NAME]
-ATLAS_VECTOR_SEARCH_INDEX_NAME = "default1" 
 
 embedding = OpenAIEmbeddings(openai_api_key=key_param.openai_api_key)
 
-
-vectorstore = MongoDBAtlasVectorSearch(
-    collection=collection,
-    embedding=embedding,
-    index_name=ATLAS_VECTOR_SEARCH_INDEX_NAME 
-)
-print("Connected to existing MongoDB Atlas Vector Search.")
+# RETRIEVAL_BACKEND=local serves the exported memory-mapped index (see local_index.py)
+vectorstore = build_vectorstore(embedding, client)
+print(f"Connected to knowledge base ({RETRIEVAL_BACKEND}).")
 
 
 # --- Query to search ---
@@ -0,0 +1,226 @@
+# KnowledgeBase/local_index.py
+"""
+In-process vector index: a float32 matrix file memory-mapped at startup,
+served with one NumPy mat-vec per query. Drop-in for the Atlas vector store.
+
+Layout of an index directory:
+    index.json     {"dim", "count", "embedding_model", "source"}
+    vectors.f32    row-major float32, rows L2-normalised (dot == cosine)
+    chunks.jsonl   one {"id", "text", "metadata"} per row, same order
+
+Export the Atlas collection once:
+    python -m KnowledgeBase.local_index export --out KnowledgeBase/local_index
+"""
+import os
+import sys
+import json
+import argparse
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+META_FILE = "index.json"
+VECTORS_FILE = "vectors.f32"
+CHUNKS_FILE = "chunks.jsonl"
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LocalIndexWriter:
+    """Appends rows to an index directory (creating it if needed)."""
+
+    def __init__(self, path: str, dim: Optional[int] = None, embedding_model: str = "", source: str = ""):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"dim": dim, "count": 0, "embedding_model": embedding_model, "source": source}
+        self._truncate_to_count()
+
+    def _truncate_to_count(self) -> None:
+        # Drop rows from an append that crashed before index.json was updated
+        count, dim = self.meta["count"], self.meta["dim"]
+        vectors_path = os.path.join(self.path, VECTORS_FILE)
+        if os.path.exists(vectors_path) and dim:
+            with open(vectors_path, "r+b") as f:
+                f.truncate(count * dim * 4)
+        chunks_path = os.path.join(self.path, CHUNKS_FILE)
+        if os.path.exists(chunks_path):
+            with open(chunks_path, "rb") as f:
+                lines = f.readlines()
+            if len(lines) != count:
+                with open(chunks_path, "wb") as f:
+                    f.writelines(lines[:count])
+
+    def append(self, vectors: List[List[float]], chunks: List[Dict[str, Any]]) -> None:
+        if not vectors:
+            return
+        matrix = _normalize_rows(vectors)
+        if self.meta["dim"] is None:
+            self.meta["dim"] = int(matrix.shape[1])
+        if matrix.shape[1] != self.meta["dim"]:
+            raise ValueError(f"Embedding dim {matrix.shape[1]} does not match index dim {self.meta['dim']}")
+        with open(os.path.join(self.path, VECTORS_FILE), "ab") as f:
+            f.write(matrix.tobytes())
+        with open(os.path.join(self.path, CHUNKS_FILE), "a", encoding="utf-8") as f:
+            for chunk in chunks:
+                f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+        self.meta["count"] += len(chunks)
+        self.flush()
+
+    def flush(self) -> None:
+        # index.json is written last, so a crash mid-append never exposes partial rows
+        tmp = os.path.join(self.path, META_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp, os.path.join(self.path, META_FILE))
+
+
+class LocalVectorIndex(VectorStore):
+    """Read-only memory-mapped index; add_texts() appends and reloads."""
+
+    def __init__(self, path: str, embedding: Embeddings):
+        self.path = path
+        self._embedding = embedding
+        self.reload()
+
+    def reload(self) -> None:
+        with open(os.path.join(self.path, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        count, dim = self.meta["count"], self.meta["dim"]
+        if count:
+            self.vectors = np.memmap(os.path.join(self.path, VECTORS_FILE), dtype=np.float32, mode="r", shape=(count, dim))
+        else:
+            self.vectors = np.zeros((0, dim or 0), dtype=np.float32)
+        self.chunks: List[Dict[str, Any]] = []
+        if count:
+            with open(os.path.join(self.path, CHUNKS_FILE), encoding="utf-8") as f:
+                for line in f:
+                    if len(self.chunks) == count:
+                        break  # rows past `count` belong to an unfinished append
+                    self.chunks.append(json.loads(line))
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    # ---------- search ----------
+
+    def search_by_vector(self, vector: List[float], k: int = 4) -> List[Tuple[int, float]]:
+        if not len(self.chunks):
+            return []
+        q = np.asarray(vector, dtype=np.float32)
+        q /= np.linalg.norm(q) or 1.0
+        scores = self.vectors @ q
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def _docs(self, hits: List[Tuple[int, float]]) -> List[Tuple[Document, float]]:
+        out = []
+        for i, score in hits:
+            chunk = self.chunks[i]
+            out.append((Document(page_content=chunk["text"], metadata=chunk.get("metadata") or {}), score))
+        return out
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self._docs(self.search_by_vector(self._embedding.embed_query(query), k))
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        # Only the embedding is I/O; the dot product is microseconds for a KB this size
+        vector = await self._embedding.aembed_query(query)
+        return self._docs(self.search_by_vector(vector, k))
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self._docs(self.search_by_vector(embedding, k))]
+
+    async def asimilarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(embedding, k)
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    # ---------- writes ----------
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        start = self.meta["count"]
+        ids = kwargs.get("ids") or [str(start + i) for i in range(len(texts))]
+        vectors = self._embedding.embed_documents(texts)
+        LocalIndexWriter(self.path).append(
+            vectors,
+            [{"id": i, "text": t, "metadata": m} for i, t, m in zip(ids, texts, metadatas)],
+        )
+        self.reload()
+        return ids
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, path: str = "", **kwargs: Any) -> "LocalVectorIndex":
+        LocalIndexWriter(path, embedding_model=getattr(embedding, "model", "")).flush()
+        index = cls(path, embedding)
+        index.add_texts(texts, metadatas)
+        return index
+
+
+def export_from_mongo(collection, out: str, text_key: str = "text", embedding_key: str = "embedding", batch_size: int = 500) -> int:
+    """Stream an Atlas collection's stored chunks + embeddings into a fresh local index."""
+    for name in (META_FILE, VECTORS_FILE, CHUNKS_FILE):
+        if os.path.exists(os.path.join(out, name)):
+            os.remove(os.path.join(out, name))
+    writer = LocalIndexWriter(out, source=f"{collection.database.name}.{collection.name}")
+    vectors, chunks = [], []
+    for doc in collection.find({embedding_key: {"$exists": True}}).batch_size(batch_size):
+        vectors.append(doc.pop(embedding_key))
+        text = doc.pop(text_key, "")
+        doc_id = str(doc.pop("_id"))
+        chunks.append({"id": doc_id, "text": text, "metadata": json.loads(json.dumps(doc, default=str))})
+        if len(chunks) >= batch_size:
+            writer.append(vectors, chunks)
+            vectors, chunks = [], []
+    writer.append(vectors, chunks)
+    writer.flush()
+    return writer.meta["count"]
+
+
+def main():
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+    from pymongo import MongoClient
+    import key_param
+
+    ap = argparse.ArgumentParser(description="Local vector index tools.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    exp = sub.add_parser("export", help="Export the Atlas collection into a local index")
+    exp.add_argument("--out", default=os.path.join(os.path.dirname(__file__), "local_index"))
+    exp.add_argument("--db", default="Depression_Knowledge_Base")
+    exp.add_argument("--collection", default="depression")
+    args = ap.parse_args()
+
+    client = MongoClient(key_param.MONGO_URI)
+    try:
+        count = export_from_mongo(client[args.db][args.collection], args.out)
+    finally:
+        client.close()
+    print(f"Exported {count} chunks to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
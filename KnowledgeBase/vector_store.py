@@ -0,0 +1,34 @@
+# KnowledgeBase/vector_store.py
+import os
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+# "atlas" (MongoDB Atlas Vector Search) or "local" (memory-mapped index, see local_index.py)
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "atlas").lower()
+LOCAL_INDEX_PATH = os.getenv(
+    "LOCAL_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_index"),
+)
+
+DB_NAME = "Depression_Knowledge_Base"
+COLLECTION_NAME = "depression"
+ATLAS_VECTOR_SEARCH_INDEX_NAME = "default1"
+
+
+def build_vectorstore(embedding: Embeddings, mongo_client=None, backend: str = RETRIEVAL_BACKEND) -> VectorStore:
+    """Knowledge-base vector store for the configured backend."""
+    if backend == "local":
+        from .local_index import LocalVectorIndex
+
+        return LocalVectorIndex(LOCAL_INDEX_PATH, embedding)
+    if backend != "atlas":
+        raise ValueError(f"Unknown RETRIEVAL_BACKEND: {backend!r} (expected 'atlas' or 'local')")
+
+    from langchain_mongodb import MongoDBAtlasVectorSearch
+
+    return MongoDBAtlasVectorSearch(
+        collection=mongo_client[DB_NAME][COLLECTION_NAME],
+        embedding=embedding,
+        index_name=ATLAS_VECTOR_SEARCH_INDEX_NAME,
+    )
@@ -1,12 +1,16 @@
 # levelDetection/routes.py
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
-from typing import List, Literal
+import os
+from typing import List, Literal, Optional
 
-from ..service.levelDetection import detect_from_phq9_answers
+from utils.admission import Overloaded, prioritize
+from ..service.batcher import detect, detect_many
 
 router = APIRouter()
 
+DETECT_BATCH_MAX_ITEMS = int(os.getenv("DETECT_BATCH_MAX_ITEMS", "100"))
+
 PHQ9Level = Literal["Minimal", "Mild", "Moderate", "Moderately Severe", "Severe"]
 
 class DetectFromPHQ9Request(BaseModel):
@@ -18,8 +22,11 @@ class DetectFromPHQ9Response(BaseModel):
 
 @router.post("/detect", response_model=DetectFromPHQ9Response)
 async def detect_from_phq9(req: DetectFromPHQ9Request):
+    prioritize()  # screening results go ahead of chat turns
     try:
-        result = detect_from_phq9_answers(req.phq9Answers or [])
+        result = await detect(req.phq9Answers or [])
+    except Overloaded:
+        raise  # 429 (see main.py)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -27,3 +34,34 @@ async def detect_from_phq9(req: DetectFromPHQ9Request):
         phq9_score=result["phq9_score"],
         level=result["level"],
     )
+
+class DetectBatchRequest(BaseModel):
+    items: List[DetectFromPHQ9Request] = Field(default_factory=list, description="Many PHQ-9 answer sets")
+
+class DetectBatchItem(BaseModel):
+    index: int
+    phq9_score: Optional[int] = None
+    level: Optional[PHQ9Level] = None
+    error: Optional[str] = None
+
+class DetectBatchResponse(BaseModel):
+    results: List[DetectBatchItem]
+
+@router.post("/detect/batch", response_model=DetectBatchResponse)
+async def detect_batch(req: DetectBatchRequest):
+    if len(req.items) > DETECT_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {DETECT_BATCH_MAX_ITEMS} items per batch.")
+
+    prioritize()
+    outcomes = await detect_many([item.phq9Answers or [] for item in req.items])
+    overloaded = next((o for o in outcomes if isinstance(o, Overloaded)), None)
+    if overloaded is not None:
+        raise overloaded  # 429 for the whole batch (see main.py); retried items hit the result cache
+    # One bad item must not fail the others: other errors are reported per item
+    results = []
+    for i, outcome in enumerate(outcomes):
+        if isinstance(outcome, BaseException):
+            results.append(DetectBatchItem(index=i, error=str(outcome)))
+        else:
+            results.append(DetectBatchItem(index=i, phq9_score=outcome["phq9_score"], level=outcome["level"]))
+    return DetectBatchResponse(results=results)
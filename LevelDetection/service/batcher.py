@@ -0,0 +1,163 @@
+# levelDetection/service/batcher.py
+import os
+import time
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from utils.admission import AdmissionQueue
+from utils.metrics import counter
+from utils.timing import record
+from .levelDetection import adetect_from_phq9_answers
+from .result_cache import cached_detect
+
+# Micro-batching knobs (override via env)
+BATCH_WINDOW_MS = float(os.getenv("DETECT_BATCH_WINDOW_MS", "20"))
+BATCH_MAX_SIZE = int(os.getenv("DETECT_BATCH_MAX_SIZE", "16"))
+BATCH_PARALLELISM = int(os.getenv("DETECT_BATCH_PARALLELISM", "8"))
+# Generations waiting for one of the BATCH_PARALLELISM slots, and for how long; past
+# either bound callers get Overloaded (429). The queue holds a full /detect/batch.
+BATCH_MAX_QUEUE = int(os.getenv("ADMIT_DETECT_QUEUE", "128"))
+BATCH_MAX_WAIT = float(os.getenv("ADMIT_DETECT_WAIT", "30"))
+
+BATCHES = counter("detect_batches_total", "Micro-batches dispatched to the level detector")
+BATCH_ITEMS = counter("detect_batch_items_total", "Items dispatched in micro-batches (dedup=unique generations)")
+
+Handler = Callable[[List[str]], Awaitable[Dict[str, Any]]]
+ItemResult = Union[Dict[str, Any], BaseException]
+# answers, caller's future, caller's context (timings land on its request), queued at
+Pending = Tuple[List[str], asyncio.Future, contextvars.Context, float]
+
+
+class MicroBatcher:
+    """
+    Groups concurrent detect requests that arrive within `window_ms` (up to
+    `max_size`), drops duplicates inside a group and runs the unique ones
+    with at most `parallelism` generations in flight across all groups.
+    Generations beyond that wait in a bounded admission queue; when it is
+    full or the wait runs out, their callers get Overloaded.
+    """
+
+    def __init__(
+        self,
+        handler: Handler = adetect_from_phq9_answers,
+        window_ms: float = BATCH_WINDOW_MS,
+        max_size: int = BATCH_MAX_SIZE,
+        parallelism: int = BATCH_PARALLELISM,
+        max_queue: int = BATCH_MAX_QUEUE,
+        max_wait: float = BATCH_MAX_WAIT,
+    ):
+        self.handler = handler
+        self.window = window_ms / 1000.0
+        self.max_size = max_size
+        self._admission = AdmissionQueue("detect", max_concurrency=parallelism, max_queue=max_queue, max_wait=max_wait)
+        self._queue: "asyncio.Queue[Pending]" = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+
+    def _ensure_started(self) -> None:
+        if self._worker is None or self._worker.done():
+            # Fresh context: the worker outlives the request that happened to start it
+            self._worker = asyncio.create_task(self._run(), context=contextvars.Context())
+
+    async def submit(self, answers: List[str]) -> Dict[str, Any]:
+        """Queue one answer set; raises Overloaded, or whatever the detector raised for it."""
+        self._ensure_started()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((answers, fut, contextvars.copy_context(), time.perf_counter()))
+        return await fut
+
+    async def submit_many(self, items: List[List[str]]) -> List[ItemResult]:
+        """Queue many answer sets; returns a result or the exception per item."""
+        return await asyncio.gather(*(self.submit(a) for a in items), return_exceptions=True)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Dispatch in the background so the next window starts filling now
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: List[Pending]) -> None:
+        groups: Dict[Tuple[str, ...], List[Pending]] = {}
+        for item in batch:
+            groups.setdefault(tuple(item[0]), []).append(item)
+        BATCHES.inc()
+        BATCH_ITEMS.inc(len(batch), dedup="all")
+        BATCH_ITEMS.inc(len(groups), dedup="unique")
+        # Each generation runs in its first caller's context so its stage timings reach that request
+        await asyncio.gather(
+            *(
+                asyncio.create_task(self._one(list(key), [item[1] for item in items], items[0][3]), context=items[0][2])
+                for key, items in groups.items()
+            )
+        )
+
+    async def _one(self, answers: List[str], futs: List[asyncio.Future], queued_at: float) -> None:
+        if all(f.done() for f in futs):  # every caller went away
+            return
+        try:
+            async with self._admission.slot():
+                record("detect_queue", time.perf_counter() - queued_at)
+                result = await self.handler(answers)
+        except BaseException as e:
+            err = e if isinstance(e, Exception) else RuntimeError("Level detection was cancelled.")
+            for f in futs:
+                if not f.done():
+                    f.set_exception(err)
+            if err is not e:
+                raise
+            return
+        for f in futs:
+            if not f.done():
+                f.set_result(result)
+
+    async def aclose(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        while not self._queue.empty():
+            _, fut, _, _ = self._queue.get_nowait()
+            if not fut.done():
+                fut.set_exception(RuntimeError("Level detector is shutting down."))
+
+
+_batcher: Optional[MicroBatcher] = None
+
+
+async def detect(answers: List[str]) -> Dict[str, Any]:
+    """Cached, coalesced detection routed through the process-wide batcher."""
+    return await cached_detect(answers, lambda: get_batcher().submit(answers))
+
+
+async def detect_many(items: List[List[str]]) -> List[ItemResult]:
+    """detect() per item; returns a result or the exception per item."""
+    return await asyncio.gather(*(detect(a) for a in items), return_exceptions=True)
+
+
+def get_batcher() -> MicroBatcher:
+    """Process-wide batcher, created on first use inside the running loop."""
+    global _batcher
+    if _batcher is None:
+        _batcher = MicroBatcher()
+    return _batcher
+
+
+async def aclose_batcher() -> None:
+    global _batcher
+    if _batcher is not None:
+        await _batcher.aclose()
+        _batcher = None
@@ -1,7 +1,49 @@
 # levelDetection/service/levelDetection.py
+import os
 import re
-from typing import Dict, Any, List
-from .ollama_client import generate_json, mistral_generate
+import asyncio
+import contextvars
+from typing import Dict, Any, List, Optional
+from .ollama_client import (
+    WARMUP_TIMEOUT,
+    _json_payload,
+    _text_payload,
+    _validator,
+    generate_json,
+    get_async_client,
+    mistral_generate,
+    agenerate_json,
+    amistral_generate,
+    agenerate_json_stream,
+    amistral_generate_stream,
+)
+from .local_scorer import get_local_scorer, try_local
+from utils.admission import Overloaded
+from utils.metrics import counter
+from utils.timing import stage
+
+# Bump whenever the prompts below change (part of the result-cache key)
+PROMPT_VERSION = "v1"
+
+# Opt-in: send the JSON and text prompts together and keep the first valid answer
+DETECT_RACE = os.getenv("DETECT_RACE", "0").lower() in ("1", "true", "yes")
+
+# Stream generations and close upstream as soon as the answer is parseable
+DETECT_STREAM = os.getenv("DETECT_STREAM", "1").lower() in ("1", "true", "yes")
+
+# Which generation path produced the answer (mode=sequential|race, path=json|text|failed)
+DETECT_PATH = counter("detect_path_total", "Generation path that produced the /detect answer")
+
+# Local fast path in front of the LLM (result=absorbed|fallthrough)
+DETECT_FASTPATH = counter("detect_fastpath_total", "Requests answered by the local PHQ-9 scorer")
+
+# Path of the last detection in the current task (local|json|text|failed), for per-request evaluation
+LAST_DETECT_PATH: contextvars.ContextVar = contextvars.ContextVar("last_detect_path", default=None)
+
+
+def _record_path(mode: str, path: str) -> None:
+    DETECT_PATH.inc(mode=mode, path=path)
+    LAST_DETECT_PATH.set(path)
 
 # Minimal schema: ONLY what you want back
 _MIN_SCHEMA = {
@@ -22,7 +64,7 @@ _MIN_SCHEMA = {
 # Depression Level: Severe
 _SCORE_RE = re.compile(r"PHQ-9\s*Score\s*:\s*(\d{1,2})", re.IGNORECASE)
 _LEVEL_RE = re.compile(
-    r"Depression\s*Level\s*:\s*(Minimal|Mild|Moderate|Moderately\s+Severe|Severe)",
+    r"Depression\s*Level\s*:\s*(Minimal|Mild|Moderately\s+Severe|Moderate|Severe)",
     re.IGNORECASE,
 )
 
@@ -30,7 +72,7 @@ def _parse_text_fallback(text: str) -> Dict[str, Any]:
     score = None
     level = None
 
-    m1 = __SCORE_RE.search(text or "")
+    m1 = _SCORE_RE.search(text or "")
     if m1:
         try:
             score = int(m1.group(1))
@@ -39,41 +81,180 @@ def _parse_text_fallback(text: str) -> Dict[str, Any]:
 
     m2 = _LEVEL_RE.search(text or "")
     if m2:
-        level = m2.group(1).title().replace("Severe", "Severe")\
+        level = " ".join(m2.group(1).split()).title().replace("Severe", "Severe")\
                  .replace("Moderately severe", "Moderately Severe")
 
     if score is None or level is None:
         raise ValueError("Could not parse score/level from text fallback.")
     return {"phq9_score": score, "level": level}
 
-def detect_from_phq9_answers(phq9_answers: List[str]) -> Dict[str, Any]:
+def _parse_text_incremental(text: str) -> Optional[Dict[str, Any]]:
     """
-    Send free-text PHQ-9 answers to the fine-tuned model.
-    Expect ONLY total_score and level. If JSON fails, parse text fallback.
+    Parse a partial stream; only returns once both fields are final, i.e.
+    followed by another character ("2" may still become "26",
+    "Moderate" may still become "Moderately Severe").
     """
+    m1 = _SCORE_RE.search(text)
+    if not m1 or m1.end() >= len(text) or text[m1.end()].isdigit():
+        return None
+    m2 = _LEVEL_RE.search(text)
+    if not m2 or m2.end() >= len(text) or text[m2.end()].isalpha():
+        return None
+    return _parse_text_fallback(text)
+
+def _numbered(phq9_answers: List[str]) -> str:
     # Numbered list helps the model keep order
-    numbered = "\n".join(f"{i+1}. {a}" for i, a in enumerate(phq9_answers or []))
+    return "\n".join(f"{i+1}. {a}" for i, a in enumerate(phq9_answers or []))
 
-    # Primary: strict JSON
-    user_prompt = f"""
+# Static prompt heads: byte-identical on every request so Ollama can reuse the
+# already evaluated prefix (KV cache); the answers come right after them.
+_JSON_PROMPT_HEAD = """
 Analyze the following PHQ-9 responses and output ONLY JSON with:
 - "total_score": integer 0..27
 - "level": one of ["Minimal","Mild","Moderate","Moderately Severe","Severe"]
 
 PHQ-9 responses (in order):
-{numbered}
 """
-    try:
-        data = generate_json(user_prompt, schema=_MIN_SCHEMA)
-        return {"phq9_score": data["total_score"], "level": data["level"]}
-    except Exception:
-        txt_prompt = f"""
+
+_TEXT_PROMPT_HEAD = """
 [INST] Analyze the following PHQ-9 responses and provide the score and depression level.
 
-{numbered} [/INST]
+"""
+
+# The layout the model was fine-tuned on puts the format lines after [/INST],
+# so they stay behind the answers even though that part is evaluated every time
+_TEXT_PROMPT_TAIL = """ [/INST]
 Respond EXACTLY in this format (no extra words):
 PHQ-9 Score: <number>
 Depression Level: <Minimal|Mild|Moderate|Moderately Severe|Severe>
 """
-        text = mistral_generate(txt_prompt, temperature=0.0, num_predict=120)
+
+def _json_prompt(numbered: str) -> str:
+    return f"{_JSON_PROMPT_HEAD}{numbered}\n"
+
+def _text_prompt(numbered: str) -> str:
+    return f"{_TEXT_PROMPT_HEAD}{numbered}{_TEXT_PROMPT_TAIL}"
+
+def _fast_path(numbered: str) -> Optional[Dict[str, Any]]:
+    if get_local_scorer() is None:
+        return None
+    with stage("local_scorer"):
+        result = try_local(numbered)
+    DETECT_FASTPATH.inc(result="absorbed" if result else "fallthrough")
+    if result:
+        LAST_DETECT_PATH.set("local")
+    return result
+
+def preload() -> None:
+    """Loads the local scorer and the schema validator ahead of the first request (APP_WARMUP)."""
+    get_local_scorer()
+    _validator(_MIN_SCHEMA)
+
+async def awarmup(timeout: float = WARMUP_TIMEOUT) -> None:
+    """
+    Loads the model on every Ollama host and evaluates the static prompt heads,
+    so the first /detect pays neither model load nor full prompt evaluation (APP_WARMUP).
+    Failures are reported, not raised: a cold host still serves, just slower.
+    """
+    client = get_async_client()
+    bases = [e.base for e in client.pool.endpoints]
+    # Text first, JSON last: with one slot per host the primary (JSON) head stays cached
+    payloads = [_text_payload(_TEXT_PROMPT_HEAD, 0.0, 1), _json_payload(_JSON_PROMPT_HEAD, _MIN_SCHEMA, 1)]
+    try:
+        for payload in payloads:
+            outcomes = await asyncio.wait_for(client.broadcast(payload), timeout)
+            for base, outcome in zip(bases, outcomes):
+                if isinstance(outcome, BaseException):
+                    print(f"Ollama warmup failed on {base}: {outcome!r}")
+    except asyncio.TimeoutError:
+        print(f"Ollama warmup did not finish within {timeout:.0f}s; continuing")
+
+def detect_from_phq9_answers(phq9_answers: List[str]) -> Dict[str, Any]:
+    """
+    Send free-text PHQ-9 answers to the fine-tuned model.
+    Expect ONLY total_score and level. If JSON fails, parse text fallback.
+    A confident local scorer (see local_scorer.py) answers first when available.
+    """
+    numbered = _numbered(phq9_answers)
+    local = _fast_path(numbered)
+    if local:
+        return local
+
+    # Primary: strict JSON
+    try:
+        data = generate_json(_json_prompt(numbered), schema=_MIN_SCHEMA)
+        return {"phq9_score": data["total_score"], "level": data["level"]}
+    except Exception:
+        text = mistral_generate(_text_prompt(numbered), temperature=0.0, num_predict=120)
+        return _parse_text_fallback(text)
+
+async def _json_path(numbered: str) -> Dict[str, Any]:
+    if DETECT_STREAM:
+        data = await agenerate_json_stream(_json_prompt(numbered), schema=_MIN_SCHEMA)
+    else:
+        data = await agenerate_json(_json_prompt(numbered), schema=_MIN_SCHEMA)
+    return {"phq9_score": data["total_score"], "level": data["level"]}
+
+async def _text_path(numbered: str) -> Dict[str, Any]:
+    if DETECT_STREAM:
+        text = await amistral_generate_stream(
+            _text_prompt(numbered),
+            is_done=lambda t: _parse_text_incremental(t) is not None,
+            temperature=0.0,
+            num_predict=120,
+        )
+    else:
+        text = await amistral_generate(_text_prompt(numbered), temperature=0.0, num_predict=120)
+    with stage("text_parse"):
         return _parse_text_fallback(text)
+
+async def _race(numbered: str) -> Dict[str, Any]:
+    """Run both paths at once; first valid answer wins, the loser is cancelled."""
+    paths = {
+        asyncio.create_task(_json_path(numbered)): "json",
+        asyncio.create_task(_text_path(numbered)): "text",
+    }
+    pending = set(paths)
+    last_error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # If both land together prefer JSON (schema-validated)
+            for task in sorted(done, key=lambda t: paths[t] != "json"):
+                if task.exception() is None:
+                    _record_path("race", paths[task])
+                    return task.result()
+                last_error = task.exception()
+        _record_path("race", "failed")
+        raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def adetect_from_phq9_answers(phq9_answers: List[str], race: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Awaitable detect_from_phq9_answers; shares the pooled async Ollama client.
+    race=None follows DETECT_RACE.
+    """
+    numbered = _numbered(phq9_answers)
+    local = _fast_path(numbered)
+    if local:
+        return local
+
+    if DETECT_RACE if race is None else race:
+        return await _race(numbered)
+
+    try:
+        result = await _json_path(numbered)
+        _record_path("sequential", "json")
+        return result
+    except Overloaded:
+        raise  # the text path would queue behind the same limit
+    except Exception:
+        try:
+            result = await _text_path(numbered)
+        except Exception:
+            _record_path("sequential", "failed")
+            raise
+        _record_path("sequential", "text")
+        return result
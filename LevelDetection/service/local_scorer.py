@@ -0,0 +1,70 @@
+# levelDetection/service/local_scorer.py
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.phq9_questions import PHQ9_LEVELS
+
+# Artifact built by ModelFinetune/train_local_scorer.py (override via env)
+_DEFAULT_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "ModelFinetune", "Output_dir", "local_scorer.joblib")
+)
+LOCAL_SCORER_PATH = os.getenv("LOCAL_SCORER_PATH", _DEFAULT_PATH)
+LOCAL_SCORER_THRESHOLD = float(os.getenv("LOCAL_SCORER_THRESHOLD", "0.85"))
+# Opt-in: the training data is synthetic and templated (see local_scorer_report.json),
+# so nothing yet shows the scorer generalises to real answers
+LOCAL_SCORER = os.getenv("LOCAL_SCORER", "0").lower() in ("1", "true", "yes")
+
+
+class LocalScorer:
+    """TF-IDF + linear models: level with a confidence, score clipped to the level's band."""
+
+    def __init__(self, artifact: Dict[str, Any]):
+        self.vectorizer = artifact["vectorizer"]
+        self.level_clf = artifact["level_clf"]
+        self.score_reg = artifact["score_reg"]
+        self.bands = {level: (low, high) for low, high, level in PHQ9_LEVELS}
+
+    @classmethod
+    def load(cls, path: str) -> "LocalScorer":
+        import joblib  # only needed when the fast path is enabled
+
+        return cls(joblib.load(path))
+
+    def predict(self, text: str) -> Tuple[Dict[str, Any], float]:
+        X = self.vectorizer.transform([text])
+        proba = self.level_clf.predict_proba(X)[0]
+        best = int(proba.argmax())
+        level = str(self.level_clf.classes_[best])
+        low, high = self.bands[level]
+        score = int(min(max(round(float(self.score_reg.predict(X)[0])), low), high))
+        return {"phq9_score": score, "level": level}, float(proba[best])
+
+
+_scorer: Optional[LocalScorer] = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def get_local_scorer() -> Optional[LocalScorer]:
+    """Loaded once; None when disabled or the artifact has not been built."""
+    global _scorer, _loaded
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                if LOCAL_SCORER and os.path.exists(LOCAL_SCORER_PATH):
+                    try:
+                        _scorer = LocalScorer.load(LOCAL_SCORER_PATH)
+                    except Exception as e:
+                        print(f"Local PHQ-9 scorer disabled, could not load {LOCAL_SCORER_PATH}: {e}")
+                _loaded = True
+    return _scorer
+
+
+def try_local(numbered: str, threshold: float = LOCAL_SCORER_THRESHOLD) -> Optional[Dict[str, Any]]:
+    """Fast-path answer when the local model is confident enough, else None."""
+    scorer = get_local_scorer()
+    if scorer is None:
+        return None
+    result, confidence = scorer.predict(numbered)
+    return result if confidence >= threshold else None
@@ -1,48 +1,188 @@
 # levelDetection/service/ollama_client.py
 import os
 import json
-import requests
-from jsonschema import validate  # pip install jsonschema
+import random
+import asyncio
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
 
-# Ngrok → Ollama host (override via env)
-BASE = os.getenv("OLLAMA_BASE", "https://55713976f485.ngrok-free.app").rstrip("/")
+import httpx
+
+from utils.admission import OLLAMA_ADMISSION
+from utils.metrics import counter, histogram
+from utils.timing import UPSTREAM_ERRORS, stage
+from .ollama_pool import Endpoint, OllamaPool
+
+# Ngrok → Ollama host(s), comma-separated in OLLAMA_BASES (override via env)
+BASES = [
+    b.strip().rstrip("/")
+    for b in os.getenv("OLLAMA_BASES", os.getenv("OLLAMA_BASE", "https://55713976f485.ngrok-free.app")).split(",")
+    if b.strip()
+]
+# The sync helpers (scripts / notebooks) talk to the first host only
+BASE = BASES[0]
 
 LEVEL_MODEL = os.getenv("LEVEL_MODEL", "mistral-LevelDetector")
-AUTH = None 
+AUTH = None
 
 STOPS = ["</s>", "[INST]", "User:", "\nUser"]
 
+# Async client tuning (override via env)
+CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "120"))
+MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "64"))
+MAX_KEEPALIVE = int(os.getenv("OLLAMA_MAX_KEEPALIVE", "16"))
+PER_HOST_CONCURRENCY = int(os.getenv("OLLAMA_PER_HOST_CONCURRENCY", "8"))
+MAX_RETRIES = int(os.getenv("OLLAMA_MAX_RETRIES", "2"))
+RETRY_BACKOFF = float(os.getenv("OLLAMA_RETRY_BACKOFF", "0.5"))
+# Upper bound for the startup warmup requests (APP_WARMUP)
+WARMUP_TIMEOUT = float(os.getenv("OLLAMA_WARMUP_TIMEOUT", "120"))
+
+
+def _parse_keep_alive(value: str):
+    # Ollama takes a duration ("30m") or seconds; a negative number keeps the model loaded
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+# How long Ollama keeps the model (and its prompt cache) loaded after a request;
+# its own default is 5 minutes, after which the next request pays the model load.
+KEEP_ALIVE = _parse_keep_alive(os.getenv("OLLAMA_KEEP_ALIVE", "30m"))
+
+# Worth retrying: the request either never reached the model or the proxy hiccuped.
+_RETRY_STATUS = {500, 502, 503, 504}
+_RETRY_EXC = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.ReadError,
+    httpx.RemoteProtocolError,
+)
+
+# Streams we closed before the model finished (GPU slot freed early)
+STREAM_EARLY_STOP = counter("ollama_stream_early_stop_total", "Streaming generations closed once the answer was parsed")
+
+# Timings Ollama reports with finished generations (early-stopped streams report none)
+LOAD_SECONDS = histogram("ollama_load_seconds", "Model load time reported by Ollama")
+PROMPT_EVAL_SECONDS = histogram("ollama_prompt_eval_seconds", "Prompt evaluation time reported by Ollama")
+PROMPT_EVAL_TOKENS = histogram(
+    "ollama_prompt_eval_tokens",
+    "Prompt tokens Ollama evaluated; a reused (cached) prefix is not counted",
+    buckets=(8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096),
+)
+
+
+def _record_timings(data: dict) -> None:
+    # Durations are in nanoseconds
+    if "load_duration" in data:
+        LOAD_SECONDS.observe(data["load_duration"] / 1e9)
+    if "prompt_eval_duration" in data:
+        PROMPT_EVAL_SECONDS.observe(data["prompt_eval_duration"] / 1e9)
+    if "prompt_eval_count" in data:
+        PROMPT_EVAL_TOKENS.observe(data["prompt_eval_count"])
+
+
+# ---------- payloads ----------
+
+def _text_payload(prompt: str, temperature: float, num_predict: int) -> dict:
+    return {
+        "model": LEVEL_MODEL,
+        "prompt": prompt,
+        "stream": False,
+        "keep_alive": KEEP_ALIVE,
+        "options": {
+            "num_ctx": 4096,
+            "num_predict": num_predict,
+            "temperature": temperature,
+            "top_p": 0.9,
+            "repeat_penalty": 1.2,
+            "stop": STOPS,
+        },
+    }
+
+
+def _json_payload(user_prompt: str, schema: dict, num_predict: int) -> dict:
+    # Static instructions first, the caller's prompt last (see levelDetection's prompt heads)
+    instruct = (
+        "Return strictly valid JSON only. No explanations.\n"
+        f"Match this schema as closely as possible:\n{json.dumps(schema)}\n\n"
+        f"{user_prompt}\n"
+    )
+    return {
+        "model": LEVEL_MODEL,
+        "prompt": instruct,
+        "stream": False,
+        "keep_alive": KEEP_ALIVE,
+        "format": "json",
+        "options": {
+            "num_ctx": 4096,
+            "num_predict": num_predict,
+            "temperature": 0.2,
+            "top_p": 0.9,
+            "repeat_penalty": 1.1,
+            "stop": STOPS,
+        },
+    }
+
+
+_validators: Dict[str, Any] = {}
+
+
+def _validator(schema: dict):
+    """Checked once per schema; jsonschema.validate() re-checks the schema on every call."""
+    key = json.dumps(schema, sort_keys=True)
+    validator = _validators.get(key)
+    if validator is None:
+        from jsonschema.validators import validator_for  # pip install jsonschema; ~50 ms import, paid on first use
+
+        cls = validator_for(schema)
+        cls.check_schema(schema)
+        validator = _validators[key] = cls(schema)
+    return validator
+
+
+def _parse_json_response(data: dict, schema: dict) -> dict:
+    with stage("json_validate"):
+        obj = json.loads(data.get("response") or "{}")
+        _validator(schema).validate(obj)
+    return obj
+
+
+# ---------- sync (scripts / notebooks) ----------
+
+_session = None
+
+
+def _get_session():
+    # requests is only needed by scripts; the app uses the async client
+    global _session
+    if _session is None:
+        import requests
+
+        _session = requests.Session()
+    return _session
+
 
 def _post_generate(payload: dict, timeout: int = 120) -> dict:
     """Low-level wrapper for /api/generate with basic error surfacing."""
-    r = requests.post(
+    r = _get_session().post(
         f"{BASE}/api/generate",
         auth=AUTH,
         headers={"Content-Type": "application/json"},
         json=payload,
-        timeout=timeout,
+        timeout=(CONNECT_TIMEOUT, timeout),
     )
     r.raise_for_status()
-    return r.json()
+    data = r.json()
+    _record_timings(data)
+    return data
 
 
 def mistral_generate(prompt: str, temperature: float = 0.3, num_predict: int = 120) -> str:
     """Plain text generation (no JSON)."""
-    data = _post_generate(
-        {
-            "model": "mistral-LevelDetector",         
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "num_ctx": 4096,
-                "num_predict": num_predict,
-                "temperature": temperature,
-                "top_p": 0.9,
-                "repeat_penalty": 1.2,
-                "stop": STOPS,
-            },
-        }
-    )
+    data = _post_generate(_text_payload(prompt, temperature, num_predict))
     return (data.get("response") or "").strip()
 
 
@@ -51,29 +191,244 @@ def generate_json(user_prompt: str, schema: dict, num_predict: int = 200) -> dic
     Ask the model to return STRICT JSON validated against `schema`.
     Mirrors your working pattern (format='json' + jsonschema.validate).
     """
-    instruct = (
-        "Return strictly valid JSON only. No explanations.\n"
-        f"Match this schema as closely as possible:\n{json.dumps(schema)}\n\n"
-        f"{user_prompt}\n"
-    )
+    data = _post_generate(_json_payload(user_prompt, schema, num_predict))
+    return _parse_json_response(data, schema)
 
-    data = _post_generate(
-        {
-            "model": "mistral-LevelDetector",         
-            "prompt": instruct,
-            "stream": False,
-            "format": "json",
-            "options": {
-                "num_ctx": 4096,
-                "num_predict": num_predict,
-                "temperature": 0.2,
-                "top_p": 0.9,
-                "repeat_penalty": 1.1,
-                "stop": STOPS,
-            },
-        }
-    )
 
-    obj = json.loads(data.get("response") or "{}")
-    validate(instance=obj, schema=schema)
-    return obj
+# ---------- async (FastAPI routes) ----------
+
+class AsyncOllamaClient:
+    """
+    Keep-alive pooled client for /api/generate over one or more Ollama hosts.
+    Each generation first needs an admission slot (utils/admission.py);
+    each attempt goes to the least loaded healthy host (see ollama_pool.py);
+    concurrency is capped per host; transient failures are retried with
+    jitter, on another host when there is one.
+    """
+
+    def __init__(
+        self,
+        bases: Optional[List[str]] = None,
+        per_host_concurrency: int = PER_HOST_CONCURRENCY,
+        max_retries: int = MAX_RETRIES,
+        retry_backoff: float = RETRY_BACKOFF,
+    ):
+        self.pool = OllamaPool(bases or BASES)
+        self.per_host_concurrency = per_host_concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._client = httpx.AsyncClient(
+            auth=AUTH,
+            headers={"Content-Type": "application/json"},
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        )
+
+    def _limit_for(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        sem = self._host_limits.get(host)
+        if sem is None:
+            sem = self._host_limits[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return sem
+
+    async def _backoff(self, attempt: int) -> None:
+        # Full jitter: spreads retries from many in-flight requests apart.
+        await asyncio.sleep(random.uniform(0, self.retry_backoff * (2 ** attempt)))
+
+    async def _next_endpoint(self, tried: List[str], attempt: int) -> Endpoint:
+        self.pool.start(self._client)
+        endpoint = self.pool.pick(exclude=tried)
+        if endpoint.base in tried:
+            await self._backoff(attempt - 1)  # no other host left to fail over to
+        tried.append(endpoint.base)
+        return endpoint
+
+    def _count_status(self, endpoint: Endpoint, status: int) -> None:
+        self.pool.report(endpoint, ok=status < 500)
+        if status >= 400:
+            UPSTREAM_ERRORS.inc(upstream="ollama", kind=f"http_{status}")
+
+    def _count_error(self, endpoint: Endpoint, error: Exception) -> None:
+        self.pool.report(endpoint, ok=False)
+        UPSTREAM_ERRORS.inc(upstream="ollama", kind=type(error).__name__)
+
+    async def post_generate(self, payload: dict) -> dict:
+        async with OLLAMA_ADMISSION.slot():
+            return await self._post_generate(payload)
+
+    async def _post_generate(self, payload: dict) -> dict:
+        attempt, tried = 0, []
+        while True:
+            endpoint = await self._next_endpoint(tried, attempt)
+            url = f"{endpoint.base}/api/generate"
+            try:
+                with self.pool.lease(endpoint):
+                    async with self._limit_for(url):
+                        r = await self._client.post(url, json=payload)
+            except httpx.TransportError as e:
+                self._count_error(endpoint, e)
+                if not isinstance(e, _RETRY_EXC) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                continue
+            self._count_status(endpoint, r.status_code)
+            if r.status_code in _RETRY_STATUS and attempt < self.max_retries:
+                attempt += 1
+                continue
+            r.raise_for_status()
+            data = r.json()
+            _record_timings(data)
+            return data
+
+    async def stream_generate(self, payload: dict) -> AsyncIterator[str]:
+        """
+        Yields response fragments from a streaming /api/generate call.
+        Only retried before the first fragment; closing the generator
+        drops the connection, which makes Ollama stop generating.
+        """
+        slot = await OLLAMA_ADMISSION.acquire()
+        try:
+            async with aclosing(self._stream_generate(payload)) as pieces:
+                async for piece in pieces:
+                    yield piece
+        finally:
+            slot.release()
+
+    async def _stream_generate(self, payload: dict) -> AsyncIterator[str]:
+        payload = {**payload, "stream": True}
+        attempt, tried = 0, []
+        while True:
+            endpoint = await self._next_endpoint(tried, attempt)
+            url = f"{endpoint.base}/api/generate"
+            started = False
+            try:
+                with self.pool.lease(endpoint):
+                    async with self._limit_for(url):
+                        async with self._client.stream("POST", url, json=payload) as r:
+                            self._count_status(endpoint, r.status_code)
+                            if not (r.status_code in _RETRY_STATUS and attempt < self.max_retries):
+                                r.raise_for_status()
+                                started = True
+                                async for line in r.aiter_lines():
+                                    if not line:
+                                        continue
+                                    chunk = json.loads(line)
+                                    if chunk.get("error"):
+                                        UPSTREAM_ERRORS.inc(upstream="ollama", kind="stream_error")
+                                        raise RuntimeError(chunk["error"])
+                                    yield chunk.get("response") or ""
+                                    if chunk.get("done"):
+                                        _record_timings(chunk)
+                                        return
+                                return
+            except httpx.TransportError as e:
+                self._count_error(endpoint, e)
+                if started or not isinstance(e, _RETRY_EXC) or attempt >= self.max_retries:
+                    raise
+            attempt += 1
+
+    async def broadcast(self, payload: dict) -> List[Any]:
+        """
+        Send one non-streaming /api/generate to every host, bypassing routing
+        and retries (warmup). Returns the response body, or the exception, per
+        host in pool order.
+        """
+        payload = {**payload, "stream": False}
+
+        async def one(endpoint: Endpoint) -> dict:
+            r = await self._client.post(f"{endpoint.base}/api/generate", json=payload)
+            r.raise_for_status()
+            data = r.json()
+            _record_timings(data)
+            return data
+
+        return await asyncio.gather(*(one(e) for e in self.pool.endpoints), return_exceptions=True)
+
+    async def aclose(self) -> None:
+        await self.pool.aclose()
+        await self._client.aclose()
+
+
+_async_client: Optional[AsyncOllamaClient] = None
+
+
+def get_async_client() -> AsyncOllamaClient:
+    """Process-wide async client, created on first use inside the running loop."""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOllamaClient()
+    return _async_client
+
+
+async def aclose_async_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+async def amistral_generate(prompt: str, temperature: float = 0.3, num_predict: int = 120) -> str:
+    """Awaitable mistral_generate."""
+    with stage("ollama_text"):
+        data = await get_async_client().post_generate(_text_payload(prompt, temperature, num_predict))
+    return (data.get("response") or "").strip()
+
+
+async def agenerate_json(user_prompt: str, schema: dict, num_predict: int = 200) -> dict:
+    """Awaitable generate_json."""
+    with stage("ollama_json"):
+        data = await get_async_client().post_generate(_json_payload(user_prompt, schema, num_predict))
+    return _parse_json_response(data, schema)
+
+
+async def agenerate_until(payload: dict, is_done: Callable[[str], bool]) -> str:
+    """
+    Stream a generation and stop as soon as `is_done(text_so_far)` is true.
+    Returns the text received up to that point (or the full text).
+    """
+    text = ""
+    stream = get_async_client().stream_generate(payload)
+    try:
+        async for piece in stream:
+            text += piece
+            if is_done(text):
+                STREAM_EARLY_STOP.inc()
+                break
+    finally:
+        await stream.aclose()
+    return text
+
+
+async def amistral_generate_stream(
+    prompt: str,
+    is_done: Callable[[str], bool],
+    temperature: float = 0.3,
+    num_predict: int = 120,
+) -> str:
+    """Streaming amistral_generate that closes upstream once `is_done` says so."""
+    with stage("ollama_text"):
+        text = await agenerate_until(_text_payload(prompt, temperature, num_predict), is_done)
+    return text.strip()
+
+
+def _json_complete(text: str) -> bool:
+    # format=json tends to pad with whitespace up to num_predict; stop at the closing brace
+    body = text.strip()
+    if not body.endswith("}"):
+        return False
+    try:
+        json.loads(body)
+        return True
+    except ValueError:
+        return False
+
+
+async def agenerate_json_stream(user_prompt: str, schema: dict, num_predict: int = 200) -> dict:
+    """Streaming agenerate_json: stops once a complete JSON object has arrived."""
+    with stage("ollama_json"):
+        text = await agenerate_until(_json_payload(user_prompt, schema, num_predict), _json_complete)
+    return _parse_json_response({"response": text}, schema)
@@ -0,0 +1,134 @@
+# levelDetection/service/ollama_pool.py
+import os
+import random
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional
+
+import httpx
+
+from utils.metrics import counter, gauge
+
+# Ejection / health checking (override via env)
+EJECT_AFTER = int(os.getenv("OLLAMA_EJECT_AFTER", "3"))
+HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "10"))
+HEALTH_TIMEOUT = float(os.getenv("OLLAMA_HEALTH_TIMEOUT", "3"))
+
+ENDPOINT_HEALTHY = gauge("ollama_endpoint_healthy", "1 while an Ollama endpoint is in rotation")
+ENDPOINT_OUTSTANDING = gauge("ollama_endpoint_outstanding", "Requests queued or in flight per Ollama endpoint")
+ENDPOINT_REQUESTS = counter("ollama_endpoint_requests_total", "Generate attempts per Ollama endpoint (result=ok|error)")
+ENDPOINT_EJECTIONS = counter("ollama_endpoint_ejections_total", "Times an Ollama endpoint was taken out of rotation")
+
+
+class Endpoint:
+    """One Ollama host: requests outstanding, consecutive failures, in rotation or not."""
+
+    def __init__(self, base: str):
+        self.base = base.rstrip("/")
+        self.outstanding = 0
+        self.failures = 0
+        self.healthy = True
+        ENDPOINT_HEALTHY.set_function(lambda: float(self.healthy), base=self.base)
+        ENDPOINT_OUTSTANDING.set_function(lambda: float(self.outstanding), base=self.base)
+
+
+class OllamaPool:
+    """
+    Ollama endpoints behind least-outstanding-requests routing. An endpoint
+    is ejected after `eject_after` consecutive failures (requests or health
+    checks) and put back once GET /api/tags answers again. With every
+    endpoint ejected, requests still go out (least loaded first) rather
+    than failing without trying.
+    """
+
+    def __init__(
+        self,
+        bases: Iterable[str],
+        eject_after: int = EJECT_AFTER,
+        health_interval: float = HEALTH_INTERVAL,
+        health_timeout: float = HEALTH_TIMEOUT,
+    ):
+        bases = list(dict.fromkeys(b.rstrip("/") for b in bases if b.strip()))
+        if not bases:
+            raise ValueError("At least one Ollama endpoint is required (OLLAMA_BASES / OLLAMA_BASE)")
+        self.endpoints = [Endpoint(b) for b in bases]
+        self.eject_after = eject_after
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._health_task: Optional[asyncio.Task] = None
+
+    # ---------- routing ----------
+
+    def pick(self, exclude: Iterable[str] = ()) -> Endpoint:
+        """Least outstanding healthy endpoint, avoiding `exclude` (already tried) when possible."""
+        exclude = set(exclude)
+        healthy = [e for e in self.endpoints if e.healthy]
+        candidates = [e for e in healthy if e.base not in exclude] or healthy or self.endpoints
+        low = min(e.outstanding for e in candidates)
+        return random.choice([e for e in candidates if e.outstanding == low])
+
+    @contextmanager
+    def lease(self, endpoint: Endpoint) -> Iterator[Endpoint]:
+        """Counts the request against `endpoint` while it is queued or in flight."""
+        endpoint.outstanding += 1
+        try:
+            yield endpoint
+        finally:
+            endpoint.outstanding -= 1
+
+    def report(self, endpoint: Endpoint, ok: bool) -> None:
+        """Outcome of one attempt: transport errors and 5xx are failures, anything else proves the host is up."""
+        ENDPOINT_REQUESTS.inc(base=endpoint.base, result="ok" if ok else "error")
+        if ok:
+            self._recovered(endpoint)
+        else:
+            self._failed(endpoint)
+
+    def _failed(self, endpoint: Endpoint) -> None:
+        endpoint.failures += 1
+        if endpoint.healthy and endpoint.failures >= self.eject_after:
+            endpoint.healthy = False
+            ENDPOINT_EJECTIONS.inc(base=endpoint.base)
+            print(f"Ollama endpoint {endpoint.base} ejected after {endpoint.failures} consecutive failures")
+
+    def _recovered(self, endpoint: Endpoint) -> None:
+        endpoint.failures = 0
+        if not endpoint.healthy:
+            endpoint.healthy = True
+            print(f"Ollama endpoint {endpoint.base} is back in rotation")
+
+    # ---------- health checks ----------
+
+    async def check(self, client: httpx.AsyncClient) -> List[bool]:
+        """Probe every endpoint once (GET /api/tags)."""
+        return await asyncio.gather(*(self._check(client, e) for e in self.endpoints))
+
+    async def _check(self, client: httpx.AsyncClient, endpoint: Endpoint) -> bool:
+        try:
+            r = await client.get(f"{endpoint.base}/api/tags", timeout=self.health_timeout)
+            ok = r.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        if ok:
+            self._recovered(endpoint)
+        else:
+            self._failed(endpoint)
+        return ok
+
+    async def _health_loop(self, client: httpx.AsyncClient) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check(client)
+
+    def start(self, client: httpx.AsyncClient) -> None:
+        """Start background health checks (idempotent; needs a running loop)."""
+        if self.health_interval > 0 and (self._health_task is None or self._health_task.done()):
+            # Fresh context: the loop outlives the request that happened to start it
+            self._health_task = asyncio.create_task(self._health_loop(client), context=contextvars.Context())
+
+    async def aclose(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
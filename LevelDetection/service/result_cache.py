@@ -0,0 +1,52 @@
+# levelDetection/service/result_cache.py
+import os
+import json
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, List
+
+from utils.cache import TTLCache, SqliteStore, TieredCache
+from .ollama_client import LEVEL_MODEL
+from .levelDetection import PROMPT_VERSION
+
+# Result cache (override via env); DETECT_CACHE_PATH enables the on-disk tier
+DETECT_CACHE = os.getenv("DETECT_CACHE", "1").lower() in ("1", "true", "yes")
+DETECT_CACHE_SIZE = int(os.getenv("DETECT_CACHE_SIZE", "2048"))
+DETECT_CACHE_TTL = float(os.getenv("DETECT_CACHE_TTL", "3600"))
+DETECT_CACHE_PATH = os.getenv("DETECT_CACHE_PATH", "")
+
+_cache = TieredCache(
+    "detect",
+    TTLCache(maxsize=DETECT_CACHE_SIZE, ttl=DETECT_CACHE_TTL),
+    SqliteStore(DETECT_CACHE_PATH, ttl=DETECT_CACHE_TTL) if DETECT_CACHE_PATH else None,
+)
+
+
+def _normalize(answer: str) -> str:
+    # Resubmissions differ only in case/whitespace, never in meaning
+    return " ".join((answer or "").split()).casefold()
+
+
+def cache_key(phq9_answers: List[str]) -> str:
+    raw = json.dumps(
+        {
+            "answers": [_normalize(a) for a in phq9_answers or []],
+            "model": LEVEL_MODEL,
+            "prompt": PROMPT_VERSION,
+        },
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def cached_detect(
+    phq9_answers: List[str],
+    compute: Callable[[], Awaitable[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    """Serve from cache, or run `compute` once for all concurrent identical requests."""
+    if not DETECT_CACHE:
+        return await compute()
+    return await _cache.get_or_compute(cache_key(phq9_answers), compute)
+
+
+def close_cache() -> None:
+    _cache.close()
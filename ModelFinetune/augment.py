@@ -1,73 +1,252 @@
+import os
+import json
+import glob
+import shutil
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import pandas as pd
-from transformers import pipeline
 from tqdm import tqdm
 
 # -------------------------------
-# Load dataset
+# Paraphrase augmentation, sharded and resumable:
+#   python augment.py --workers 4
+# Each shard of rows is paraphrased in batches by a worker process and
+# written to its own CSV; a rerun skips shards that already exist.
 # -------------------------------
-df = pd.read_csv("Output_dir\Preprocessed dataset.csv")  # or read_csv if CSV
-print("📂 Columns in dataset:", df.columns.tolist())
-print("🔝 First few rows:")
-print(df.head())
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATASET = os.path.join(HERE, "Output_dir", "Preprocessed dataset.csv")
+DEFAULT_OUT = os.path.join(HERE, "Output_dir", "Augmented_dataset.csv")
+DEFAULT_SHARD_DIR = os.path.join(HERE, "Output_dir", "augment_shards")
+DEFAULT_MODEL = "Vamsi/T5_Paraphrase_Paws"
+COLUMNS = ["instruction", "input", "output"]
 
-# -------------------------------
-# Load paraphrasing model
-# -------------------------------
-paraphraser = pipeline("text2text-generation", model="Vamsi/T5_Paraphrase_Paws")
+_paraphraser = None
+_gen_kwargs = {}
 
-def paraphrase_text(text, num_return_sequences=2, num_beams=4):
-    """Generate paraphrased versions of a given text"""
-    if not isinstance(text, str) or text.strip() == "":
-        return [text]
+
+def _init_worker(model, threads, gen_kwargs):
+    """Loads the pipeline once per process; torch threads are split across workers."""
+    global _paraphraser, _gen_kwargs
+    import torch
+    from transformers import pipeline
+
+    torch.set_num_threads(threads)
+    _paraphraser = pipeline("text2text-generation", model=model, device=-1)
+    _gen_kwargs = gen_kwargs
+
+
+def _paraphrase_one(text):
     try:
-        outputs = paraphraser(
-            f"paraphrase: {text}",
-            num_return_sequences=num_return_sequences,
-            num_beams=num_beams,
-            max_length=256,
-            clean_up_tokenization_spaces=True
-        )
+        outputs = _paraphraser(f"paraphrase: {text}", **_gen_kwargs)
         return [o["generated_text"] for o in outputs]
     except Exception as e:
         print(f"⚠️ Error paraphrasing: {e}")
         return [text]
 
-# -------------------------------
-# Augment dataset
-# -------------------------------
-augmented_rows = []
-for i, row in tqdm(df.iterrows(), total=len(df), desc="Paraphrasing rows"):
-    input_paraphrases = paraphrase_text(row["input"])
-    instr_paraphrases = paraphrase_text(row["instruction"])
-
-    if i < 3:  # show a few examples for debugging
-        print(f"\nRow {i}:")
-        print(" Original input:", row["input"])
-        print(" Paraphrased inputs:", input_paraphrases)
-        print(" Original instruction:", row["instruction"])
-        print(" Paraphrased instructions:", instr_paraphrases)
-
-    for inp in input_paraphrases:
-        for instr in instr_paraphrases:
-            augmented_rows.append({
-                "instruction": instr,
-                "input": inp,
-                "output": row["output"]
-            })
 
-# -------------------------------
-# Combine original + augmented
-# -------------------------------
-df_augmented = pd.DataFrame(augmented_rows)
-df_final = pd.concat([df, df_augmented], ignore_index=True)
+def paraphrase_batch(texts, batch_size):
+    """Paraphrases of each text (the text itself when empty or on error); one pipeline call per batch."""
+    results = {}
+    unique = list(dict.fromkeys(t for t in texts if isinstance(t, str) and t.strip()))
+    for start in range(0, len(unique), batch_size):
+        batch = unique[start:start + batch_size]
+        try:
+            outputs = _paraphraser([f"paraphrase: {t}" for t in batch], batch_size=len(batch), **_gen_kwargs)
+        except Exception as e:
+            print(f"⚠️ Batch failed ({e}); retrying one by one")
+            outputs = [None] * len(batch)
+        for text, out in zip(batch, outputs):
+            if out is None:
+                results[text] = _paraphrase_one(text)
+            else:
+                out = out if isinstance(out, list) else [out]
+                results[text] = [o["generated_text"] for o in out]
+    return [results.get(t, [t]) if isinstance(t, str) and t.strip() else [t] for t in texts]
+
+
+def load_dataset(path):
+    """CSV, or the Parquet / Arrow files written by preprocess.py (memory-mapped, no parsing)."""
+    if path.endswith(".arrow"):
+        import pyarrow as pa
+
+        return pa.ipc.open_file(pa.memory_map(path)).read_all().to_pandas()
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, memory_map=True)
+    return pd.read_csv(path)
+
+
+def _write_atomic(df, path):
+    tmp = path + ".tmp"
+    df.to_csv(tmp, index=False, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def augment_shard(rows, instr_paraphrases, path, batch_size):
+    """Worker task: one shard of rows -> its augmented rows on disk."""
+    input_paraphrases = paraphrase_batch([r["input"] for r in rows], batch_size)
+    out = []
+    for row, inputs in zip(rows, input_paraphrases):
+        for inp in inputs:
+            for instr in instr_paraphrases.get(row["instruction"], [row["instruction"]]):
+                out.append({"instruction": instr, "input": inp, "output": row["output"]})
+    _write_atomic(pd.DataFrame(out, columns=COLUMNS), path)
+    return path, len(out)
+
+
+def _load_instruction_cache(path):
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def _missing_instructions(instructions, cache):
+    return [t for t in dict.fromkeys(instructions) if isinstance(t, str) and t not in cache]
+
+
+def paraphrase_instructions(instructions, path, batch_size):
+    """Instructions are mostly identical: paraphrase each distinct one once and keep the result."""
+    cache = _load_instruction_cache(path)
+    missing = _missing_instructions(instructions, cache)
+    if missing:
+        for text, paraphrases in zip(missing, paraphrase_batch(missing, batch_size)):
+            cache[text] = paraphrases
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+    return cache
+
+
+def dataset_fingerprint(path, args):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    params = [args.model, args.shard_size, args.num_return_sequences, args.num_beams, args.max_length]
+    h.update(json.dumps(params).encode())
+    return h.hexdigest()
+
+
+def prepare_shard_dir(shard_dir, fingerprint, restart):
+    """Shards are only reused for the same dataset and generation settings."""
+    meta_path = os.path.join(shard_dir, "meta.json")
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("fingerprint") != fingerprint:
+            if not restart:
+                raise SystemExit(
+                    f"❌ {shard_dir} holds shards for a different dataset or settings; rerun with --restart to discard them"
+                )
+            shutil.rmtree(shard_dir)
+    os.makedirs(shard_dir, exist_ok=True)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint}, f)
+
+
+def _dedupe_key(df):
+    return df[COLUMNS].astype(str).apply(lambda col: col.str.lower().str.split().str.join(" "))
+
+
+def merge_shards(df, shard_dir, out):
+    shards = sorted(glob.glob(os.path.join(shard_dir, "shard_*.csv")))
+    df_augmented = pd.concat(
+        [pd.read_csv(p, encoding="utf-8", keep_default_na=False) for p in shards] or [pd.DataFrame(columns=COLUMNS)],
+        ignore_index=True,
+    )
+    df_final = pd.concat([df[COLUMNS], df_augmented], ignore_index=True)
+    before = len(df_final)
+    df_final = df_final[~_dedupe_key(df_final).duplicated()].reset_index(drop=True)
+    print(f"🧹 Removed {before - len(df_final)} duplicate rows")
+    df_final.to_csv(out, index=False, encoding="utf-8-sig")
+    return df_final
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Paraphrase augmentation of the fine-tune dataset.")
+    ap.add_argument("--dataset", default=DEFAULT_DATASET)
+    ap.add_argument("--out", default=DEFAULT_OUT)
+    ap.add_argument("--shard-dir", default=DEFAULT_SHARD_DIR)
+    ap.add_argument("--model", default=DEFAULT_MODEL)
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    ap.add_argument("--shard-size", type=int, default=64, help="Rows per shard (unit of checkpointing)")
+    ap.add_argument("--batch-size", type=int, default=16, help="Texts per pipeline call")
+    ap.add_argument("--num-return-sequences", type=int, default=2)
+    ap.add_argument("--num-beams", type=int, default=4)
+    ap.add_argument("--max-length", type=int, default=256)
+    ap.add_argument("--restart", action="store_true", help="Discard shards from a different dataset/settings")
+    args = ap.parse_args()
+
+    # -------------------------------
+    # Load dataset
+    # -------------------------------
+    df = load_dataset(args.dataset)
+    print("📂 Columns in dataset:", df.columns.tolist())
+    print(f"📊 {len(df)} rows")
+
+    fingerprint = dataset_fingerprint(args.dataset, args)
+    prepare_shard_dir(args.shard_dir, fingerprint, args.restart)
+
+    gen_kwargs = {
+        "num_return_sequences": args.num_return_sequences,
+        "num_beams": args.num_beams,
+        "max_length": args.max_length,
+        "clean_up_tokenization_spaces": True,
+    }
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+
+    # -------------------------------
+    # Work left over from earlier runs
+    # -------------------------------
+    records = df[COLUMNS].to_dict("records")
+    tasks = []
+    for shard, start in enumerate(range(0, len(records), args.shard_size)):
+        path = os.path.join(args.shard_dir, f"shard_{shard:05d}.csv")
+        if not os.path.exists(path):
+            tasks.append((records[start:start + args.shard_size], path))
+    total = -(-len(records) // args.shard_size)
+    print(f"🔁 {total - len(tasks)}/{total} shards already done")
+
+    instructions = df["instruction"].tolist()
+    instr_path = os.path.join(args.shard_dir, "instructions.json")
+    instr_paraphrases = _load_instruction_cache(instr_path)
+
+    if tasks or _missing_instructions(instructions, instr_paraphrases):
+        # The model is loaded only in the workers' initializer, never in this process, and the
+        # workers are spawned: forking after torch / tokenizer threads have started can hang.
+        with ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(args.model, threads, gen_kwargs),
+        ) as pool:
+            # -------------------------------
+            # Instruction paraphrases (once)
+            # -------------------------------
+            instr_paraphrases = pool.submit(paraphrase_instructions, instructions, instr_path, args.batch_size).result()
+            print(f"📝 {len(instr_paraphrases)} distinct instructions paraphrased")
+
+            # -------------------------------
+            # Augment inputs, shard by shard
+            # -------------------------------
+            futures = [pool.submit(augment_shard, rows, instr_paraphrases, path, args.batch_size) for rows, path in tasks]
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Paraphrasing shards"):
+                future.result()
+
+    # -------------------------------
+    # Combine original + augmented, dedupe, save
+    # -------------------------------
+    df_final = merge_shards(df, args.shard_dir, args.out)
+
+    print(f"\n✅ Augmented dataset saved as {args.out}")
+    print(f"📊 Final dataset shape: {df_final.shape}")
+    print("🔝 Sample rows:")
+    print(df_final.sample(min(5, len(df_final))))
 
-# -------------------------------
-# Save CSV
-# -------------------------------
-output_file = "Augmented_dataset.csv"
-df_final.to_csv(output_file, index=False, encoding="utf-8-sig")
 
-print(f"\n✅ Augmented dataset saved as {output_file}")
-print(f"📊 Final dataset shape: {df_final.shape}")
-print("🔝 Sample rows:")
-print(df_final.sample(5))
+if __name__ == "__main__":
+    main()
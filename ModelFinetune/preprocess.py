@@ -1,49 +1,213 @@
-import pandas as pd
 import os
+import sys
 import json
+import argparse
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.phq9_questions import PHQ9_LEVELS  # noqa: E402
+
+# -------------------------------
+# Source sheet -> fine-tune dataset (instruction / input / output)
+#   python preprocess.py [--source file.xlsx|file.csv] [--formats jsonl,csv,parquet,arrow]
+# The source is read in chunks and every output is streamed chunk by chunk.
+# Rows with a missing PHQ answer, an invalid score/level or a level outside
+# the score's band are rejected (listed in preprocess_rejects.csv). Before
+# validation, missing answers were left out of the input and the row kept.
+# -------------------------------
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SOURCE = os.path.join(HERE, "Resources", "PHQ9_Student_Depression_Dataset.xlsx")
+DEFAULT_OUT_DIR = os.path.join(HERE, "Output_dir")
+OUT_NAME = "Preprocessed_dataset"
+REJECTS_NAME = "preprocess_rejects.csv"
+FORMATS = ("jsonl", "csv", "parquet", "arrow")
+
+INSTRUCTION = "Analyze the following PHQ-9 responses and provide the score and depression level."
+TEXT_COLUMNS = [f"PHQ{i}_Text" for i in range(1, 10)]
+SCORE_COLUMN = "PHQ-9 Score"
+LEVEL_COLUMN = "Depression Level"
+REQUIRED_COLUMNS = TEXT_COLUMNS + [SCORE_COLUMN, LEVEL_COLUMN]
+COLUMNS = ["instruction", "input", "output"]
+
+
+# -------------------------------
+# Chunked reading
+# -------------------------------
+def iter_chunks(path, chunk_size):
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        # pandas can't chunk Excel; openpyxl's read-only mode streams rows
+        from openpyxl import load_workbook
+
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            header = [str(h).strip() if h is not None else "" for h in next(rows)]
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= chunk_size:
+                    yield pd.DataFrame(batch, columns=header)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=header)
+        finally:
+            wb.close()
+    else:
+        for chunk in pd.read_csv(path, chunksize=chunk_size):
+            chunk.columns = [str(c).strip() for c in chunk.columns]
+            yield chunk
+
+
+# -------------------------------
+# Validation + vectorized build
+# -------------------------------
+def check_columns(df):
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise SystemExit(f"❌ Source is missing required columns: {missing}")
+
+
+def validate(df):
+    """Per-row list of problems ("" when the row is valid), computed column-wise."""
+    texts = df[TEXT_COLUMNS].astype("string").apply(lambda col: col.str.strip())
+    missing_text = texts.isna() | texts.eq("")
+    problems = pd.Series("", index=df.index, dtype="string")
+    for col in TEXT_COLUMNS:
+        problems = problems.mask(missing_text[col], problems + f"missing {col};")
+
+    score = pd.to_numeric(df[SCORE_COLUMN], errors="coerce")
+    bad_score = score.isna() | (score % 1 != 0) | ~score.between(0, 27)
+    problems = problems.mask(bad_score, problems + "invalid score;")
+
+    level = df[LEVEL_COLUMN].astype("string").str.strip()
+    names = [name for _, _, name in PHQ9_LEVELS]
+    bad_level = ~level.isin(names).fillna(False)
+    problems = problems.mask(bad_level, problems + "invalid level;")
+
+    expected = pd.cut(score, bins=[-1] + [high for _, high, _ in PHQ9_LEVELS], labels=names).astype("string")
+    mismatch = ~bad_score & ~bad_level & expected.ne(level).fillna(True)
+    problems = problems.mask(mismatch, problems + "level does not match score;")
+    return problems
+
+
+def build(df):
+    texts = df[TEXT_COLUMNS].astype("string").apply(lambda col: col.str.strip())
+    numbered = [(f"{i}. " + texts[col]) for i, col in enumerate(TEXT_COLUMNS, start=1)]
+    # validate() has already rejected rows with a missing answer
+    inputs = numbered[0].str.cat(numbered[1:], sep="\n")
+
+    score = pd.to_numeric(df[SCORE_COLUMN], errors="coerce").astype("Int64").astype("string")
+    level = df[LEVEL_COLUMN].astype("string").str.strip()
+    outputs = "PHQ-9 Score: " + score + "\nDepression Level: " + level
+
+    return pd.DataFrame({"instruction": INSTRUCTION, "input": inputs, "output": outputs}, index=df.index).astype(str)
+
+
+# -------------------------------
+# Streaming writers
+# -------------------------------
+class Writers:
+    def __init__(self, out_dir, formats):
+        self.paths = {fmt: os.path.join(out_dir, f"{OUT_NAME}.{fmt}") for fmt in formats}
+        self._files = {}
+        self._arrow = {}
+        self._first = True
+
+    def _file(self, fmt, **kwargs):
+        if fmt not in self._files:
+            self._files[fmt] = open(self.paths[fmt], "w", encoding="utf-8", **kwargs)
+        return self._files[fmt]
+
+    def write(self, df):
+        if "jsonl" in self.paths:
+            f = self._file("jsonl")
+            f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in df.to_dict("records"))
+        if "csv" in self.paths:
+            df.to_csv(self._file("csv", newline=""), index=False, header=self._first)
+        if "parquet" in self.paths or "arrow" in self.paths:
+            self._write_arrow(df)
+        self._first = False
+
+    def _write_arrow(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if "parquet" in self.paths and "parquet" not in self._arrow:
+            self._arrow["parquet"] = pq.ParquetWriter(self.paths["parquet"], table.schema)
+        if "arrow" in self.paths and "arrow" not in self._arrow:
+            # Arrow IPC file: readers can pa.memory_map() it without parsing
+            self._arrow["arrow"] = pa.ipc.new_file(self.paths["arrow"], table.schema)
+        for writer in self._arrow.values():
+            writer.write_table(table)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        for writer in self._arrow.values():
+            writer.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build the fine-tune dataset from the PHQ-9 source sheet.")
+    ap.add_argument("--source", default=DEFAULT_SOURCE)
+    ap.add_argument("--out-dir", default=DEFAULT_OUT_DIR)
+    ap.add_argument("--formats", default=",".join(FORMATS), help=f"Comma-separated subset of {','.join(FORMATS)}")
+    ap.add_argument("--chunk-size", type=int, default=50000)
+    ap.add_argument("--strict", action="store_true", help="Exit non-zero when any row is rejected")
+    args = ap.parse_args()
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise SystemExit(f"❌ Unknown formats: {sorted(unknown)}")
+
+    # Ensure output directory exists
+    os.makedirs(args.out_dir, exist_ok=True)
+    writers = Writers(args.out_dir, formats)
+    rejects_path = os.path.join(args.out_dir, REJECTS_NAME)
+    rejects = []
+    kept = total = 0
+    preview = None
+    try:
+        for chunk in iter_chunks(args.source, args.chunk_size):
+            check_columns(chunk)
+            chunk.index = pd.RangeIndex(total, total + len(chunk))
+            total += len(chunk)
+            problems = validate(chunk)
+            bad = problems.ne("")
+            if bad.any():
+                rejected = chunk.loc[bad, REQUIRED_COLUMNS].copy()
+                rejected.insert(0, "problems", problems[bad].str.rstrip(";"))
+                rejected.insert(0, "source_row", rejected.index + 2)  # 1-based, after the header
+                rejects.append(rejected)
+            final_df = build(chunk[~bad])
+            writers.write(final_df)
+            kept += len(final_df)
+            if preview is None and len(final_df):
+                preview = final_df.head()
+    finally:
+        writers.close()
+
+    for fmt, path in writers.paths.items():
+        print(f"✅ Fine-tune {fmt.upper()} saved as {path}")
+    print(f"📊 {kept}/{total} rows kept, {total - kept} rejected")
+
+    if rejects:
+        report = pd.concat(rejects)
+        report.to_csv(rejects_path, index=False, encoding="utf-8")
+        print(f"⚠️ {len(report)} rows rejected, see {rejects_path}")
+        print(report["problems"].str.split(";").explode().value_counts().to_string())
+    elif os.path.exists(rejects_path):
+        os.remove(rejects_path)
+
+    # Preview first 5 rows
+    if preview is not None:
+        print(preview)
+    if rejects and args.strict:
+        raise SystemExit(1)
+
 
-# Load your dataset (works for CSV or Excel)
-file_path = "Resources/PHQ9_Student_Depression_Dataset.xlsx"   # fixed path
-df = pd.read_excel(file_path)
-
-# Create new columns
-df["instruction"] = "Analyze the following PHQ-9 responses and provide the score and depression level."
-
-# Combine all PHQ answers into one text block (PHQ1..PHQ9)
-df["input"] = df.apply(
-    lambda row: "\n".join([f"{i}. {row[f'PHQ{i}_Text']}" for i in range(1, 10) if pd.notna(row.get(f'PHQ{i}_Text'))]),
-    axis=1
-)
-
-# Output column (score + level)
-df["output"] = df.apply(
-    lambda row: f"PHQ-9 Score: {row['PHQ-9 Score']}\nDepression Level: {row['Depression Level']}",
-    axis=1
-)
-
-# Select only fine-tune columns
-final_df = df[["instruction", "input", "output"]]
-
-# Ensure output directory exists
-os.makedirs("Output_dir", exist_ok=True)
-
-# Save as CSV
-csv_path = "Output_dir/Preprocessed_dataset.csv"
-final_df.to_csv(csv_path, index=False, encoding="utf-8")
-print(f"✅ Fine-tune CSV saved as {csv_path}")
-
-# Save as JSONL
-jsonl_path = "Output_dir/Preprocessed_dataset.jsonl"
-with open(jsonl_path, "w", encoding="utf-8") as f:
-    for _, row in final_df.iterrows():
-        record = {
-            "instruction": row["instruction"],
-            "input": row["input"],
-            "output": row["output"]
-        }
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
-
-print(f"✅ Fine-tune JSONL saved as {jsonl_path}")
-
-# Preview first 5 rows
-print(final_df.head())
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import os
+import re
+import sys
+import json
+import argparse
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression, Ridge
+from sklearn.model_selection import GroupShuffleSplit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.phq9_questions import PHQ9_LEVELS  # noqa: E402
+
+# -------------------------------
+# CPU-only PHQ-9 scorer used as the fast path in front of the LLM
+# (LevelDetection/service/local_scorer.py loads the artifact built here)
+# -------------------------------
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATASET = os.path.join(HERE, "Output_dir", "Augmented_dataset.csv")
+DEFAULT_ORIGINALS = os.path.join(HERE, "Output_dir", "Preprocessed dataset.csv")
+DEFAULT_ARTIFACT = os.path.join(HERE, "Output_dir", "local_scorer.joblib")
+DEFAULT_REPORT = os.path.join(HERE, "Output_dir", "local_scorer_report.json")
+
+WORD_RE = re.compile(r"[a-z]+")
+OUTPUT_RE = re.compile(r"PHQ-9\s*Score\s*:\s*(\d{1,2})\s*Depression\s*Level\s*:\s*(.+)", re.IGNORECASE)
+THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95]
+
+
+def load_dataset(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path, encoding="utf-8-sig")
+    parsed = df["output"].str.extract(OUTPUT_RE)
+    df["score"] = pd.to_numeric(parsed[0], errors="coerce")
+    df["level"] = parsed[1].str.strip()
+    bad = df["score"].isna() | df["level"].isna() | df["input"].isna()
+    if bad.any():
+        print(f"⚠️ Skipping {int(bad.sum())} rows with unparseable input/output")
+    return df[~bad].reset_index(drop=True)
+
+
+def _words(text) -> frozenset:
+    return frozenset(WORD_RE.findall(str(text).lower()))
+
+
+def source_groups(df: pd.DataFrame, originals: pd.DataFrame) -> np.ndarray:
+    """
+    Source row of every answer set, so an original and its paraphrases land
+    on the same side of the split. The augmented CSV doesn't record it; the
+    paraphraser mostly reorders words, so each row maps to the original
+    (same output) with the most similar word set. Originals tied for a row
+    are merged into one group.
+    """
+    orig_words = [_words(t) for t in originals["input"]]
+    orig_outputs = originals["output"].to_numpy()
+    parent = list(range(len(originals)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    best = []
+    for text, output in zip(df["input"], df["output"]):
+        words = _words(text)
+        candidates = np.flatnonzero(orig_outputs == output)
+        if not len(candidates):
+            candidates = np.arange(len(originals))
+        sims = np.array([len(words & orig_words[j]) / max(len(words | orig_words[j]), 1) for j in candidates])
+        tied = candidates[sims >= sims.max() - 1e-9]
+        for j in tied[1:]:
+            parent[find(j)] = find(tied[0])
+        best.append(tied[0])
+    return np.array([find(j) for j in best])
+
+
+def answer_sentence_stats(originals: pd.DataFrame) -> dict:
+    """
+    How templated the data is: distinct answer sentences, and how many only
+    ever appear under one level (those give the level away on their own).
+    """
+    levels = originals["output"].str.extract(OUTPUT_RE)[1].str.strip()
+    seen = {}
+    for text, level in zip(originals["input"], levels):
+        for sentence in re.split(r"\s*\d\.\s+", str(text)):
+            if sentence.strip():
+                seen.setdefault(sentence.strip().lower(), set()).add(level)
+    return {
+        "distinct_answer_sentences": len(seen),
+        "single_level_sentences": sum(len(v) == 1 for v in seen.values()),
+    }
+
+
+def build(texts, levels, scores):
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, min_df=1)
+    X = vectorizer.fit_transform(texts)
+    level_clf = LogisticRegression(max_iter=2000, C=10.0)
+    level_clf.fit(X, levels)
+    score_reg = Ridge(alpha=1.0)
+    score_reg.fit(X, scores)
+    return {"vectorizer": vectorizer, "level_clf": level_clf, "score_reg": score_reg}
+
+
+def coverage_report(model, texts, levels, scores) -> list:
+    """How many requests each confidence threshold would absorb, and how accurately."""
+    X = model["vectorizer"].transform(texts)
+    proba = model["level_clf"].predict_proba(X)
+    conf = proba.max(axis=1)
+    pred_level = model["level_clf"].classes_[proba.argmax(axis=1)]
+    pred_score = model["score_reg"].predict(X)
+    bands = {level: (low, high) for low, high, level in PHQ9_LEVELS}
+    clipped = np.array([np.clip(round(s), *bands[l]) for s, l in zip(pred_score, pred_level)])
+
+    rows = []
+    for t in THRESHOLDS:
+        mask = conf >= t
+        n = int(mask.sum())
+        rows.append({
+            "threshold": t,
+            "absorbed": n,
+            "absorbed_pct": round(100.0 * n / len(texts), 1),
+            "level_accuracy": round(float((pred_level[mask] == np.asarray(levels)[mask]).mean()), 3) if n else None,
+            "score_mae": round(float(np.abs(clipped[mask] - np.asarray(scores)[mask]).mean()), 2) if n else None,
+        })
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Train the local PHQ-9 fast-path scorer.")
+    ap.add_argument("--dataset", default=DEFAULT_DATASET)
+    ap.add_argument("--originals", default=DEFAULT_ORIGINALS, help="Un-augmented rows, used to group paraphrases")
+    ap.add_argument("--out", default=DEFAULT_ARTIFACT)
+    ap.add_argument("--report", default=DEFAULT_REPORT)
+    ap.add_argument("--test-size", type=float, default=0.2)
+    args = ap.parse_args()
+
+    df = load_dataset(args.dataset)
+    print(f"📂 Loaded {len(df)} labelled answer sets from {args.dataset}")
+
+    # Hold out whole source rows: a paraphrase of a training row in the test set measures the leak, not the model
+    originals = pd.read_csv(args.originals)
+    groups = source_groups(df, originals)
+    train_idx, test_idx = next(GroupShuffleSplit(n_splits=1, test_size=args.test_size, random_state=42).split(df, groups=groups))
+    train, test = df.iloc[train_idx], df.iloc[test_idx]
+    print(f"🔀 {len(set(groups))} source groups; {len(test)} held-out rows from {len(set(groups[test_idx]))} of them")
+    held_out = build(train["input"], train["level"], train["score"])
+    report = coverage_report(held_out, test["input"], test["level"].to_numpy(), test["score"].to_numpy())
+
+    print("\n📊 Held-out fast-path coverage:")
+    print(f"{'threshold':>9} {'absorbed':>9} {'level acc':>9} {'score MAE':>9}")
+    for r in report:
+        print(f"{r['threshold']:>9} {r['absorbed_pct']:>8}% {str(r['level_accuracy']):>9} {str(r['score_mae']):>9}")
+
+    sentences = answer_sentence_stats(originals)
+    if sentences["single_level_sentences"] == sentences["distinct_answer_sentences"]:
+        print(
+            f"⚠️ All {sentences['distinct_answer_sentences']} answer sentences occur under a single level: "
+            "held-out accuracy says nothing about real free-text answers"
+        )
+
+    # Final artifact is trained on everything
+    model = build(df["input"], df["level"], df["score"])
+    model["bands"] = {level: [low, high] for low, high, level in PHQ9_LEVELS}
+    model["trained_on"] = os.path.basename(args.dataset)
+    joblib.dump(model, args.out)
+    print(f"\n✅ Local scorer saved as {args.out}")
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "dataset": os.path.basename(args.dataset),
+                "rows": len(df),
+                "split": "by source row (original + its paraphrases held out together)",
+                "source_groups": len(set(groups)),
+                "held_out": len(test),
+                "answer_sentences": sentences,
+                "coverage": report,
+            },
+            f,
+            indent=2,
+        )
+    print(f"✅ Coverage report saved as {args.report}")
+
+
+if __name__ == "__main__":
+    main()
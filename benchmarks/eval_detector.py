@@ -0,0 +1,219 @@
+# benchmarks/eval_detector.py
+"""
+Offline evaluation of the level detector: replays a labelled dataset
+through adetect_from_phq9_answers with bounded concurrency and reports
+accuracy, score MAE, JSON-vs-fallback split and latency percentiles.
+
+    python -m benchmarks.eval_detector --fake                 # in-process fake Ollama
+    python -m benchmarks.eval_detector --dataset ModelFinetune/Output_dir/Augmented_dataset.csv --concurrency 16
+
+Finished items are appended to a cache file as they complete; rerunning the
+same configuration only evaluates what is missing (--fresh starts over).
+"""
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from contextlib import nullcontext
+from typing import Any, Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+DEFAULT_DATASET = os.path.join(ROOT, "ModelFinetune", "Output_dir", "Preprocessed_dataset.jsonl")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+LEVELS = ["Minimal", "Mild", "Moderate", "Moderately Severe", "Severe"]
+
+_NUMBER_RE = re.compile(r"^\s*\d+\.\s*")
+
+
+def load_items(path: str, limit: int = 0) -> List[Dict[str, Any]]:
+    """Distinct (answers, expected score/level) items from a preprocess/augment output."""
+    from LevelDetection.service.levelDetection import _parse_text_fallback
+
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        import pandas as pd
+
+        rows = pd.read_csv(path, encoding="utf-8-sig", keep_default_na=False).to_dict("records")
+
+    items, seen = [], set()
+    for row in rows:
+        answers = [_NUMBER_RE.sub("", line).strip() for line in str(row["input"]).splitlines() if line.strip()]
+        try:
+            expected = _parse_text_fallback(str(row["output"]))
+        except ValueError:
+            continue
+        key = hashlib.sha256(json.dumps([answers, expected], sort_keys=True).encode()).hexdigest()[:16]
+        if key in seen:
+            continue
+        seen.add(key)
+        items.append({"key": key, "answers": answers, "expected": expected})
+        if limit and len(items) >= limit:
+            break
+    return items
+
+
+def load_cache(path: str) -> Dict[str, Dict[str, Any]]:
+    done = {}
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from an interrupted run
+                done[record["key"]] = record
+    return done
+
+
+async def evaluate(items, concurrency: int, race: bool, cache_file) -> List[Dict[str, Any]]:
+    from LevelDetection.service.levelDetection import LAST_DETECT_PATH, adetect_from_phq9_answers
+    from LevelDetection.service.ollama_client import aclose_async_client
+
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(item):
+        async with sem:
+            record = {"key": item["key"], "expected": item["expected"]}
+            start = time.perf_counter()
+            try:
+                record["predicted"] = await adetect_from_phq9_answers(item["answers"], race=race)
+                record["path"] = LAST_DETECT_PATH.get()
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+                record["path"] = "failed"
+            record["latency"] = time.perf_counter() - start
+            if cache_file:
+                cache_file.write(json.dumps(record) + "\n")
+                cache_file.flush()
+            return record
+
+    try:
+        return await asyncio.gather(*(one(item) for item in items))
+    finally:
+        await aclose_async_client()
+
+
+def report(records: List[Dict[str, Any]], fresh: List[Dict[str, Any]], wall: float) -> Dict[str, Any]:
+    from benchmarks.stats import latency_summary
+
+    answered = [r for r in records if "predicted" in r]
+    paths: Dict[str, int] = {}
+    for r in records:
+        paths[r["path"]] = paths.get(r["path"], 0) + 1
+    llm_calls = sum(paths.get(p, 0) for p in ("json", "text", "failed"))
+    confusion = {exp: {pred: 0 for pred in LEVELS} for exp in LEVELS}
+    for r in answered:
+        if r["expected"]["level"] in confusion and r["predicted"]["level"] in confusion:
+            confusion[r["expected"]["level"]][r["predicted"]["level"]] += 1
+
+    errors = [abs(r["predicted"]["phq9_score"] - r["expected"]["phq9_score"]) for r in answered]
+    n = len(answered)
+    return {
+        "items": len(records),
+        "evaluated_this_run": len(fresh),
+        "errors": len(records) - n,
+        "level_accuracy": round(sum(r["predicted"]["level"] == r["expected"]["level"] for r in answered) / n, 4) if n else None,
+        "score_exact": round(sum(e == 0 for e in errors) / n, 4) if n else None,
+        "score_within_2": round(sum(e <= 2 for e in errors) / n, 4) if n else None,
+        "score_mae": round(sum(errors) / n, 3) if n else None,
+        "paths": paths,
+        "json_failure_rate": round((paths.get("text", 0) + paths.get("failed", 0)) / llm_calls, 4) if llm_calls else None,
+        "latency": latency_summary(r["latency"] for r in records),
+        "latency_this_run": latency_summary(r["latency"] for r in fresh),
+        "throughput_rps": round(len(fresh) / wall, 2) if fresh and wall else None,
+        "confusion": confusion,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Evaluate the PHQ-9 level detector on a labelled dataset.")
+    ap.add_argument("--dataset", default=DEFAULT_DATASET, help="Preprocessed_dataset.jsonl or Augmented_dataset.csv")
+    ap.add_argument("--limit", type=int, default=0)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--race", action="store_true", help="Race the JSON and text prompts (DETECT_RACE)")
+    ap.add_argument("--no-stream", action="store_true", help="Non-streaming generations (DETECT_STREAM=0)")
+    ap.add_argument("--local-scorer", action="store_true", help="Keep the local fast path in front of the LLM")
+    ap.add_argument("--cache", help="Resume file (default: derived from dataset + configuration)")
+    ap.add_argument("--fresh", action="store_true", help="Ignore previously cached results")
+    ap.add_argument("--report", help="Report path (default: benchmarks/results/eval-<time>.json)")
+    fake = ap.add_argument_group("fake Ollama")
+    fake.add_argument("--fake", action="store_true", help="Start an in-process fake Ollama and point the client at it")
+    fake.add_argument("--fake-latency", type=float, default=0.05)
+    fake.add_argument("--fake-token-latency", type=float, default=0.002)
+    fake.add_argument("--fake-json-error-rate", type=float, default=0.1)
+    fake.add_argument("--fake-error-rate", type=float, default=0.0)
+    args = ap.parse_args()
+
+    # Service configuration is read at import time, so set it first
+    os.environ["LOCAL_SCORER"] = "1" if args.local_scorer else "0"
+    os.environ["DETECT_STREAM"] = "0" if args.no_stream else "1"
+
+    server = nullcontext(None)
+    if args.fake:
+        from benchmarks.fake_ollama import create_app
+        from benchmarks.server_thread import serve_in_thread
+
+        server = serve_in_thread(
+            create_app(
+                latency=args.fake_latency,
+                token_latency=args.fake_token_latency,
+                json_error_rate=args.fake_json_error_rate,
+                error_rate=args.fake_error_rate,
+            )
+        )
+
+    with server as fake_base:
+        if fake_base:
+            os.environ["OLLAMA_BASES"] = os.environ["OLLAMA_BASE"] = fake_base
+        from LevelDetection.service.levelDetection import PROMPT_VERSION
+        from LevelDetection.service.ollama_client import BASES, LEVEL_MODEL
+
+        config = {
+            "dataset": os.path.abspath(args.dataset),
+            "base": "fake" if fake_base else ",".join(BASES),
+            "model": LEVEL_MODEL,
+            "prompt_version": PROMPT_VERSION,
+            "race": args.race,
+            "stream": not args.no_stream,
+            "local_scorer": args.local_scorer,
+        }
+        if fake_base:
+            config["fake"] = [args.fake_latency, args.fake_token_latency, args.fake_json_error_rate, args.fake_error_rate]
+        config_id = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:10]
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        cache_path = args.cache or os.path.join(
+            RESULTS_DIR, f"eval-cache-{os.path.splitext(os.path.basename(args.dataset))[0]}-{config_id}.jsonl"
+        )
+        if args.fresh and os.path.exists(cache_path):
+            os.remove(cache_path)
+
+        items = load_items(args.dataset, args.limit)
+        done = load_cache(cache_path)
+        todo = [item for item in items if item["key"] not in done]
+        print(f"📊 {len(items)} distinct items, {len(items) - len(todo)} cached, {len(todo)} to evaluate")
+
+        start = time.perf_counter()
+        with open(cache_path, "a", encoding="utf-8") as cache_file:
+            fresh = asyncio.run(evaluate(todo, args.concurrency, args.race, cache_file))
+        wall = time.perf_counter() - start
+
+    keys = {item["key"] for item in items}
+    records = [r for r in done.values() if r["key"] in keys] + fresh
+    result = {"config": config, "cache": cache_path, "wall_seconds": round(wall, 2), **report(records, fresh, wall)}
+    report_path = args.report or os.path.join(RESULTS_DIR, f"eval-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps({k: v for k, v in result.items() if k != "confusion"}, indent=2))
+    print(f"✅ Report saved as {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# benchmarks/fake_ollama.py
+"""
+Stand-in for Ollama's /api/generate (+ /api/tags) with configurable latency,
+so detection can be benchmarked without a GPU.
+
+"Answers" come from a keyword scorer over the numbered PHQ-9 responses in
+the prompt, so accuracy numbers are meaningful relative to each other but
+say nothing about the real model.
+
+    python -m benchmarks.fake_ollama --port 11434 --latency 0.2 --token-latency 0.01
+"""
+import re
+import json
+import random
+import asyncio
+import argparse
+import time
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from textChatMode.phq_scoring import score_rule
+from utils.phq9_questions import level_for_score
+
+_ANSWER_RE = re.compile(r"^\s*([1-9])\.\s+(.*?)\s*(?:\[/INST\])?\s*$", re.MULTILINE)
+
+
+def fake_answer(prompt: str) -> Dict[str, Any]:
+    """Keyword-scores each numbered answer (unsure -> 1) and sums them."""
+    answers: List[str] = [m.group(2) for m in _ANSWER_RE.finditer(prompt)]
+    score = sum(1 if (s := score_rule(a)) is None else s for a in answers[:9])
+    return {"total_score": score, "level": level_for_score(score)}
+
+
+def _keep_alive_seconds(value: Any, default: float = 300.0) -> float:
+    """Ollama's keep_alive: seconds or "30s" / "30m" / "1h"; negative keeps the model loaded."""
+    if value is None:
+        return default
+    if isinstance(value, str):
+        units = {"s": 1, "m": 60, "h": 3600}
+        seconds = float(value[:-1]) * units[value[-1]] if value[-1:] in units else float(value)
+    else:
+        seconds = float(value)
+    return float("inf") if seconds < 0 else seconds
+
+
+def _common_prefix(a: List[str], b: List[str]) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+def _pieces(text: str, size: int = 4) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+def create_app(
+    model: str = "mistral-LevelDetector",
+    latency: float = 0.05,
+    token_latency: float = 0.002,
+    json_error_rate: float = 0.0,
+    error_rate: float = 0.0,
+    seed: int = 0,
+    load_latency: float = 0.0,
+    prompt_token_latency: float = 0.0,
+) -> FastAPI:
+    """
+    latency: seconds before the first token (prompt eval + queueing)
+    token_latency: seconds per ~4-character piece
+    load_latency: seconds to load the model when it is not loaded (first
+        request, or idle past the request's keep_alive, default 5 minutes)
+    prompt_token_latency: extra seconds per prompt word not shared with the
+        previous prompt (a one-slot prefix cache, like a single llama.cpp slot)
+    json_error_rate: share of format=json requests answered with schema-invalid JSON
+    error_rate: share of requests failed with 503 (exercises client retries)
+    Set app.state.outage = True to answer everything (incl. /api/tags) with 503.
+    """
+    app = FastAPI()
+    rng = random.Random(seed)
+    stats = {"requests": 0, "stream": 0, "json": 0, "text": 0, "errors": 0, "json_broken": 0, "closed_early": 0}
+    app.state.stats = stats
+    app.state.outage = False
+    # One model slot: loaded until, words of the last evaluated prompt
+    slot = {"loaded_until": 0.0, "prompt": []}
+
+    def prefill(body: Dict[str, Any]) -> Dict[str, Any]:
+        """Load / prompt-eval bookkeeping; returns the delay and Ollama's timing fields for it."""
+        now = time.monotonic()
+        load = 0.0
+        if now >= slot["loaded_until"]:
+            load, slot["prompt"] = load_latency, []
+        words = (body.get("prompt") or "").split()
+        evaluated = len(words) - _common_prefix(words, slot["prompt"])
+        slot["prompt"] = words
+        slot["loaded_until"] = now + load + _keep_alive_seconds(body.get("keep_alive"))
+        prompt_eval = latency + evaluated * prompt_token_latency
+        return {
+            "delay": load + prompt_eval,
+            "load_duration": int(load * 1e9),
+            "prompt_eval_count": evaluated,
+            "prompt_eval_duration": int(prompt_eval * 1e9),
+        }
+
+    def completion(body: Dict[str, Any]) -> str:
+        answer = fake_answer(body.get("prompt") or "")
+        if body.get("format") == "json":
+            stats["json"] += 1
+            if rng.random() < json_error_rate:
+                stats["json_broken"] += 1
+                return json.dumps({"total_score": answer["total_score"], "level": "Unclear"}) + "\n\n"
+            return json.dumps(answer) + "\n\n  \n"
+        stats["text"] += 1
+        return f"PHQ-9 Score: {answer['total_score']}\nDepression Level: {answer['level']}\n"
+
+    def final_chunk(body: Dict[str, Any], text: str, timings: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "model": body.get("model", model),
+            "done": True,
+            "load_duration": timings["load_duration"],
+            "prompt_eval_count": timings["prompt_eval_count"],
+            "prompt_eval_duration": timings["prompt_eval_duration"],
+            "eval_count": len(_pieces(text)),
+            "eval_duration": int(token_latency * len(_pieces(text)) * 1e9),
+        }
+
+    @app.get("/api/tags")
+    async def tags():
+        if app.state.outage:
+            return JSONResponse({"error": "down"}, status_code=503)
+        return {"models": [{"name": model, "model": model}]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        if app.state.outage or rng.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": "server busy"}, status_code=503)
+        if not body.get("prompt"):
+            # Load / unload request: {"model": ..., "keep_alive": 0} unloads right away
+            keep_alive = _keep_alive_seconds(body.get("keep_alive"))
+            slot["loaded_until"] = time.monotonic() + keep_alive
+            if keep_alive == 0:
+                slot["prompt"] = []
+            return {"model": body.get("model", model), "response": "", "done": True,
+                    "done_reason": "unload" if keep_alive == 0 else "load"}
+        text = completion(body)
+        timings = prefill(body)
+
+        if not body.get("stream", True):
+            await asyncio.sleep(timings["delay"] + token_latency * len(_pieces(text)))
+            return {"response": text, **final_chunk(body, text, timings)}
+
+        stats["stream"] += 1
+
+        async def lines():
+            finished = False
+            try:
+                await asyncio.sleep(timings["delay"])
+                for piece in _pieces(text):
+                    await asyncio.sleep(token_latency)
+                    yield json.dumps({"model": body.get("model", model), "response": piece, "done": False}) + "\n"
+                yield json.dumps({"response": "", **final_chunk(body, text, timings)}) + "\n"
+                finished = True
+            finally:
+                if not finished:
+                    stats["closed_early"] += 1
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    ap = argparse.ArgumentParser(description="Fake Ollama server for benchmarks.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=11434)
+    ap.add_argument("--model", default="mistral-LevelDetector")
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--token-latency", type=float, default=0.002)
+    ap.add_argument("--json-error-rate", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--load-latency", type=float, default=0.0)
+    ap.add_argument("--prompt-token-latency", type=float, default=0.0)
+    args = ap.parse_args()
+
+    app = create_app(
+        args.model, args.latency, args.token_latency, args.json_error_rate, args.error_rate, args.seed,
+        args.load_latency, args.prompt_token_latency,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
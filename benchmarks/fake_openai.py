@@ -0,0 +1,133 @@
+# benchmarks/fake_openai.py
+"""
+Stand-in for the OpenAI chat-completions (incl. streaming) and embeddings
+endpoints with configurable latency. Point clients at it with
+OPENAI_BASE_URL=<url>/v1.
+
+    python -m benchmarks.fake_openai --port 8100 --chat-latency 0.3
+"""
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from typing import Any, Dict, List
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+REPLY = "That sounds really hard. I'm here with you. How have you been sleeping lately?"
+
+
+def fake_vector(text: str, dim: int) -> List[float]:
+    """Deterministic unit vector per text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    v = np.random.default_rng(seed).standard_normal(dim)
+    return (v / np.linalg.norm(v)).round(6).tolist()
+
+
+def _words(text: str) -> List[str]:
+    words = text.split(" ")
+    return [w + " " for w in words[:-1]] + words[-1:]
+
+
+def create_app(
+    chat_latency: float = 0.2,
+    token_latency: float = 0.01,
+    embed_latency: float = 0.05,
+    dim: int = 64,
+    reply: str = REPLY,
+) -> FastAPI:
+    """
+    chat_latency: seconds to the first token; token_latency: seconds per word
+    embed_latency: seconds per embeddings request; dim: embedding size
+    """
+    app = FastAPI()
+    stats = {"chat": 0, "chat_stream": 0, "embeddings": 0, "embedded_texts": 0}
+    app.state.stats = stats
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body.get("input")
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        stats["embeddings"] += 1
+        stats["embedded_texts"] += len(inputs)
+        await asyncio.sleep(embed_latency)
+        data = [
+            {"object": "embedding", "index": i, "embedding": fake_vector(json.dumps(text), dim)}
+            for i, text in enumerate(inputs)
+        ]
+        return {"object": "list", "data": data, "model": body.get("model", "fake"), "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+
+    def _usage(messages: List[Dict[str, Any]]) -> Dict[str, int]:
+        prompt_tokens = sum(len(str(m.get("content", ""))) // 4 for m in messages)
+        completion_tokens = len(_words(reply))
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake")
+        created = int(time.time())
+        if not body.get("stream"):
+            stats["chat"] += 1
+            await asyncio.sleep(chat_latency + token_latency * len(_words(reply)))
+            return {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": _usage(body.get("messages") or []),
+            }
+
+        stats["chat_stream"] += 1
+
+        def event(delta: Dict[str, Any], finish=None) -> str:
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            return f"data: {json.dumps(chunk)}\n\n"
+
+        async def events():
+            await asyncio.sleep(chat_latency)
+            yield event({"role": "assistant", "content": ""})
+            for word in _words(reply):
+                await asyncio.sleep(token_latency)
+                yield event({"content": word})
+            yield event({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    ap = argparse.ArgumentParser(description="Fake OpenAI server for benchmarks.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8100)
+    ap.add_argument("--chat-latency", type=float, default=0.2)
+    ap.add_argument("--token-latency", type=float, default=0.01)
+    ap.add_argument("--embed-latency", type=float, default=0.05)
+    ap.add_argument("--dim", type=int, default=64)
+    args = ap.parse_args()
+
+    app = create_app(args.chat_latency, args.token_latency, args.embed_latency, args.dim)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
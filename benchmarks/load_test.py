@@ -0,0 +1,352 @@
+# benchmarks/load_test.py
+"""
+Load test of the whole app against local stand-ins: fake Ollama, fake
+OpenAI (chat + embeddings), a temporary local vector index and mongomock
+for Mongo. Drives /ask, /detect and /summarize at a fixed concurrency and
+reports requests/s, latency percentiles and event-loop blocking.
+
+    python -m benchmarks.load_test --concurrency 16 --requests 400
+    python -m benchmarks.load_test --endpoints detect --compare benchmarks/results/load-<commit>-<time>.json
+
+Results are written to benchmarks/results/load-<commit>-<time>.json so runs
+can be compared between commits. The client, the app and the stand-ins
+share one process, so compare numbers from the same machine only.
+
+mongomock is an optional benchmark-only dependency (pip install mongomock,
+not in requirements.txt); without it use --session-store memory.
+"""
+import os
+import sys
+import json
+import time
+import types
+import random
+import asyncio
+import tempfile
+import argparse
+import subprocess
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+ENDPOINTS = ("ask", "detect", "summarize")
+
+QUERIES = [
+    "hi",
+    "I've been feeling really down lately and I don't know why",
+    "not at all",
+    "several days",
+    "more than half the days, honestly",
+    "I can't sleep and I keep waking up at 3am",
+    "what can I do when I feel hopeless?",
+    "nearly every day",
+    "I'm tired all the time, even after sleeping",
+    "how do I talk to my friends about how I feel?",
+    "I don't really enjoy my hobbies anymore",
+    "ok",
+]
+HISTORY = [
+    "You: hey",
+    "Bot: Hi! How has your week been?",
+    "You: pretty rough, exams are stressing me out",
+    "Bot: That sounds like a lot. How have you been sleeping?",
+    "You: not great",
+    "Bot: I'm sorry to hear that. Have you still been enjoying the things you usually like doing?",
+]
+KNOWLEDGE = [
+    "Depression is a common mental disorder characterised by persistent sadness and loss of interest.",
+    "Regular sleep schedules, daylight exposure and physical activity can help with low mood.",
+    "Talking to someone you trust is often a helpful first step when feeling overwhelmed.",
+    "The PHQ-9 asks about the frequency of nine symptoms over the last two weeks.",
+    "Fatigue and changes in appetite are frequent physical symptoms of depression.",
+]
+
+
+# ---------- event-loop probe ----------
+
+
+class LoopProbe:
+    """
+    ASGI wrapper that samples the server's event-loop lag: a task sleeps for
+    `interval` and records how late it woke up. Lag is time the loop spent
+    blocked by synchronous work.
+    """
+
+    def __init__(self, app, interval: float = 0.005):
+        self.app = app
+        self.interval = interval
+        self.samples: List[Tuple[float, float]] = []  # (monotonic time, lag seconds)
+        self._task: Optional[asyncio.Task] = None
+
+    async def __call__(self, scope, receive, send):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._watch())
+        await self.app(scope, receive, send)
+
+    async def _watch(self) -> None:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.samples.append((now, max(0.0, now - start - self.interval)))
+
+    def summary(self, start: float, end: float, stall: float = 0.05) -> Dict[str, Any]:
+        import numpy as np
+
+        lags = np.asarray([lag for t, lag in self.samples if start <= t <= end], dtype=float)
+        if not len(lags):
+            return {"samples": 0}
+        return {
+            "samples": int(len(lags)),
+            "max_lag_ms": round(float(lags.max()) * 1000, 2),
+            "p99_lag_ms": round(float(np.percentile(lags, 99)) * 1000, 2),
+            "blocked_ms": round(float(lags.sum()) * 1000, 1),
+            "blocked_share": round(float(lags.sum()) / (end - start), 4) if end > start else None,
+            f"stalls_over_{int(stall * 1000)}ms": int((lags > stall).sum()),
+        }
+
+
+# ---------- stand-ins ----------
+
+
+def install_stand_ins(args, openai_base: str, ollama_base: str, index_dir: str, mock_mongo: bool = True) -> None:
+    """Points the service configuration at the stand-ins; must run before importing main."""
+    key_param = types.ModuleType("key_param")
+    key_param.MONGO_URI = "mongodb://127.0.0.1:27017"
+    key_param.openai_api_key = "sk-load-test"
+    sys.modules["key_param"] = key_param
+
+    os.environ.update(
+        {
+            "OPENAI_API_KEY": "sk-load-test",
+            "OPENAI_BASE_URL": openai_base + "/v1",
+            "OPENAI_API_BASE": openai_base + "/v1",
+            "OLLAMA_BASE": ollama_base,
+            "OLLAMA_BASES": ollama_base,
+            "RETRIEVAL_BACKEND": "local",
+            "LOCAL_INDEX_PATH": index_dir,
+            "SESSION_STORE": args.session_store,
+            "LOCAL_SCORER": "1" if args.local_scorer else "0",
+            "DETECT_CACHE": "1" if args.detect_cache else "0",
+            "DETECT_CACHE_PATH": "",
+            "EMBED_CACHE": "1" if args.embed_cache else "0",
+            "EMBED_CACHE_PATH": "",
+            # Build the agent before serving, so no measured request pays for it
+            "APP_WARMUP": "1",
+        }
+    )
+
+    if not mock_mongo:
+        return
+    try:
+        import mongomock
+    except ImportError:
+        mongomock = None
+        print("⚠️ mongomock not installed; Mongo clients stay unconnected (use --session-store memory)")
+    if mongomock is not None:
+        import textChatMode.assesmentAgent.assesmentAgent as agent_module
+
+        agent_module.MongoClient = lambda *a, **kw: mongomock.MongoClient()
+
+
+def build_index(path: str, dim: int, copies: int = 20) -> None:
+    from KnowledgeBase.local_index import LocalIndexWriter
+    from benchmarks.fake_openai import fake_vector
+
+    texts = [f"{text} ({i})" for i in range(copies) for text in KNOWLEDGE]
+    writer = LocalIndexWriter(path, embedding_model="fake", source="load_test")
+    writer.append(
+        [fake_vector(text, dim) for text in texts],
+        [{"id": str(i), "text": text, "metadata": {"source": "load_test"}} for i, text in enumerate(texts)],
+    )
+
+
+def relax_tokenizer(agent) -> None:
+    # Without the tiktoken BPE files (offline) langchain's length check fails
+    from utils.tokens import _encoding
+
+    embedding = getattr(agent.embedding, "inner", agent.embedding)
+    if _encoding(getattr(embedding, "model", "")) is None and hasattr(embedding, "check_embedding_ctx_length"):
+        embedding.check_embedding_ctx_length = False
+
+
+# ---------- payloads ----------
+
+
+def payloads(seed: int) -> Dict[str, Callable[[int], Dict[str, Any]]]:
+    from benchmarks.eval_detector import DEFAULT_DATASET, load_items
+
+    rng = random.Random(seed)
+    answer_sets = [item["answers"] for item in load_items(DEFAULT_DATASET)] or [["not at all"] * 9]
+
+    def ask(i: int) -> Dict[str, Any]:
+        turns = rng.randint(0, len(HISTORY))
+        return {
+            "user_query": QUERIES[i % len(QUERIES)],
+            "history": "\n".join(HISTORY[:turns]),
+            "summaries": [],
+            "asked_phq_ids": sorted(rng.sample(range(1, 10), rng.randint(0, 9))),
+        }
+
+    def detect(i: int) -> Dict[str, Any]:
+        return {"phq9Answers": answer_sets[i % len(answer_sets)]}
+
+    def summarize(i: int) -> Dict[str, Any]:
+        return {"history": "\n".join(HISTORY[: 2 + i % 5]), "previous_summary": "The user is stressed about exams."}
+
+    return {"ask": ask, "detect": detect, "summarize": summarize}
+
+
+# ---------- driver ----------
+
+
+async def drive(base: str, path: str, make: Callable[[int], Dict[str, Any]], total: int, concurrency: int, timeout: float):
+    """Closed loop: `concurrency` workers send `total` requests back to back."""
+    import httpx
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=timeout) as client:
+
+        async def worker():
+            for i in counter:
+                start = time.perf_counter()
+                try:
+                    r = await client.post(path, json=make(i))
+                    status = str(r.status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+    return latencies, statuses, wall
+
+
+def run_phase(base: str, probe: LoopProbe, name: str, make, args) -> Dict[str, Any]:
+    from benchmarks.stats import latency_summary
+
+    path = "/" + name
+    if args.warmup:
+        asyncio.run(drive(base, path, make, args.warmup, args.concurrency, args.timeout))
+    start = time.monotonic()
+    latencies, statuses, wall = asyncio.run(drive(base, path, make, args.requests, args.concurrency, args.timeout))
+    end = time.monotonic()
+    ok = statuses.get("200", 0)
+    return {
+        "requests": len(latencies),
+        "status": statuses,
+        "error_rate": round(1 - ok / len(latencies), 4) if latencies else None,
+        "rps": round(len(latencies) / wall, 2) if wall else None,
+        "latency": latency_summary(latencies),
+        "event_loop": probe.summary(start, end),
+    }
+
+
+# ---------- results ----------
+
+
+def git_revision() -> str:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        return rev + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    print(f"\nΔ vs {previous.get('commit')} ({previous.get('timestamp')})")
+    for name, now in current["results"].items():
+        before = previous.get("results", {}).get(name)
+        if not before:
+            continue
+        rows = [("rps", now.get("rps"), before.get("rps"))]
+        rows += [(k, now["latency"].get(k), before["latency"].get(k)) for k in ("p50_ms", "p95_ms", "p99_ms")]
+        rows.append(("max_lag_ms", now["event_loop"].get("max_lag_ms"), before["event_loop"].get("max_lag_ms")))
+        for metric, a, b in rows:
+            if a is None or b is None:
+                continue
+            change = f"{(a - b) / b * 100:+.1f}%" if b else "n/a"
+            print(f"  {name:<10} {metric:<11} {b:>10} -> {a:<10} {change}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Load test /ask, /detect and /summarize against local stand-ins.")
+    ap.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Comma-separated subset of: " + ", ".join(ENDPOINTS))
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    ap.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per endpoint")
+    ap.add_argument("--timeout", type=float, default=60)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--session-store", default="memory", choices=["memory", "mongo"])
+    ap.add_argument("--local-scorer", action="store_true", help="Keep the local fast path in front of Ollama")
+    ap.add_argument("--detect-cache", action="store_true", help="Keep the /detect result cache on")
+    ap.add_argument("--embed-cache", action="store_true", help="Keep the query-embedding cache on")
+    ap.add_argument("--out", help="Result path (default: benchmarks/results/load-<commit>-<time>.json)")
+    ap.add_argument("--compare", help="Earlier result file to print deltas against")
+    fake = ap.add_argument_group("stand-in latency (seconds)")
+    fake.add_argument("--ollama-latency", type=float, default=0.05)
+    fake.add_argument("--ollama-token-latency", type=float, default=0.002)
+    fake.add_argument("--chat-latency", type=float, default=0.2)
+    fake.add_argument("--chat-token-latency", type=float, default=0.01)
+    fake.add_argument("--embed-latency", type=float, default=0.05)
+    fake.add_argument("--embed-dim", type=int, default=64)
+    args = ap.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        ap.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+
+    from benchmarks import fake_ollama, fake_openai
+    from benchmarks.server_thread import serve_in_thread
+
+    openai_app = fake_openai.create_app(args.chat_latency, args.chat_token_latency, args.embed_latency, args.embed_dim)
+    ollama_app = fake_ollama.create_app(latency=args.ollama_latency, token_latency=args.ollama_token_latency)
+
+    with tempfile.TemporaryDirectory() as index_dir, serve_in_thread(openai_app) as openai_base, serve_in_thread(ollama_app) as ollama_base:
+        build_index(index_dir, args.embed_dim)
+        install_stand_ins(args, openai_base, ollama_base, index_dir)
+
+        import main as service
+
+        probe = LoopProbe(service.app)
+        with serve_in_thread(probe, lifespan="on", timeout=60) as base:
+            relax_tokenizer(service.app.state.agent)
+            makers = payloads(args.seed)
+            results = {}
+            for name in endpoints:
+                print(f"🚀 {name}: {args.requests} requests at concurrency {args.concurrency}")
+                results[name] = run_phase(base, probe, name, makers[name], args)
+                print(json.dumps(results[name]))
+        upstream = {"ollama": dict(ollama_app.state.stats), "openai": dict(openai_app.state.stats)}
+
+    result = {
+        "commit": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "results": results,
+        "upstream": upstream,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out = args.out or os.path.join(RESULTS_DIR, f"load-{result['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"✅ Results saved as {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/ollama_failover.py
+"""
+Multi-host routing scenario against several in-process fake Ollamas:
+    balanced   all hosts up; one is slower, so least-outstanding sends it less
+    outage     host 0 answers 503 to everything; it should be ejected and the
+               callers should not see errors
+    recovered  host 0 is back; a health check returns it to rotation
+
+    python -m benchmarks.ollama_failover --hosts 3 --requests 300 --concurrency 24
+
+Reports per phase the requests each host received, caller-side errors and
+latency, and the pool's view of every host; saved under benchmarks/results/.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from contextlib import ExitStack
+from typing import Any, Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+ANSWERS = ["not at all", "several days", "more than half the days", "nearly every day"]
+
+
+async def run_phase(client, total: int, concurrency: int) -> Dict[str, Any]:
+    from benchmarks.stats import latency_summary
+    from LevelDetection.service.levelDetection import _MIN_SCHEMA, _json_prompt, _numbered
+    from LevelDetection.service.ollama_client import _json_payload, _parse_json_response
+
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            answers = [ANSWERS[(i + q) % len(ANSWERS)] for q in range(9)]
+            start = time.perf_counter()
+            try:
+                data = await client.post_generate(_json_payload(_json_prompt(_numbered(answers)), _MIN_SCHEMA, 200))
+                _parse_json_response(data, _MIN_SCHEMA)
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    return {"errors": errors, "rps": round(total / wall, 2), "latency": latency_summary(latencies)}
+
+
+def pool_state(client) -> List[Dict[str, Any]]:
+    return [{"base": e.base, "healthy": e.healthy, "failures": e.failures} for e in client.pool.endpoints]
+
+
+async def scenario(apps, bases: List[str], args) -> Dict[str, Any]:
+    from LevelDetection.service.ollama_client import AsyncOllamaClient
+    from LevelDetection.service.ollama_pool import ENDPOINT_EJECTIONS
+
+    client = AsyncOllamaClient(bases=bases)
+    client.pool.health_interval = args.health_interval
+    phases: Dict[str, Any] = {}
+
+    async def phase(name: str) -> None:
+        before = [app.state.stats["requests"] for app in apps]
+        result = await run_phase(client, args.requests, args.concurrency)
+        result["host_requests"] = {b: app.state.stats["requests"] - n for b, app, n in zip(bases, apps, before)}
+        result["pool"] = pool_state(client)
+        phases[name] = result
+        print(f"🔁 {name}: {json.dumps(result)}")
+
+    try:
+        await phase("balanced")
+
+        apps[0].state.outage = True
+        await phase("outage")
+
+        apps[0].state.outage = False
+        # Wait for a health check to put host 0 back
+        deadline = time.monotonic() + args.health_interval * 5 + 5
+        while not client.pool.endpoints[0].healthy and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        await phase("recovered")
+    finally:
+        await client.aclose()
+    phases["ejections"] = ENDPOINT_EJECTIONS.snapshot()
+    return phases
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Exercise multi-host Ollama routing against fake servers.")
+    ap.add_argument("--hosts", type=int, default=3)
+    ap.add_argument("--requests", type=int, default=300, help="Requests per phase")
+    ap.add_argument("--concurrency", type=int, default=24)
+    ap.add_argument("--latency", type=float, default=0.05, help="Fake first-token latency")
+    ap.add_argument("--slow-latency", type=float, default=0.2, help="First-token latency of the last host")
+    ap.add_argument("--health-interval", type=float, default=0.5)
+    ap.add_argument("--out", help="Result path (default: benchmarks/results/failover-<time>.json)")
+    args = ap.parse_args()
+    if args.hosts < 2:
+        ap.error("--hosts must be at least 2")
+
+    from benchmarks.fake_ollama import create_app
+    from benchmarks.server_thread import serve_in_thread
+
+    apps = [create_app(latency=args.latency, seed=i) for i in range(args.hosts - 1)]
+    apps.append(create_app(latency=args.slow_latency, seed=args.hosts))
+    with ExitStack() as stack:
+        bases = [stack.enter_context(serve_in_thread(app)) for app in apps]
+        phases = asyncio.run(scenario(apps, bases, args))
+
+    result = {"config": vars(args), "hosts": bases, "phases": phases}
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out = args.out or os.path.join(RESULTS_DIR, f"failover-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"✅ Results saved as {out}")
+
+
+if __name__ == "__main__":
+    main()
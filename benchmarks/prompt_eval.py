@@ -0,0 +1,133 @@
+# benchmarks/prompt_eval.py
+"""
+Prompt-evaluation cost of the detection prompts, from the timings Ollama
+reports (load_duration, prompt_eval_count / _duration), for two layouts:
+    current        the app's prompts; the text prompt keeps the fine-tune
+                   layout, with the format lines after the answers
+    format_first   candidate text layout with the format lines moved ahead
+                   of the answers, for a longer reusable prefix (the JSON
+                   prompt is the same in both)
+The candidate changes what the fine-tuned model sees, so it is only worth
+adopting if eval_detector accuracy holds on a real model as well.
+Each layout starts cold (model unloaded with keep_alive=0), then sends
+--requests generations with varying answers on one path (json / text).
+Run it against a real host to see prefix reuse; --fake uses an in-process
+stand-in that emulates model load and a one-slot prefix cache, which only
+checks the mechanics.
+
+    python -m benchmarks.prompt_eval --base http://localhost:11434 --requests 20
+    python -m benchmarks.prompt_eval --fake
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+ANSWERS = ["not at all", "several days", "more than half the days", "nearly every day"]
+
+
+def _format_first_text_prompt(numbered: str) -> str:
+    # Candidate layout, not what the model was fine-tuned on
+    return f"""
+[INST] Analyze the following PHQ-9 responses and provide the score and depression level.
+Respond EXACTLY in this format (no extra words):
+PHQ-9 Score: <number>
+Depression Level: <Minimal|Mild|Moderate|Moderately Severe|Severe>
+
+{numbered} [/INST]
+"""
+
+
+def builders() -> Dict[str, Dict[str, Callable[[List[str]], dict]]]:
+    from LevelDetection.service.levelDetection import _MIN_SCHEMA, _json_prompt, _numbered, _text_prompt
+    from LevelDetection.service.ollama_client import _json_payload, _text_payload
+
+    def json_payload(a: List[str]) -> dict:
+        return _json_payload(_json_prompt(_numbered(a)), _MIN_SCHEMA, 200)
+
+    return {
+        "current": {
+            "json": json_payload,
+            "text": lambda a: _text_payload(_text_prompt(_numbered(a)), 0.0, 40),
+        },
+        "format_first": {
+            "json": json_payload,
+            "text": lambda a: _text_payload(_format_first_text_prompt(_numbered(a)), 0.0, 40),
+        },
+    }
+
+
+def _row(data: Dict[str, Any], wall: float) -> Dict[str, float]:
+    return {
+        "wall_ms": round(wall * 1000, 1),
+        "load_ms": round(data.get("load_duration", 0) / 1e6, 1),
+        "prompt_eval_count": data.get("prompt_eval_count", 0),
+        "prompt_eval_ms": round(data.get("prompt_eval_duration", 0) / 1e6, 1),
+    }
+
+
+def run_layout(client, model: str, build: Callable[[List[str]], dict], requests: int) -> Dict[str, Any]:
+    # Start cold: unload the model (and with it the prompt cache)
+    client.post("/api/generate", json={"model": model, "keep_alive": 0}).raise_for_status()
+    rows = []
+    for i in range(requests + 1):
+        answers = [ANSWERS[(i * 7 + q * (i + 1)) % len(ANSWERS)] for q in range(9)]
+        start = time.perf_counter()
+        r = client.post("/api/generate", json={**build(answers), "stream": False})
+        r.raise_for_status()
+        rows.append(_row(r.json(), time.perf_counter() - start))
+    warm = rows[1:]
+    return {
+        "cold": rows[0],
+        "warm_median": {k: round(statistics.median(r[k] for r in warm), 1) for k in warm[0]} if warm else {},
+        "runs": rows,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare Ollama prompt evaluation for the current and a candidate prompt layout.")
+    ap.add_argument("--base", help="Ollama host (default: first of OLLAMA_BASES / OLLAMA_BASE)")
+    ap.add_argument("--fake", action="store_true", help="Use an in-process fake Ollama instead")
+    ap.add_argument("--paths", default="json,text", help="Comma-separated subset of: json, text")
+    ap.add_argument("--requests", type=int, default=10, help="Warm requests per layout and path")
+    ap.add_argument("--out", help="Result path (default: benchmarks/results/prompt-eval-<time>.json)")
+    args = ap.parse_args()
+
+    import httpx
+    from LevelDetection.service.ollama_client import BASES, LEVEL_MODEL
+
+    if args.fake:
+        from benchmarks.fake_ollama import create_app
+        from benchmarks.server_thread import serve_in_thread
+
+        server = serve_in_thread(create_app(latency=0.01, load_latency=1.0, prompt_token_latency=0.002))
+    else:
+        server = nullcontext(args.base or BASES[0])
+
+    results: Dict[str, Any] = {}
+    with server as base, httpx.Client(base_url=base, timeout=300) as client:
+        for path in [p.strip() for p in args.paths.split(",") if p.strip()]:
+            for layout, build in builders().items():
+                result = run_layout(client, LEVEL_MODEL, build[path], args.requests)
+                results[f"{layout}/{path}"] = result
+                print(f"🧮 {layout}/{path}: cold={json.dumps(result['cold'])} warm={json.dumps(result['warm_median'])}")
+
+    result = {"base": "fake" if args.fake else base, "model": LEVEL_MODEL,
+              "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out = args.out or os.path.join(RESULTS_DIR, f"prompt-eval-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"✅ Results saved as {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+# benchmarks/server_thread.py
+import time
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+import uvicorn
+
+
+@contextmanager
+def serve_in_thread(app, host: str = "127.0.0.1", port: int = 0, lifespan: str = "off", timeout: float = 10) -> Iterator[str]:
+    """Runs an ASGI app on a background thread; yields its base URL (port=0 picks a free port)."""
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan=lifespan))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + timeout
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError(f"Server on {host}:{port} did not start")
+        time.sleep(0.01)
+    bound_port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        yield f"http://{host}:{bound_port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
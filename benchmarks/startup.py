@@ -0,0 +1,174 @@
+# benchmarks/startup.py
+"""
+Cold-start benchmark: spawns fresh app workers against the local stand-ins
+(fake Ollama / OpenAI, temporary vector index) and measures
+    import_seconds   `import main` inside the worker
+    ready_seconds    process spawn until GET / answers (includes APP_WARMUP)
+    first_*_ms       latency of the first /detect and /ask on that worker
+    warm_ask_ms      the second /ask, for comparison
+with lazy loading (default) and with APP_WARMUP=1.
+
+    python -m benchmarks.startup --runs 5
+
+Which modules dominate the import: python -X importtime -c "import main"
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+from typing import Any, Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DETECT_BODY = {"phq9Answers": ["several days"] * 9}
+# Short PHQ-phase answer: the retrieval gate skips vector search, so only the agent build + one completion
+ASK_BODY = {"user_query": "several days", "history": "", "summaries": [], "asked_phq_ids": [1, 2]}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def child(args) -> None:
+    """Worker process: configure the stand-ins, import main, serve."""
+    from benchmarks.load_test import install_stand_ins
+
+    install_stand_ins(
+        argparse.Namespace(session_store="memory", local_scorer=False, detect_cache=False, embed_cache=False),
+        args.openai,
+        args.ollama,
+        args.index,
+        mock_mongo=False,  # nothing touches Mongo with the local index and in-memory sessions
+    )
+    os.environ["APP_WARMUP"] = "1" if args.warmup else "0"
+
+    start = time.perf_counter()
+    import main
+
+    import_seconds = time.perf_counter() - start
+    with open(args.report_file, "w", encoding="utf-8") as f:
+        json.dump({"import_seconds": import_seconds}, f)
+
+    import uvicorn
+
+    uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def one_run(warmup: bool, openai_base: str, ollama_base: str, index_dir: str, verbose: bool) -> Dict[str, Any]:
+    import httpx
+
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as tmp:
+        report_file = os.path.join(tmp, "child.json")
+        cmd = [
+            sys.executable, "-m", "benchmarks.startup", "--child",
+            "--port", str(port), "--openai", openai_base, "--ollama", ollama_base,
+            "--index", index_dir, "--report-file", report_file,
+        ] + (["--warmup"] if warmup else [])
+        output = None if verbose else subprocess.DEVNULL
+
+        spawned = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=ROOT, stdout=output, stderr=output)
+        try:
+            with httpx.Client(base_url=base, timeout=60) as client:
+                deadline = spawned + 120
+                while True:
+                    if proc.poll() is not None:
+                        raise RuntimeError(f"Worker exited with {proc.returncode} before it was ready")
+                    if time.perf_counter() > deadline:
+                        raise RuntimeError("Worker did not become ready in 120 s")
+                    try:
+                        if client.get("/").status_code == 200:
+                            break
+                    except httpx.TransportError:
+                        time.sleep(0.02)
+                ready = time.perf_counter() - spawned
+
+                timings = {}
+                for name, path, body in (
+                    ("first_detect_ms", "/detect", DETECT_BODY),
+                    ("first_ask_ms", "/ask", ASK_BODY),
+                    ("warm_ask_ms", "/ask", ASK_BODY),
+                ):
+                    start = time.perf_counter()
+                    r = client.post(path, json=body)
+                    r.raise_for_status()
+                    timings[name] = round((time.perf_counter() - start) * 1000, 1)
+            with open(report_file, encoding="utf-8") as f:
+                child_report = json.load(f)
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+    return {"import_seconds": round(child_report["import_seconds"], 3), "ready_seconds": round(ready, 3), **timings}
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {key: round(statistics.median(r[key] for r in runs), 3) for key in runs[0]}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure worker import, readiness and first-request latency.")
+    ap.add_argument("--runs", type=int, default=3, help="Fresh workers per mode")
+    ap.add_argument("--modes", default="lazy,warmup", help="Comma-separated subset of: lazy, warmup")
+    ap.add_argument("--out", help="Result path (default: benchmarks/results/startup-<commit>-<time>.json)")
+    ap.add_argument("--verbose", action="store_true", help="Show worker output")
+    # worker side (internal)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--warmup", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    ap.add_argument("--openai", help=argparse.SUPPRESS)
+    ap.add_argument("--ollama", help=argparse.SUPPRESS)
+    ap.add_argument("--index", help=argparse.SUPPRESS)
+    ap.add_argument("--report-file", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    from benchmarks import fake_ollama, fake_openai
+    from benchmarks.load_test import build_index, git_revision
+    from benchmarks.server_thread import serve_in_thread
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as index_dir, \
+            serve_in_thread(fake_openai.create_app(0.05, 0.001, 0.01, 64)) as openai_base, \
+            serve_in_thread(fake_ollama.create_app(latency=0.02)) as ollama_base:
+        build_index(index_dir, 64)
+        for mode in modes:
+            runs = []
+            for i in range(args.runs):
+                runs.append(one_run(mode == "warmup", openai_base, ollama_base, index_dir, args.verbose))
+                print(f"⏱️ {mode} run {i + 1}: {json.dumps(runs[-1])}")
+            results[mode] = {"median": summarize(runs), "runs": runs}
+
+    result = {
+        "commit": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out = args.out or os.path.join(RESULTS_DIR, f"startup-{result['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps({mode: r["median"] for mode, r in results.items()}, indent=2))
+    print(f"✅ Results saved as {out}")
+
+
+if __name__ == "__main__":
+    main()
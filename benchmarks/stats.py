@@ -0,0 +1,20 @@
+# benchmarks/stats.py
+from typing import Dict, Iterable
+
+import numpy as np
+
+
+def latency_summary(seconds: Iterable[float]) -> Dict[str, float]:
+    """Milliseconds: count, mean, p50/p95/p99, max."""
+    values = np.asarray(list(seconds), dtype=float) * 1000
+    if not len(values):
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(len(values)),
+        "mean_ms": round(float(values.mean()), 2),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
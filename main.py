@@ -1,5 +1,8 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 import sys
 import os
 from dotenv import load_dotenv
@@ -7,9 +10,55 @@ load_dotenv()
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))) 
 
 from textChatMode.chat import router as ask_router
+from textChatMode.session_chat import router as session_router
+from textChatMode.dependencies import ensure_agent, ensure_sessions
 from LevelDetection.router.levelDetection import router as level_detection_router
+from LevelDetection.service.ollama_client import aclose_async_client
+from LevelDetection.service.batcher import aclose_batcher
+from LevelDetection.service.result_cache import close_cache as close_detect_cache
+from LevelDetection.service.levelDetection import awarmup as awarm_ollama, preload as preload_detection
+from utils.admission import Overloaded
+from utils.metrics import render_prometheus, snapshot as metrics_snapshot
+from utils.timing import ServerTimingMiddleware
+from utils.tokens import count_tokens
 
-app = FastAPI()
+
+# Heavy dependencies load on first use; APP_WARMUP=1 loads them before the worker accepts traffic
+APP_WARMUP = os.getenv("APP_WARMUP", "0").lower() in ("1", "true", "yes")
+
+
+def warmup(app: FastAPI) -> None:
+    """Preloads what the first /ask and /detect would otherwise pay for (no upstream calls)."""
+    from textChatMode.assesmentAgent.assesmentAgent import CHAT_MODEL
+
+    ensure_agent(app)
+    ensure_sessions(app)
+    preload_detection()
+    count_tokens("warmup", CHAT_MODEL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The /ask pipeline (pooled Mongo + HTTP clients) is built once per process, on first use
+    if APP_WARMUP:
+        await asyncio.to_thread(warmup, app)
+        # Load the model on every Ollama host and cache the static prompt prefixes
+        await awarm_ollama()
+    try:
+        yield
+    finally:
+        sessions = getattr(app.state, "sessions", None)
+        if sessions is not None:
+            sessions.close()
+        agent = getattr(app.state, "agent", None)
+        if agent is not None:
+            await agent.aclose()
+        await aclose_batcher()
+        await aclose_async_client()
+        close_detect_cache()
+
+
+app = FastAPI(lifespan=lifespan)
  
 # Enable CORS
 app.add_middleware(
@@ -18,12 +67,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Retry-After"],
 )
+# Per-stage timings as a Server-Timing header + request latency histogram
+app.add_middleware(ServerTimingMiddleware)
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    # Shed load right away instead of queueing onto an upstream that would time out
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 # Register routes from other files
 app.include_router(ask_router)
+app.include_router(session_router)
 app.include_router(level_detection_router)
 
 @app.get("/")
 def root():
     return {"message": "All endpoints loaded successfully"}
+
+@app.get("/metrics")
+def metrics(request: Request, format: str = ""):
+    # Prometheus scrapers ask for text/plain (or OpenMetrics); everyone else gets JSON
+    accept = request.headers.get("accept", "")
+    if format == "prometheus" or "text/plain" in accept or "openmetrics" in accept:
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+    return metrics_snapshot()
@@ -0,0 +1,74 @@
+# tests/test_detect_admission.py
+import asyncio
+from collections import Counter
+
+import httpx
+import pytest
+
+import main
+from LevelDetection.service import batcher, result_cache
+
+
+async def _slow_detect(answers):
+    await asyncio.sleep(0.2)
+    return {"phq9_score": 5, "level": "Mild"}
+
+
+@pytest.fixture
+def slow_detector(monkeypatch):
+    """The default batcher settings in front of a slow detector; no result cache."""
+    monkeypatch.setattr(result_cache, "DETECT_CACHE", False)
+
+    async def run(scenario):
+        monkeypatch.setattr(batcher, "_batcher", batcher.MicroBatcher(handler=_slow_detect))
+        transport = httpx.ASGITransport(app=main.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+                return await scenario(client)
+        finally:
+            await batcher.aclose_batcher()
+
+    return lambda scenario: asyncio.run(run(scenario))
+
+
+def _answers(tag, i):
+    return {"phq9Answers": [f"{tag} {i}"] * 9}
+
+
+def test_detect_returns_429_under_overload(slow_detector):
+    capacity = batcher.BATCH_PARALLELISM + batcher.BATCH_MAX_QUEUE
+
+    async def scenario(client):
+        responses = await asyncio.gather(*(client.post("/detect", json=_answers("flood", i)) for i in range(capacity + 50)))
+        return responses
+
+    responses = slow_detector(scenario)
+    statuses = Counter(r.status_code for r in responses)
+    assert statuses[200] == capacity
+    assert statuses[429] == 50
+    assert all(int(r.headers["Retry-After"]) >= 1 for r in responses if r.status_code == 429)
+
+
+def test_detect_batch_returns_429_for_the_whole_batch(slow_detector):
+    capacity = batcher.BATCH_PARALLELISM + batcher.BATCH_MAX_QUEUE
+
+    async def scenario(client):
+        flood = [asyncio.create_task(client.post("/detect", json=_answers("flood", i))) for i in range(capacity)]
+        while batcher.get_batcher()._admission.waiting < batcher.BATCH_MAX_QUEUE:
+            await asyncio.sleep(0.01)
+        batch = await client.post("/detect/batch", json={"items": [_answers("batch", i) for i in range(5)]})
+        await asyncio.gather(*flood)
+        return batch
+
+    batch = slow_detector(scenario)
+    assert batch.status_code == 429
+    assert "Retry-After" in batch.headers
+
+
+def test_detect_batch_fits_when_idle(slow_detector):
+    async def scenario(client):
+        return await client.post("/detect/batch", json={"items": [_answers("idle", i) for i in range(100)]})
+
+    batch = slow_detector(scenario)
+    assert batch.status_code == 200
+    assert [item["level"] for item in batch.json()["results"]] == ["Mild"] * 100
@@ -0,0 +1,89 @@
+# tests/test_phq_scoring.py
+import asyncio
+
+import pytest
+
+from textChatMode.phq_scoring import score_rule, score_turn, score_with_llm
+from textChatMode.sessions import InMemorySessionStore
+
+
+@pytest.mark.parametrize("answer", [
+    "not every day",
+    "Not often.",
+    "not a lot",
+    "no, not every day",
+    "not that often",
+    "not nearly every day",
+])
+def test_negated_frequency_defers_to_llm(answer):
+    assert score_rule(answer) is None
+
+
+@pytest.mark.parametrize("answer, score", [
+    ("not at all", 0),
+    ("Not really", 0),
+    ("never", 0),
+    ("several days", 1),
+    ("sometimes", 1),
+    ("more than half the days", 2),
+    ("a lot", 2),
+    ("I don't sleep well most days", 2),
+    ("nearly every day", 3),
+    ("almost every day", 3),
+])
+def test_rule_scores(answer, score):
+    assert score_rule(answer) == score
+
+
+class _FailingLLM:
+    async def ainvoke(self, messages):
+        raise RuntimeError("upstream down")
+
+
+class _LLM:
+    def __init__(self, reply: str):
+        self.reply = reply
+
+    async def ainvoke(self, messages):
+        return type("Reply", (), {"content": self.reply})()
+
+
+def test_failed_llm_scoring_is_kept_in_session():
+    async def run():
+        store = InMemorySessionStore()
+        session = await store.create()
+        await score_with_llm(store, session.id, 9, "hard to say", _FailingLLM())
+        assert (await store.get(session.id)).phq_answers == {9: "hard to say"}
+
+        await score_with_llm(store, session.id, 9, "hard to say", _LLM("1"))
+        session = await store.get(session.id)
+        assert session.phq_scores == {9: 1}
+        assert session.phq_answers == {}
+
+    asyncio.run(run())
+
+
+class _Tasks:
+    def __init__(self):
+        self.tasks = []
+
+    def add_task(self, fn, *args):
+        self.tasks.append((fn, args))
+
+
+def test_unscored_answer_is_retried_on_next_turn():
+    async def run():
+        store = InMemorySessionStore()
+        session = await store.get_or_create("client-chosen")
+        await store.set_phq_answer(session.id, 3, "hard to say")
+        session = await store.get(session.id)
+
+        tasks = _Tasks()
+        scores = await score_turn(store, session, [3, 4], "nearly every day", tasks, _LLM("2"))
+        assert scores == {4: 3}
+        assert [args[2] for _, args in tasks.tasks] == [3]
+        for fn, args in tasks.tasks:
+            await fn(*args)
+        assert (await store.get(session.id)).phq_scores == {3: 2, 4: 3}
+
+    asyncio.run(run())
@@ -0,0 +1,27 @@
+# tests/test_retrieval_gate.py
+from textChatMode.retrieval_gate import needs_retrieval
+
+ALL_ASKED = list(range(1, 10))
+ANSWER = "I feel that way nearly every day"
+
+
+def test_answer_to_item_9_skips_retrieval():
+    scores = {i: 1 for i in range(1, 9)}
+    assert needs_retrieval(ANSWER, ALL_ASKED, scores) == (False, "phq_answer")
+
+
+def test_answer_to_item_9_skips_retrieval_without_scores():
+    assert needs_retrieval(ANSWER, ALL_ASKED) == (False, "phq_answer")
+
+
+def test_after_all_items_are_scored_answers_are_not_gated():
+    scores = {i: 1 for i in range(1, 10)}
+    assert needs_retrieval(ANSWER, ALL_ASKED, scores) == (True, "default")
+
+
+def test_before_any_question_answers_are_not_gated():
+    assert needs_retrieval(ANSWER, [], {}) == (True, "default")
+
+
+def test_knowledge_questions_always_retrieve():
+    assert needs_retrieval("how can I sleep better", ALL_ASKED, {}) == (True, "keyword")
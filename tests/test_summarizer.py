@@ -0,0 +1,71 @@
+# tests/test_summarizer.py
+import asyncio
+
+from textChatMode import summarizer
+from textChatMode.sessions import InMemorySessionStore
+from utils.tokens import chunk_lines
+
+
+class _LLM:
+    """Replies with the number of folds so far; fails from call `fail_at` on."""
+
+    def __init__(self, fail_at: int = 0):
+        self.calls = 0
+        self.fail_at = fail_at
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        if self.fail_at and self.calls >= self.fail_at:
+            raise RuntimeError("upstream down")
+        return type("Reply", (), {"content": f"summary {self.calls}"})()
+
+
+def test_chunk_lines_keeps_every_line_in_order():
+    lines = [f"User: line {i} " + "word " * 10 for i in range(20)]
+    chunks = chunk_lines(lines, 40)
+    assert len(chunks) > 1
+    assert [line for chunk in chunks for line in chunk] == lines
+
+
+def test_chunk_lines_cuts_a_line_over_the_budget():
+    chunks = chunk_lines(["short", "x" * 1000, "short"], 20)
+    assert [len(chunk) for chunk in chunks] == [1, 1, 1]
+    assert len(chunks[1][0]) < 1000
+
+
+def _session_with_history(store, lines):
+    async def run():
+        session = await store.create()
+        for i in range(0, len(lines), 2):
+            await store.append_turn(session.id, lines[i], lines[i + 1], None)
+        return session.id
+
+    return asyncio.run(run())
+
+
+def test_update_session_folds_long_backlog_in_chunks(monkeypatch):
+    monkeypatch.setattr(summarizer, "SUMMARY_INPUT_TOKEN_BUDGET", 40)
+    store = InMemorySessionStore()
+    lines = [f"User: line {i} " + "word " * 10 for i in range(20)]
+    session_id = _session_with_history(store, lines)
+    llm = _LLM()
+
+    asyncio.run(summarizer.RollingSummarizer(llm).update_session(store, session_id, keep_recent=0, min_new_lines=1))
+
+    session = asyncio.run(store.get(session_id))
+    assert llm.calls == len(chunk_lines(lines, 40)) > 1
+    assert session.summarized_upto == len(lines)
+    assert session.summary == f"summary {llm.calls}"
+
+
+def test_update_session_only_advances_past_folded_lines(monkeypatch):
+    monkeypatch.setattr(summarizer, "SUMMARY_INPUT_TOKEN_BUDGET", 40)
+    store = InMemorySessionStore()
+    lines = [f"User: line {i} " + "word " * 10 for i in range(20)]
+    session_id = _session_with_history(store, lines)
+
+    asyncio.run(summarizer.RollingSummarizer(_LLM(fail_at=2)).update_session(store, session_id, keep_recent=0, min_new_lines=1))
+
+    session = asyncio.run(store.get(session_id))
+    assert session.summarized_upto == len(chunk_lines(lines, 40)[0])
+    assert session.summary == "summary 1"
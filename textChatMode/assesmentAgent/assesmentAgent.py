@@ -0,0 +1,308 @@
+# textChatMode/assesmentAgent/assesmentAgent.py
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+from pymongo import MongoClient
+from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+
+from KnowledgeBase.vector_store import build_vectorstore
+from utils.phq9_questions import PHQ9_QUESTIONS
+from utils.timing import UPSTREAM_ERRORS, record, stage
+from ..embedding_cache import EMBED_CACHE, CachedEmbeddings, build_embedding_cache
+from ..prompt_builder import assemble
+from ..retrieval_gate import needs_retrieval
+from ..summarizer import RollingSummarizer
+import key_param
+
+# Pool sizes (override via env)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-3.5-turbo")
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", CHAT_MODEL)
+
+CHAT_PROMPT = """
+You are a friendly chatbot who talks like a kind friend.
+
+Be warm and caring. Avoid long or repetitive responses. Never say the same supportive line more than once.
+
+Your job is to gently explore how the user feels and try to understand user by asking questions, and ask PHQ-9 questions naturally when ready.
+
+NEVER mention PHQ-9 or say "I cannot help you".
+
+Avoid medical or crisis terms unless directly asked.
+
+Keep your replies short and friendly. One question per message. Once PHQ-9 starts, go through them without pausing.
+
+Past summaries:
+{summary_text}
+
+Relevant context:
+{context_text}
+
+Conversation history:
+{history}
+
+{phq_instruction}
+
+User just said: "{query}"
+
+Now reply like a kind friend:
+"""
+
+
+class DepressionAgent:
+    """
+    /ask pipeline: retrieval over the knowledge base + one chat completion.
+    Built once per process; owns the pooled Mongo and HTTP clients.
+    """
+
+    def __init__(
+        self,
+        mongo_uri: str,
+        openai_api_key: Optional[str] = None,
+        chat_model: str = CHAT_MODEL,
+        temperature: float = 0.7,
+        k: int = 3,
+    ):
+        openai_api_key = openai_api_key or key_param.openai_api_key
+        self.k = k
+        self.chat_model = chat_model
+
+        # One client per process; pymongo keeps its own connection pool.
+        self._mongo = MongoClient(mongo_uri, maxPoolSize=MONGO_MAX_POOL_SIZE)
+
+        # Shared keep-alive pools for every OpenAI call (embeddings + chat).
+        limits = httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+        )
+        self._http = httpx.Client(limits=limits)
+        self._ahttp = httpx.AsyncClient(limits=limits)
+
+        self.embedding = OpenAIEmbeddings(
+            openai_api_key=openai_api_key,
+            http_client=self._http,
+            http_async_client=self._ahttp,
+        )
+        # Repeated chat messages ("not at all", "several days") skip the embedding round trip
+        self._embedding_cache = None
+        if EMBED_CACHE:
+            self._embedding_cache = build_embedding_cache()
+            self.embedding = CachedEmbeddings(self.embedding, self._embedding_cache)
+        # Atlas or the local memory-mapped index, per RETRIEVAL_BACKEND
+        self.vectorstore = build_vectorstore(self.embedding, self._mongo)
+        self.llm = ChatOpenAI(
+            model=chat_model,
+            openai_api_key=openai_api_key,
+            temperature=temperature,
+            http_client=self._http,
+            http_async_client=self._ahttp,
+        )
+        self.summarizer = RollingSummarizer(
+            ChatOpenAI(
+                model=SUMMARY_MODEL,
+                openai_api_key=openai_api_key,
+                temperature=0.2,
+                http_client=self._http,
+                http_async_client=self._ahttp,
+            )
+        )
+
+    # ---------- prompt ----------
+
+    def _next_phq_question(self, asked_phq_ids: List[int]) -> Optional[Dict[str, Any]]:
+        unasked_questions = [q for q in PHQ9_QUESTIONS if q["id"] not in asked_phq_ids]
+        return unasked_questions[0] if unasked_questions else None
+
+    def build_prompt(
+        self,
+        query: str,
+        history: str,
+        summaries: List[str],
+        asked_phq_ids: List[int],
+        context_texts: List[str],
+        user_turns: Optional[int] = None,
+    ):
+        """
+        Returns (chat_prompt, matched_q) for one /ask turn.
+        user_turns comes from the session when there is one; otherwise it is
+        counted from the history text. The sections are fitted to
+        PROMPT_TOKEN_BUDGET by prompt_builder.assemble().
+        """
+        next_phq_q = self._next_phq_question(asked_phq_ids)
+
+        # Determine if we are in early stage (first 2 turns)
+        if user_turns is None:
+            user_turns = len([line for line in history.splitlines() if line.lower().startswith("you:") or line.lower().startswith("user:")])
+        early_stage = user_turns < 3
+
+        phq_instruction = ""
+        if next_phq_q and not early_stage:
+            if not asked_phq_ids:
+                phq_instruction += f"""
+You may now gently say something like:
+"To better understand how you're doing, I'd like to ask a few short questions on how you feel in past two weeks."
+
+Then ask this question:
+- "{next_phq_q['question']}" (meaning: {next_phq_q['meaning']})
+"""
+            else:
+                phq_instruction += f"""
+Continue with the next question:
+- "{next_phq_q['question']}" (meaning: {next_phq_q['meaning']})
+"""
+
+            phq_instruction += """
+Make your response short and caring. Don't explain too much. No repetition. Only ask one PHQ-9 question per message.
+Let user respond with:
+- not at all
+- several days
+- more than half the days
+- nearly every day
+"""
+
+        chat_prompt = assemble(
+            CHAT_PROMPT, query, phq_instruction, history, context_texts, summaries or [], self.chat_model
+        )
+        matched_q = next_phq_q if not early_stage else None
+        return chat_prompt, matched_q
+
+    @staticmethod
+    def _response(final_text: str, matched_q: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "response": final_text,
+            "phq9_questionID": matched_q["id"] if matched_q else None,
+            "phq9_question": matched_q["question"] if matched_q else None,
+        }
+
+    # ---------- run ----------
+
+    @staticmethod
+    def _gated_context(
+        query: str, asked_phq_ids: List[int], last_context: Optional[List[str]], phq_scores: Optional[Dict[int, int]]
+    ) -> Tuple[bool, List[str]]:
+        """(search needed, context to reuse when it is not)."""
+        retrieve, _ = needs_retrieval(query, asked_phq_ids, phq_scores)
+        if retrieve:
+            return True, []
+        return False, list(last_context or [])
+
+    def run(
+        self,
+        query: str,
+        history: str,
+        summaries: List[str],
+        asked_phq_ids: List[int],
+        user_turns: Optional[int] = None,
+        last_context: Optional[List[str]] = None,
+        phq_scores: Optional[Dict[int, int]] = None,
+    ) -> Dict[str, Any]:
+        retrieve, context_texts = self._gated_context(query, asked_phq_ids, last_context, phq_scores)
+        if retrieve:
+            with stage("embed", upstream="openai"):
+                vector = self.embedding.embed_query(query)
+            with stage("vector_search"):
+                similar_docs = self.vectorstore.similarity_search_by_vector(vector, k=self.k)
+            context_texts = [doc.page_content for doc in similar_docs]
+
+        with stage("prompt_build"):
+            chat_prompt, matched_q = self.build_prompt(query, history, summaries, asked_phq_ids, context_texts, user_turns)
+        with stage("llm", upstream="openai"):
+            chat_response = self.llm.invoke([{"role": "system", "content": chat_prompt}])
+        return self._response(chat_response.content.strip(), matched_q)
+
+    async def _aprepare(self, query, history, summaries, asked_phq_ids, user_turns=None, session_id=None, store=None,
+                        last_context=None, phq_scores=None):
+        retrieve, context_texts = self._gated_context(query, asked_phq_ids, last_context, phq_scores)
+        if retrieve:
+            # Embedding and search timed apart; the first Atlas search includes the Mongo connect
+            with stage("embed", upstream="openai"):
+                vector = await self.embedding.aembed_query(query)
+            with stage("vector_search"):
+                similar_docs = await self.vectorstore.asimilarity_search_by_vector(vector, k=self.k)
+            context_texts = [doc.page_content for doc in similar_docs]
+            if store is not None and session_id:
+                # Kept with the session, so gated turns on any worker reuse it
+                await store.update_fields(session_id, {"last_context": context_texts})
+        with stage("prompt_build"):
+            return self.build_prompt(query, history, summaries, asked_phq_ids, context_texts, user_turns)
+
+    async def arun(
+        self,
+        query: str,
+        history: str,
+        summaries: List[str],
+        asked_phq_ids: List[int],
+        user_turns: Optional[int] = None,
+        session_id: Optional[str] = None,
+        store=None,
+        last_context: Optional[List[str]] = None,
+        phq_scores: Optional[Dict[int, int]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Same as run() but never blocks the event loop. With a session store,
+        the retrieved context is saved on the session for later gated turns.
+        """
+        chat_prompt, matched_q = await self._aprepare(
+            query, history, summaries, asked_phq_ids, user_turns, session_id, store, last_context, phq_scores
+        )
+        with stage("llm", upstream="openai"):
+            chat_response = await self.llm.ainvoke([{"role": "system", "content": chat_prompt}])
+        return self._response(chat_response.content.strip(), matched_q)
+
+    async def astream(
+        self,
+        query: str,
+        history: str,
+        summaries: List[str],
+        asked_phq_ids: List[int],
+        user_turns: Optional[int] = None,
+        session_id: Optional[str] = None,
+        store=None,
+        last_context: Optional[List[str]] = None,
+        phq_scores: Optional[Dict[int, int]] = None,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Yields ("token", text) as the reply is generated, then one
+        ("done", response) with the same shape arun() returns.
+        """
+        chat_prompt, matched_q = await self._aprepare(
+            query, history, summaries, asked_phq_ids, user_turns, session_id, store, last_context, phq_scores
+        )
+        parts = []
+        start = time.perf_counter()
+        try:
+            async for chunk in self.llm.astream([{"role": "system", "content": chat_prompt}]):
+                if chunk.content:
+                    if not parts:
+                        record("llm_first_token", time.perf_counter() - start)
+                    parts.append(chunk.content)
+                    yield "token", chunk.content
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(upstream="openai", kind=type(e).__name__)
+            raise
+        record("llm", time.perf_counter() - start)
+        yield "done", self._response("".join(parts).strip(), matched_q)
+
+    # ---------- lifecycle ----------
+
+    @property
+    def mongo(self) -> MongoClient:
+        """The pooled client, shared with other Mongo-backed stores."""
+        return self._mongo
+
+    async def aclose(self) -> None:
+        await self._ahttp.aclose()
+        self._http.close()
+        self._mongo.close()
+        if self._embedding_cache is not None:
+            self._embedding_cache.close()
+
+
+def build_agent() -> DepressionAgent:
+    """Default agent (see dependencies.ensure_agent)."""
+    return DepressionAgent(mongo_uri=key_param.MONGO_URI)
@@ -1,8 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from typing import List
 from .assesmentAgent import DepressionAgent
-import key_param
+from ..dependencies import get_agent
 
 router = APIRouter()
 
@@ -20,16 +20,9 @@ class QueryRequest(BaseModel):
     summaries: List[str] = []
     asked_phq_ids: List[int] = []
 
-AGENT = DepressionAgent(
-    mongo_uri=key_param.MONGO_URI,
-    db_name="Depression_Knowledge_Base",
-    collection_name="depression",
-    index_name="default1",
-)
-
 @router.post("/ask")
-async def ask_question(data: QueryRequest):
-    return AGENT.run(
+async def ask_question(data: QueryRequest, agent: DepressionAgent = Depends(get_agent)):
+    return await agent.arun(
         query=data.user_query,
         history=data.history,
         summaries=data.summaries,
@@ -1,12 +1,17 @@
-from fastapi import APIRouter
+import json
+from fastapi import APIRouter, BackgroundTasks, Depends, Request
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
 from pydantic import BaseModel
-from pymongo import MongoClient
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_mongodb import MongoDBAtlasVectorSearch
 from difflib import SequenceMatcher
-from utils.phq9_questions import PHQ9_QUESTIONS
-import key_param
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from utils.admission import OPENAI_ADMISSION, prioritize
+from .phq_scoring import SELF_HARM_QUESTION, pending_question, progress_from_scores, score_turn
+from .dependencies import get_agent, get_sessions
+from .summarizer import folded_summary
+
+if TYPE_CHECKING:
+    from .assesmentAgent.assesmentAgent import DepressionAgent
+    from .sessions import ChatSession
 
 router = APIRouter()
 
@@ -36,24 +41,50 @@ from difflib import SequenceMatcher
 
 
 class SummaryRequest(BaseModel):
-    history: str
+    history: str = ""  # turns since previous_summary
+    previous_summary: str = ""
+    session_id: Optional[str] = None  # server-side session from POST /sessions
+
+
+def _join_lines(text: str) -> str:
+    return text.replace("\r\n", " ").replace("\n", " ").replace("\r", " ").strip()
+
+
+async def _fold_for_client(request: Request, previous: str, history: str, handed_out: str) -> None:
+    # The agent is only needed here, after the response has gone out
+    agent = await get_agent(request)
+    await agent.summarizer.fold_for_client(previous, history.splitlines(), handed_out)
 
 
 @router.post("/summarize")
-async def summarize_chat(data: SummaryRequest):
+async def summarize_chat(data: SummaryRequest, background_tasks: BackgroundTasks, request: Request):
+    """
+    Rolling summary: only the new turns are folded into the existing summary.
+    The current summary is returned right away and the LLM fold runs in the
+    background: on the server-side session, or, without one, it replaces the
+    returned text once the client sends it back as previous_summary.
+    """
     print("Received /summarize request with history length:", len(data.history))
 
-    # Join lines into one paragraph without altering the original words.
-    paragraph = (
-        data.history
-        .replace("\r\n", " ")
-        .replace("\n", " ")
-        .replace("\r", " ")
-        .strip()
-    )
+    if data.session_id:
+        store = await get_sessions(request)
+        session = await store.get(data.session_id)
+        if session is not None:
+            agent = await get_agent(request)
+            # The client asked for a summary now: fold every line, however few
+            background_tasks.add_task(
+                agent.summarizer.update_session, store, session.id, keep_recent=0, min_new_lines=1
+            )
+            return {"summary": session.summary}
+
+    previous = folded_summary(data.previous_summary)
+    # Old behaviour: the joined paragraph, so the frontend gets a summary without waiting
+    summary = " ".join(filter(None, [previous.strip(), _join_lines(data.history)]))
+    if data.history.strip():
+        background_tasks.add_task(_fold_for_client, request, previous, data.history, summary)
 
     # Keep the same response shape to avoid frontend changes.
-    return {"summary": paragraph}
+    return {"summary": summary}
 
 
 # for chat queries
@@ -62,107 +93,96 @@ class QueryRequest(BaseModel):
     history: str
     summaries: list[str] = []
     asked_phq_ids: list[int] = []
+    session_id: Optional[str] = None
 
 
-@router.post("/ask")
-async def ask_question(data: QueryRequest):
-    query = data.user_query
-    history = data.history
-
-    # MongoDB Setup
-    client = MongoClient(key_param.MONGO_URI)
-    db = client["Depression_Knowledge_Base"]
-    collection = db["depression"]
-    index_name = "default1"
-
-    embedding = OpenAIEmbeddings(openai_api_key=key_param.openai_api_key)
-    vectorstore = MongoDBAtlasVectorSearch(
-        collection=collection,
-        embedding=embedding,
-        index_name=index_name
-    )
-    similar_docs = vectorstore.similarity_search(query, k=3)
-    context_texts = [doc.page_content[:500] for doc in similar_docs]
-    summary_text = "\n".join(data.summaries) if data.summaries else "No previous summaries available."
-
-    unasked_questions = [q for q in PHQ9_QUESTIONS if q["id"] not in data.asked_phq_ids]
-    next_phq_q = unasked_questions[0] if unasked_questions else None
-
-    # Determine if we are in early stage (first 2 turns)
-    user_turns = [line for line in data.history.splitlines() if line.lower().startswith("you:") or line.lower().startswith("user:")]
-    early_stage = len(user_turns) < 3
-    
-    phq_instruction = ""
-    if next_phq_q and not early_stage:
-        if not data.asked_phq_ids:
-            phq_instruction += f"""
-You may now gently say something like:
-"To better understand how you're doing, I'd like to ask a few short questions on how you feel in past two weeks."
-
-Then ask this question:
-- "{next_phq_q['question']}" (meaning: {next_phq_q['meaning']})
-"""
-        else:
-            phq_instruction += f"""
-Continue with the next question:
-- "{next_phq_q['question']}" (meaning: {next_phq_q['meaning']})
-"""
-
-        phq_instruction += """
-Make your response short and caring. Don't explain too much. No repetition. Only ask one PHQ-9 question per message.
-Let user respond with:
-- not at all
-- several days
-- more than half the days
-- nearly every day
-"""
-
-    chat_prompt = f"""
-You are a friendly chatbot who talks like a kind friend.
+async def _score_turn(
+    data: QueryRequest, background_tasks: BackgroundTasks, agent: "DepressionAgent", store
+) -> Tuple[Optional["ChatSession"], Dict[int, int]]:
+    # Score the answer to the last PHQ-9 question now, so the final level is a sum.
+    # With a session_id the scores (and the last retrieved context) live in the session store.
+    if not data.session_id:
+        if pending_question(data.asked_phq_ids, {}) == SELF_HARM_QUESTION:
+            prioritize()  # answers about self-harm go ahead of casual chat
+        return None, {}
+    session = await store.get_or_create(data.session_id)
+    scores = await score_turn(store, session, data.asked_phq_ids, data.user_query, background_tasks, agent.llm)
+    return session, scores
 
-Be warm and caring. Avoid long or repetitive responses. Never say the same supportive line more than once.
 
-Your job is to gently explore how the user feels and try to understand user by asking questions, and ask PHQ-9 questions naturally when ready.
-
-NEVER mention PHQ-9 or say "I cannot help you".
-
-Avoid medical or crisis terms unless directly asked.
-
-Keep your replies short and friendly. One question per message. Once PHQ-9 starts, go through them without pausing.
-
-Past summaries:
-{summary_text}
-
-Relevant context:
-{context_texts}
-
-Conversation history:
-{history}
-
-{phq_instruction}
-
-User just said: "{query}"
+def _turn_kwargs(data: QueryRequest, session: Optional["ChatSession"], store) -> Dict[str, Any]:
+    return {
+        "query": data.user_query,
+        "history": data.history,
+        "summaries": data.summaries,
+        "asked_phq_ids": data.asked_phq_ids,
+        "session_id": data.session_id,
+        "store": store if session else None,
+        "last_context": session.last_context if session else None,
+        "phq_scores": session.phq_scores if session else None,
+    }
 
-Now reply like a kind friend:
-"""
 
-    bot = ChatOpenAI(
-        model="gpt-3.5-turbo",
-        openai_api_key=key_param.openai_api_key,
-        temperature=0.7
+@router.post("/ask")
+async def ask_question(
+    data: QueryRequest,
+    background_tasks: BackgroundTasks,
+    agent=Depends(get_agent),
+    store=Depends(get_sessions),
+):
+    session, scores = await _score_turn(data, background_tasks, agent, store)
+    async with OPENAI_ADMISSION.slot():
+        result = await agent.arun(**_turn_kwargs(data, session, store))
+    if session:
+        result.update(progress_from_scores(scores))
+    return result
+
+
+def sse_event(event: str, payload) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@router.post("/ask/stream")
+async def ask_question_stream(
+    data: QueryRequest,
+    background_tasks: BackgroundTasks,
+    agent=Depends(get_agent),
+    store=Depends(get_sessions),
+):
+    """
+    Same as /ask, streamed as Server-Sent Events:
+    `token` events with {"text"} as the reply is generated, then one `done`
+    event carrying the full /ask response (incl. phq9_questionID / phq9_question).
+    """
+    session, scores = await _score_turn(data, background_tasks, agent, store)
+    # Admitted before the stream starts, so overload is still a plain 429
+    slot = await OPENAI_ADMISSION.acquire()
+    background_tasks.add_task(slot.release)  # the client may leave before the body starts
+
+    async def events():
+        try:
+            async for kind, payload in agent.astream(**_turn_kwargs(data, session, store)):
+                if kind == "token":
+                    yield sse_event("token", {"text": payload})
+                else:
+                    if session:
+                        payload.update(progress_from_scores(scores))
+                    yield sse_event("done", payload)
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            slot.release()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks,
     )
 
-    chat_response = bot.invoke([
-        {"role": "system", "content": chat_prompt}
-    ])
-    final_text = chat_response.content.strip()
-    client.close()
 
-    matched_q = next_phq_q if not early_stage else None
-
-    return {
-        "response": final_text,
-        "phq9_questionID": matched_q["id"] if matched_q else None,
-        "phq9_question": matched_q["question"] if matched_q else None
-    }
-    
+@router.get("/phq9/{session_id}")
+async def phq9_progress(session_id: str, store=Depends(get_sessions)):
+    """Running PHQ-9 score for a chat session; includes the level once all nine are scored."""
+    session = await store.get(session_id)
+    return progress_from_scores(session.phq_scores if session else {})
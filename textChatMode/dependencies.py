@@ -0,0 +1,60 @@
+# textChatMode/dependencies.py
+"""
+FastAPI dependencies for the chat routers. The agent (langchain, OpenAI and
+pymongo clients) is built on first use, so importing the routers stays cheap
+and workers that only serve /detect never load it. main.py's lifespan can
+build it ahead of time (APP_WARMUP=1).
+"""
+import asyncio
+import threading
+from typing import TYPE_CHECKING
+
+from fastapi import FastAPI, Request
+
+from .sessions import SESSION_STORE, build_session_store
+
+if TYPE_CHECKING:
+    from .assesmentAgent.assesmentAgent import DepressionAgent
+
+_build_lock = threading.Lock()
+
+
+def ensure_agent(app: FastAPI) -> "DepressionAgent":
+    """The process-wide agent, built (imports included) on the first call."""
+    agent = getattr(app.state, "agent", None)
+    if agent is None:
+        with _build_lock:
+            agent = getattr(app.state, "agent", None)
+            if agent is None:
+                from .assesmentAgent.assesmentAgent import build_agent
+
+                agent = app.state.agent = build_agent()
+    return agent
+
+
+def ensure_sessions(app: FastAPI):
+    """The process-wide session store; the Mongo option reuses the agent's client."""
+    store = getattr(app.state, "sessions", None)
+    if store is None:
+        mongo = ensure_agent(app).mongo if SESSION_STORE == "mongo" else None
+        with _build_lock:
+            store = getattr(app.state, "sessions", None)
+            if store is None:
+                store = app.state.sessions = build_session_store(mongo)
+    return store
+
+
+async def get_agent(request: Request) -> "DepressionAgent":
+    """FastAPI dependency: the agent; the first call builds it off the event loop."""
+    agent = getattr(request.app.state, "agent", None)
+    if agent is None:
+        agent = await asyncio.to_thread(ensure_agent, request.app)
+    return agent
+
+
+async def get_sessions(request: Request):
+    """FastAPI dependency: the session store (see ensure_sessions)."""
+    store = getattr(request.app.state, "sessions", None)
+    if store is None:
+        store = await asyncio.to_thread(ensure_sessions, request.app)
+    return store
@@ -0,0 +1,64 @@
+# textChatMode/embedding_cache.py
+import os
+import re
+import hashlib
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from utils.cache import TTLCache, SqliteStore, TieredCache
+
+# Query-embedding cache (override via env); EMBED_CACHE_PATH enables the on-disk tier
+EMBED_CACHE = os.getenv("EMBED_CACHE", "1").lower() in ("1", "true", "yes")
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "5000"))
+EMBED_CACHE_TTL = float(os.getenv("EMBED_CACHE_TTL", str(7 * 86400)))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "")
+
+_EDGE_PUNCT = re.compile(r"^[\s\"'.,!?…]+|[\s\"'.,!?…]+$")
+
+
+def normalize_query(text: str) -> str:
+    """'Not at all.' / 'not at all' / ' Not  at all!' share one embedding."""
+    text = " ".join((text or "").split()).casefold()
+    return _EDGE_PUNCT.sub("", text)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Caches embed_query() in front of another Embeddings (documents pass through).
+    Keys include the model name so switching models never serves stale vectors.
+    """
+
+    def __init__(self, inner: Embeddings, cache: TieredCache):
+        self.inner = inner
+        self.cache = cache
+        self.namespace = getattr(inner, "model", type(inner).__name__)
+
+    def _key(self, text: str) -> str:
+        raw = f"{self.namespace}\x00{normalize_query(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.inner.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.inner.embed_query(text)
+            self.cache.set(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.cache.get_or_compute(self._key(text), lambda: self.inner.aembed_query(text))
+
+
+def build_embedding_cache() -> TieredCache:
+    return TieredCache(
+        "embedding",
+        TTLCache(maxsize=EMBED_CACHE_SIZE, ttl=EMBED_CACHE_TTL),
+        SqliteStore(EMBED_CACHE_PATH, ttl=EMBED_CACHE_TTL) if EMBED_CACHE_PATH else None,
+    )
@@ -0,0 +1,141 @@
+# textChatMode/phq_scoring.py
+import re
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional
+
+from utils.admission import HIGH, LOW, OPENAI_ADMISSION, prioritize
+from utils.metrics import counter
+from utils.phq9_questions import PHQ9_QUESTIONS, level_for_score
+
+# method=rule|llm|unscored
+PHQ_ITEM_SCORES = counter("phq_item_scores_total", "PHQ-9 answers scored during the chat flow")
+
+# The four answers the bot suggests, and their PHQ-9 item score
+_OPTIONS = {
+    "not at all": 0,
+    "several days": 1,
+    "more than half the days": 2,
+    "nearly every day": 3,
+}
+
+# Common free-text variants, most specific first
+_KEYWORDS = [
+    (re.compile(r"\b(nearly|almost) (every|each) day\b|\bevery ?day\b|\ball the time\b|\balways\b|\bconstantly\b"), 3),
+    (re.compile(r"\bmore than half\b|\bmost (of the )?days\b|\boften\b|\bfrequently\b|\ba lot\b"), 2),
+    (re.compile(r"\bseveral days\b|\bsometimes\b|\bsome days\b|\ba few (days|times)\b|\bonce or twice\b|\boccasionally\b|\ba little\b"), 1),
+    (re.compile(r"\bnot at all\b|\bnever\b|\bnone\b|\bnot really\b|^no\b|^nope\b"), 0),
+]
+
+# A negator right before a frequency ("not every day", "not that often") flips its meaning
+_NEGATOR_BEFORE = re.compile(
+    r"\b(not|never|no|hardly|barely|rarely|don t|didn t|doesn t|isn t|wasn t|haven t|hasn t)( [a-z]+)? $"
+)
+
+_QUESTIONS = {q["id"]: q for q in PHQ9_QUESTIONS}
+
+# Item 9 (thoughts of self-harm): its answers get upstream priority
+SELF_HARM_QUESTION = 9
+
+
+def _negated(text: str) -> bool:
+    for pattern, score in _KEYWORDS:
+        if score and any(_NEGATOR_BEFORE.search(text[:m.start()]) for m in pattern.finditer(text)):
+            return True
+    return False
+
+
+def score_rule(answer: str) -> Optional[int]:
+    """Cheap local scoring of one answer (0..3); None when unsure (incl. negated frequencies)."""
+    text = re.sub(r"[^a-z ]+", " ", (answer or "").lower())
+    text = " ".join(text.split())
+    if not text or _negated(text):
+        return None
+    for option, score in _OPTIONS.items():
+        if SequenceMatcher(None, text, option).ratio() >= 0.85:
+            return score
+    for pattern, score in _KEYWORDS:
+        if pattern.search(text):
+            return score
+    return None
+
+
+async def score_llm(llm, question_id: int, answer: str) -> Optional[int]:
+    """One short completion for answers the rules can't place."""
+    q = _QUESTIONS[question_id]
+    prompt = f"""
+Question: "{q['question']}" (meaning: {q['meaning']})
+Answer: "{answer}"
+
+How often over the last two weeks does the answer describe?
+0 = not at all, 1 = several days, 2 = more than half the days, 3 = nearly every day.
+Reply with a single digit only.
+"""
+    async with OPENAI_ADMISSION.slot(HIGH if question_id == SELF_HARM_QUESTION else LOW):
+        response = await llm.ainvoke([{"role": "user", "content": prompt}])
+    m = re.search(r"[0-3]", response.content or "")
+    return int(m.group(0)) if m else None
+
+
+async def score_with_llm(store, session_id: str, question_id: int, answer: str, llm) -> None:
+    """Background task: keeps the LLM round trip off the response path."""
+    try:
+        score = await score_llm(llm, question_id, answer)
+    except Exception as e:
+        print(f"PHQ-9 item scoring failed for question {question_id}: {e}")
+        score = None
+    if score is None:
+        PHQ_ITEM_SCORES.inc(method="unscored")
+        await store.set_phq_answer(session_id, question_id, answer)  # retried on the next turn
+        return
+    await store.set_phq_score(session_id, question_id, score)
+    PHQ_ITEM_SCORES.inc(method="llm")
+
+
+async def score_turn(store, session, asked_phq_ids: List[int], answer: str, background_tasks, llm) -> Dict[int, int]:
+    """
+    Scores the answer to the last PHQ-9 question in the session store (rules
+    now, the LLM in a background task); returns the session's known scores.
+    """
+    scores = dict(session.phq_scores)
+    for question_id, earlier in session.phq_answers.items():
+        if question_id not in scores:  # earlier LLM scoring failed: try again
+            background_tasks.add_task(score_with_llm, store, session.id, question_id, earlier, llm)
+    question_id = pending_question(asked_phq_ids, scores)
+    if question_id is None:
+        return scores
+    if question_id == SELF_HARM_QUESTION:
+        prioritize()  # answers about self-harm go ahead of casual chat
+    score = score_rule(answer)
+    if score is None:
+        background_tasks.add_task(score_with_llm, store, session.id, question_id, answer, llm)
+        return scores
+    await store.set_phq_score(session.id, question_id, score)
+    PHQ_ITEM_SCORES.inc(method="rule")
+    scores[question_id] = score
+    return scores
+
+
+def pending_question(asked_phq_ids: List[int], scores: Dict[int, int]) -> Optional[int]:
+    """
+    The question the user's current message answers: the last one asked,
+    unless it already has a score (later small talk must not overwrite it).
+    """
+    if not asked_phq_ids:
+        return None
+    question_id = asked_phq_ids[-1]
+    if question_id not in _QUESTIONS or question_id in scores:
+        return None
+    return question_id
+
+
+def progress_from_scores(scores: Dict[int, int]) -> Dict[str, Any]:
+    partial = sum(scores.values())
+    complete = len(scores) == len(_QUESTIONS)
+    return {
+        "phq9_item_scores": {str(k): v for k, v in sorted(scores.items())},
+        "phq9_partial_score": partial,
+        "phq9_answered": len(scores),
+        "phq9_complete": complete,
+        "phq9_score": partial if complete else None,
+        "level": level_for_score(partial) if complete else None,
+    }
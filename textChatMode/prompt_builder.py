@@ -0,0 +1,112 @@
+# textChatMode/prompt_builder.py
+import os
+import re
+from typing import Dict, List
+
+from utils.metrics import counter
+from utils.tokens import count_tokens, fit_recent_lines, truncate_to_tokens
+
+# Whole /ask prompt, template included (override via env)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "2500"))
+# Per-section caps inside the overall budget
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1000"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+CONTEXT_CHUNK_TOKENS = int(os.getenv("CONTEXT_CHUNK_TOKENS", "200"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "400"))
+# Share of a chunk's word 3-grams already present in a kept chunk to count as a duplicate
+CHUNK_OVERLAP_THRESHOLD = float(os.getenv("CHUNK_OVERLAP_THRESHOLD", "0.6"))
+
+NO_SUMMARIES = "No previous summaries available."
+NO_CONTEXT = "No relevant context."
+
+# section=template|query|phq|history|context|summaries
+PROMPT_TOKENS = counter("prompt_tokens_total", "Tokens placed in /ask prompts")
+# result=kept|duplicate|over_budget
+CONTEXT_CHUNKS = counter("context_chunks_total", "Retrieved chunks considered for the /ask prompt")
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def _shingles(text: str) -> set:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < 3:
+        return set(words)
+    return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def dedupe_chunks(texts: List[str], threshold: float = CHUNK_OVERLAP_THRESHOLD) -> List[str]:
+    """
+    Drops empty chunks and chunks that mostly repeat a higher-ranked one
+    (same document retrieved twice, or overlapping chunk windows).
+    """
+    kept, kept_shingles = [], []
+    for text in texts:
+        shingles = _shingles(text or "")
+        if not shingles:
+            continue
+        if any(len(shingles & other) / min(len(shingles), len(other)) >= threshold for other in kept_shingles):
+            CONTEXT_CHUNKS.inc(result="duplicate")
+            continue
+        kept.append(text.strip())
+        kept_shingles.append(shingles)
+    return kept
+
+
+def assemble(
+    template: str,
+    query: str,
+    phq_instruction: str,
+    history: str,
+    context_texts: List[str],
+    summaries: List[str],
+    model: str,
+    budget: int = PROMPT_TOKEN_BUDGET,
+) -> str:
+    """
+    Fills `template` within `budget` tokens, by priority: current query,
+    PHQ instruction, recent turns, retrieved context, older summaries.
+    Each lower-priority section gets what is left, up to its own cap.
+    """
+    empty = template.format(summary_text="", context_text="", history="", phq_instruction="", query="")
+    used = {"template": count_tokens(empty, model)}
+
+    def left(cap: int = budget) -> int:
+        return max(min(cap, budget - sum(used.values())), 0)
+
+    query = truncate_to_tokens(query, left(), model)
+    used["query"] = count_tokens(query, model)
+    phq_instruction = truncate_to_tokens(phq_instruction, left(), model)
+    used["phq"] = count_tokens(phq_instruction, model)
+
+    history_text = "\n".join(fit_recent_lines(history.splitlines(), left(HISTORY_TOKEN_BUDGET), model))
+    used["history"] = count_tokens(history_text, model)
+
+    chunks, context_left = [], left(CONTEXT_TOKEN_BUDGET)
+    for chunk in dedupe_chunks(context_texts):
+        chunk = truncate_to_tokens(chunk, CONTEXT_CHUNK_TOKENS, model)
+        cost = count_tokens(chunk, model) + 2  # + blank line
+        if cost > context_left:
+            CONTEXT_CHUNKS.inc(result="over_budget")
+            continue
+        chunks.append(chunk)
+        context_left -= cost
+        CONTEXT_CHUNKS.inc(result="kept")
+    context_text = "\n\n".join(chunks)
+    used["context"] = count_tokens(context_text, model)
+
+    summary_cap = left(SUMMARY_TOKEN_BUDGET)
+    kept_summaries = fit_recent_lines(summaries, summary_cap, model)
+    if summaries and not kept_summaries and summary_cap:
+        kept_summaries = [truncate_to_tokens(summaries[-1], summary_cap, model)]
+    summary_text = "\n".join(kept_summaries)
+    used["summaries"] = count_tokens(summary_text, model)
+
+    for section, tokens in used.items():
+        PROMPT_TOKENS.inc(tokens, section=section)
+    return template.format(
+        summary_text=summary_text or NO_SUMMARIES,
+        context_text=context_text or NO_CONTEXT,
+        history=history_text,
+        phq_instruction=phq_instruction,
+        query=query,
+    )
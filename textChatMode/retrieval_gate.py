@@ -0,0 +1,61 @@
+# textChatMode/retrieval_gate.py
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from utils.metrics import counter, gauge
+from .phq_scoring import score_rule
+
+# Set RETRIEVAL_GATE=0 to search on every turn
+RETRIEVAL_GATE = os.getenv("RETRIEVAL_GATE", "1") != "0"
+# Messages with fewer words than this are small talk / acknowledgements
+GATE_MIN_WORDS = int(os.getenv("GATE_MIN_WORDS", "4"))
+
+# Topics the knowledge base covers, and direct requests for information or advice
+_KNOWLEDGE_RE = re.compile(
+    r"\?|\b(what|why|how|should|advice|advise|tips?|help|cope|coping|treat\w*|therap\w*|medic\w*|"
+    r"symptoms?|diagnos\w*|depress\w*|anxi\w*|panic|stress\w*|sleep\w*|insomnia|appetite|"
+    r"suicid\w*|self[- ]?harm|hurt myself|exercise|lonely|loneliness|grief)\b"
+)
+
+# decision=retrieve|skip, reason=disabled|keyword|phq_answer|short|default
+RETRIEVAL_GATE_TOTAL = counter("retrieval_gate_total", "Retrieval gate decisions for /ask turns")
+RETRIEVAL_SKIP_RATIO = gauge("retrieval_skip_ratio", "Share of /ask turns that skipped vector search")
+
+
+def _skip_ratio() -> float:
+    snap = RETRIEVAL_GATE_TOTAL.snapshot()
+    total = sum(snap.values())
+    skipped = sum(v for k, v in snap.items() if "decision=skip" in k)
+    return skipped / total if total else 0.0
+
+
+RETRIEVAL_SKIP_RATIO.set_function(_skip_ratio)
+
+
+def needs_retrieval(
+    query: str, asked_phq_ids: List[int], phq_scores: Optional[Dict[int, int]] = None
+) -> Tuple[bool, str]:
+    """
+    Cheap local decision whether this turn needs knowledge-base context.
+    phq_scores are the scores known before this turn, when the caller has them.
+    Returns (retrieve, reason) and records it in retrieval_gate_total.
+    """
+    text = (query or "").lower()
+    # This turn may answer a PHQ-9 item while the last one asked (item 9 too) has no score yet;
+    # without scores, on every turn once a question has been asked
+    in_phq_phase = bool(asked_phq_ids) and (phq_scores is None or asked_phq_ids[-1] not in phq_scores)
+
+    if not RETRIEVAL_GATE:
+        decision = (True, "disabled")
+    elif _KNOWLEDGE_RE.search(text):
+        decision = (True, "keyword")
+    elif in_phq_phase and score_rule(text) is not None:
+        decision = (False, "phq_answer")
+    elif len(text.split()) < GATE_MIN_WORDS:
+        decision = (False, "short")
+    else:
+        decision = (True, "default")
+
+    RETRIEVAL_GATE_TOTAL.inc(decision="retrieve" if decision[0] else "skip", reason=decision[1])
+    return decision
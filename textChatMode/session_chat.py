@@ -0,0 +1,125 @@
+# textChatMode/session_chat.py
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from .chat import sse_event
+from utils.admission import OPENAI_ADMISSION
+from .phq_scoring import progress_from_scores, score_turn
+from .dependencies import get_agent, get_sessions
+from .sessions import ChatSession
+
+router = APIRouter()
+
+
+class CreateSessionRequest(BaseModel):
+    summaries: List[str] = []
+
+
+class SessionQueryRequest(BaseModel):
+    user_query: str
+
+
+async def _load(store, session_id: str) -> ChatSession:
+    session = await store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired.")
+    return session
+
+
+def _turn_kwargs(store, session: ChatSession, query: str) -> Dict[str, Any]:
+    # Lines already folded into the rolling summary are not sent again
+    return {
+        "query": query,
+        "history": "\n".join(session.history[session.summarized_upto:]),
+        "summaries": session.summaries + ([session.summary] if session.summary else []),
+        "asked_phq_ids": session.asked_phq_ids,
+        "user_turns": session.user_turns,
+        "session_id": session.id,
+        "store": store,
+        "last_context": session.last_context,
+        "phq_scores": session.phq_scores,
+    }
+
+
+async def _finish_turn(store, session: ChatSession, query: str, result: Dict[str, Any], scores: Dict[int, int]) -> Dict[str, Any]:
+    await store.append_turn(session.id, f"User: {query}", f"Bot: {result['response']}", result.get("phq9_questionID"))
+    result["session_id"] = session.id
+    result.update(progress_from_scores(scores))
+    return result
+
+
+@router.post("/sessions")
+async def create_session(data: Optional[CreateSessionRequest] = None, store=Depends(get_sessions)):
+    """Start a chat session; afterwards only the new user message is sent each turn."""
+    session = await store.create(summaries=data.summaries if data else None)
+    return {"session_id": session.id}
+
+
+@router.get("/sessions/{session_id}")
+async def get_session(session_id: str, store=Depends(get_sessions)):
+    session = await _load(store, session_id)
+    state = session.model_dump(exclude={"phq_scores", "phq_answers", "last_context"})
+    state.update(progress_from_scores(session.phq_scores))
+    return state
+
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str, store=Depends(get_sessions)):
+    await store.delete(session_id)
+    return {"deleted": True}
+
+
+@router.post("/sessions/{session_id}/ask")
+async def ask_in_session(
+    session_id: str,
+    data: SessionQueryRequest,
+    background_tasks: BackgroundTasks,
+    store=Depends(get_sessions),
+    agent=Depends(get_agent),
+):
+    """/ask with server-side history, summaries and PHQ-9 progress."""
+    session = await _load(store, session_id)
+    scores = await score_turn(store, session, session.asked_phq_ids, data.user_query, background_tasks, agent.llm)
+    background_tasks.add_task(agent.summarizer.update_session, store, session.id)
+    async with OPENAI_ADMISSION.slot():
+        result = await agent.arun(**_turn_kwargs(store, session, data.user_query))
+    return await _finish_turn(store, session, data.user_query, result, scores)
+
+
+@router.post("/sessions/{session_id}/ask/stream")
+async def ask_in_session_stream(
+    session_id: str,
+    data: SessionQueryRequest,
+    background_tasks: BackgroundTasks,
+    store=Depends(get_sessions),
+    agent=Depends(get_agent),
+):
+    """Streaming variant (same SSE events as /ask/stream)."""
+    session = await _load(store, session_id)
+    scores = await score_turn(store, session, session.asked_phq_ids, data.user_query, background_tasks, agent.llm)
+    # Admitted before the stream starts, so overload is still a plain 429
+    slot = await OPENAI_ADMISSION.acquire()
+    background_tasks.add_task(slot.release)  # the client may leave before the body starts
+    background_tasks.add_task(agent.summarizer.update_session, store, session.id)
+
+    async def events():
+        try:
+            async for kind, payload in agent.astream(**_turn_kwargs(store, session, data.user_query)):
+                if kind == "token":
+                    yield sse_event("token", {"text": payload})
+                else:
+                    yield sse_event("done", await _finish_turn(store, session, data.user_query, payload, scores))
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            slot.release()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks,
+    )
@@ -0,0 +1,212 @@
+# textChatMode/sessions.py
+import os
+import time
+import uuid
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from utils.cache import TTLCache
+
+# "memory" (per process) or "mongo" (shared by all workers); override via env
+SESSION_STORE = os.getenv("SESSION_STORE", "memory").lower()
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", str(6 * 3600)))
+SESSION_MAX_IN_MEMORY = int(os.getenv("SESSION_MAX_IN_MEMORY", "10000"))
+SESSION_DB = os.getenv("SESSION_DB", "Depression_Knowledge_Base")
+SESSION_COLLECTION = os.getenv("SESSION_COLLECTION", "chat_sessions")
+
+
+class ChatSession(BaseModel):
+    id: str
+    history: List[str] = Field(default_factory=list)  # "User: ..." / "Bot: ..." lines
+    summaries: List[str] = Field(default_factory=list)
+    summary: str = ""  # rolling summary of history[:summarized_upto]
+    summarized_upto: int = 0
+    asked_phq_ids: List[int] = Field(default_factory=list)
+    phq_scores: Dict[int, int] = Field(default_factory=dict)
+    phq_answers: Dict[int, str] = Field(default_factory=dict)  # answers still waiting for a score
+    last_context: List[str] = Field(default_factory=list)  # last knowledge-base search, reused on gated turns
+    user_turns: int = 0
+    created_at: float = Field(default_factory=time.time)
+    updated_at: float = Field(default_factory=time.time)
+
+    @property
+    def history_text(self) -> str:
+        return "\n".join(self.history)
+
+
+class InMemorySessionStore:
+    """Default store: sessions live in this process and expire after the TTL of inactivity."""
+
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS, maxsize: int = SESSION_MAX_IN_MEMORY):
+        self._sessions = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    async def create(self, summaries: Optional[List[str]] = None) -> ChatSession:
+        session = ChatSession(id=uuid.uuid4().hex, summaries=list(summaries or []))
+        self._sessions.set(session.id, session)
+        return session
+
+    async def get(self, session_id: str) -> Optional[ChatSession]:
+        session = self._sessions.get(session_id)
+        return session.model_copy(deep=True) if session else None
+
+    async def get_or_create(self, session_id: str) -> ChatSession:
+        """For clients that pick their own session id (/ask with session_id)."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = ChatSession(id=session_id)
+                self._sessions.set(session_id, session)
+            return session.model_copy(deep=True)
+
+    def _mutate(self, session_id: str, fn) -> bool:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return False
+            fn(session)
+            session.updated_at = time.time()
+            self._sessions.set(session_id, session)  # refreshes the TTL
+            return True
+
+    async def append_turn(self, session_id: str, user_line: str, bot_line: str, phq_question_id: Optional[int]) -> bool:
+        def apply(s: ChatSession):
+            s.history.extend([user_line, bot_line])
+            s.user_turns += 1
+            if phq_question_id and phq_question_id not in s.asked_phq_ids:
+                s.asked_phq_ids.append(phq_question_id)
+
+        return self._mutate(session_id, apply)
+
+    async def set_phq_score(self, session_id: str, question_id: int, score: int) -> bool:
+        def apply(s: ChatSession):
+            s.phq_scores[question_id] = score
+            s.phq_answers.pop(question_id, None)
+
+        return self._mutate(session_id, apply)
+
+    async def set_phq_answer(self, session_id: str, question_id: int, answer: str) -> bool:
+        return self._mutate(session_id, lambda s: s.phq_answers.__setitem__(question_id, answer))
+
+    async def update_fields(self, session_id: str, fields: Dict[str, Any]) -> bool:
+        def apply(s: ChatSession):
+            for name, value in fields.items():
+                setattr(s, name, value)
+
+        return self._mutate(session_id, apply)
+
+    async def delete(self, session_id: str) -> None:
+        self._sessions.delete(session_id)
+
+    def close(self) -> None:
+        pass
+
+
+class MongoSessionStore:
+    """
+    Shared store for multi-worker deployments. Every write is a single atomic
+    update, so concurrent turns and background scoring never overwrite each
+    other; a TTL index on expires_at removes idle sessions.
+    """
+
+    def __init__(self, mongo_client, ttl: float = SESSION_TTL_SECONDS):
+        self.ttl = ttl
+        self.collection = mongo_client[SESSION_DB][SESSION_COLLECTION]
+        self._indexed = False
+
+    def _ensure_index(self) -> None:
+        if not self._indexed:
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexed = True
+
+    def _expiry(self) -> Dict[str, Any]:
+        return {"updated_at": time.time(), "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl)}
+
+    @staticmethod
+    def _from_doc(doc: Dict[str, Any]) -> ChatSession:
+        doc["id"] = doc.pop("_id")
+        doc["phq_scores"] = {int(k): v for k, v in (doc.get("phq_scores") or {}).items()}
+        doc["phq_answers"] = {int(k): v for k, v in (doc.get("phq_answers") or {}).items()}
+        return ChatSession(**{k: v for k, v in doc.items() if k in ChatSession.model_fields})
+
+    async def create(self, summaries: Optional[List[str]] = None) -> ChatSession:
+        session = ChatSession(id=uuid.uuid4().hex, summaries=list(summaries or []))
+        doc = session.model_dump(exclude={"id"})
+        doc["phq_scores"] = {}
+        doc["phq_answers"] = {}
+        doc.update(self._expiry(), _id=session.id)
+
+        def insert():
+            self._ensure_index()
+            self.collection.insert_one(doc)
+
+        await asyncio.to_thread(insert)
+        return session
+
+    async def get(self, session_id: str) -> Optional[ChatSession]:
+        doc = await asyncio.to_thread(self.collection.find_one, {"_id": session_id})
+        return self._from_doc(doc) if doc else None
+
+    async def get_or_create(self, session_id: str) -> ChatSession:
+        """For clients that pick their own session id (/ask with session_id)."""
+        doc = ChatSession(id=session_id).model_dump(exclude={"id", "updated_at"})
+        doc["phq_scores"] = {}
+        doc["phq_answers"] = {}
+
+        def upsert():
+            from pymongo import ReturnDocument
+
+            self._ensure_index()
+            return self.collection.find_one_and_update(
+                {"_id": session_id},
+                {"$setOnInsert": doc, "$set": self._expiry()},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+
+        return self._from_doc(await asyncio.to_thread(upsert))
+
+    async def _update(self, session_id: str, update: Dict[str, Any]) -> bool:
+        update.setdefault("$set", {}).update(self._expiry())
+        result = await asyncio.to_thread(self.collection.update_one, {"_id": session_id}, update)
+        return result.matched_count == 1
+
+    async def append_turn(self, session_id: str, user_line: str, bot_line: str, phq_question_id: Optional[int]) -> bool:
+        update: Dict[str, Any] = {
+            "$push": {"history": {"$each": [user_line, bot_line]}},
+            "$inc": {"user_turns": 1},
+        }
+        if phq_question_id:
+            update["$addToSet"] = {"asked_phq_ids": phq_question_id}
+        return await self._update(session_id, update)
+
+    async def set_phq_score(self, session_id: str, question_id: int, score: int) -> bool:
+        return await self._update(session_id, {
+            "$set": {f"phq_scores.{question_id}": score},
+            "$unset": {f"phq_answers.{question_id}": ""},
+        })
+
+    async def set_phq_answer(self, session_id: str, question_id: int, answer: str) -> bool:
+        return await self._update(session_id, {"$set": {f"phq_answers.{question_id}": answer}})
+
+    async def update_fields(self, session_id: str, fields: Dict[str, Any]) -> bool:
+        return await self._update(session_id, {"$set": dict(fields)})
+
+    async def delete(self, session_id: str) -> None:
+        await asyncio.to_thread(self.collection.delete_one, {"_id": session_id})
+
+    def close(self) -> None:
+        pass  # the Mongo client belongs to the agent
+
+
+def build_session_store(mongo_client=None):
+    """Store selected by SESSION_STORE; the Mongo option reuses the agent's pooled client."""
+    if SESSION_STORE == "mongo":
+        return MongoSessionStore(mongo_client)
+    if SESSION_STORE != "memory":
+        raise ValueError(f"Unknown SESSION_STORE: {SESSION_STORE!r} (expected 'memory' or 'mongo')")
+    return InMemorySessionStore()
@@ -0,0 +1,127 @@
+# textChatMode/summarizer.py
+import os
+import hashlib
+from typing import List
+
+from utils.cache import TTLCache
+from utils.admission import LOW, OPENAI_ADMISSION
+from utils.metrics import counter
+from utils.timing import stage
+from utils.tokens import chunk_lines, fit_recent_lines
+
+# Rolling summary knobs (override via env)
+SUMMARY_MAX_WORDS = int(os.getenv("SUMMARY_MAX_WORDS", "150"))
+# Lines (User/Bot) kept verbatim in the prompt; only older ones are folded
+SUMMARY_KEEP_RECENT_LINES = int(os.getenv("SUMMARY_KEEP_RECENT_LINES", "8"))
+# Don't call the LLM for fewer new lines than this
+SUMMARY_MIN_NEW_LINES = int(os.getenv("SUMMARY_MIN_NEW_LINES", "4"))
+# Cap on the new lines sent in one fold; longer backlogs are folded in several calls
+SUMMARY_INPUT_TOKEN_BUDGET = int(os.getenv("SUMMARY_INPUT_TOKEN_BUDGET", "3000"))
+
+# Sessionless /summarize: background folds kept until the client sends the summary back
+SUMMARY_FOLD_CACHE_TTL = float(os.getenv("SUMMARY_FOLD_CACHE_TTL", str(6 * 3600)))
+SUMMARY_FOLD_CACHE_SIZE = int(os.getenv("SUMMARY_FOLD_CACHE_SIZE", "10000"))
+
+# result=folded|skipped|failed
+SUMMARY_FOLDS = counter("summary_folds_total", "Rolling summary updates")
+
+# sha1 of the summary a client was given -> the LLM fold of the same text
+_FOLDED = TTLCache(maxsize=SUMMARY_FOLD_CACHE_SIZE, ttl=SUMMARY_FOLD_CACHE_TTL)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.strip().encode("utf-8")).hexdigest()
+
+
+def folded_summary(text: str) -> str:
+    """The finished fold of a summary handed out earlier, or `text` itself."""
+    if not text.strip():
+        return text
+    return _FOLDED.get(_digest(text)) or text
+
+
+class RollingSummarizer:
+    """Folds only the new conversation lines into an existing summary."""
+
+    def __init__(self, llm):
+        self.llm = llm
+        self._running = set()
+
+    async def fold(self, summary: str, new_lines: List[str]) -> str:
+        """One LLM call; new_lines should fit SUMMARY_INPUT_TOKEN_BUDGET (see fold_all)."""
+        new_lines = fit_recent_lines([line for line in new_lines if line.strip()], SUMMARY_INPUT_TOKEN_BUDGET)
+        if not new_lines:
+            return summary
+        prompt = f"""
+You maintain a running summary of a supportive chat between a user and a friendly bot.
+
+Current summary:
+{summary or "(empty)"}
+
+New conversation lines:
+{chr(10).join(new_lines)}
+
+Update the summary so it also covers the new lines. Keep what matters for continuing the
+conversation: how the user feels, important events, and any answers about mood, sleep,
+energy, appetite, focus or self-harm. At most {SUMMARY_MAX_WORDS} words. Reply with the summary only.
+"""
+        # Summaries can wait (or fall back) when the upstream is busy
+        async with OPENAI_ADMISSION.slot(LOW):
+            with stage("summary_llm", upstream="openai"):
+                response = await self.llm.ainvoke([{"role": "user", "content": prompt}])
+        return response.content.strip()
+
+    async def fold_all(self, summary: str, new_lines: List[str]) -> str:
+        """Folds any number of lines, one budget-sized chunk at a time, oldest first."""
+        for chunk in chunk_lines(new_lines, SUMMARY_INPUT_TOKEN_BUDGET):
+            summary = await self.fold(summary, chunk)
+        return summary
+
+    async def fold_for_client(self, summary: str, new_lines: List[str], handed_out: str) -> None:
+        """
+        Background task for sessionless /summarize: the client got `handed_out`
+        (the plain join) right away; once the fold is done, folded_summary()
+        swaps it in when the client sends that text back as previous_summary.
+        """
+        try:
+            _FOLDED.set(_digest(handed_out), await self.fold_all(summary, new_lines))
+            SUMMARY_FOLDS.inc(result="folded")
+        except Exception as e:
+            SUMMARY_FOLDS.inc(result="failed")
+            print(f"Rolling summary failed: {e}")
+
+    async def update_session(
+        self,
+        store,
+        session_id: str,
+        keep_recent: int = SUMMARY_KEEP_RECENT_LINES,
+        min_new_lines: int = SUMMARY_MIN_NEW_LINES,
+    ) -> None:
+        """
+        Background task after a session turn: folds lines older than the
+        recent window into session.summary. At most one fold per session runs.
+        """
+        if session_id in self._running:
+            return
+        self._running.add(session_id)
+        try:
+            session = await store.get(session_id)
+            if session is None:
+                return
+            upto = max(len(session.history) - keep_recent, 0)
+            new_lines = session.history[session.summarized_upto:upto]
+            if not new_lines or len(new_lines) < min_new_lines:
+                SUMMARY_FOLDS.inc(result="skipped")
+                return
+            # Progress is saved per chunk, so summarized_upto only covers lines actually folded
+            summary, done = session.summary, session.summarized_upto
+            for chunk in chunk_lines(new_lines, SUMMARY_INPUT_TOKEN_BUDGET):
+                summary = await self.fold(summary, chunk)
+                done += len(chunk)
+                await store.update_fields(session_id, {"summary": summary, "summarized_upto": done})
+            SUMMARY_FOLDS.inc(result="folded")
+        except Exception as e:
+            SUMMARY_FOLDS.inc(result="failed")
+            print(f"Rolling summary failed for session {session_id}: {e}")
+        finally:
+            self._running.discard(session_id)
@@ -0,0 +1,172 @@
+# utils/admission.py
+"""
+Admission control in front of the LLM upstreams. Each upstream gets a
+bounded number of calls in flight and a bounded, prioritised wait queue;
+past either bound the caller gets Overloaded right away (main.py answers
+429 with Retry-After) instead of piling onto an upstream that would time
+out for everyone.
+
+    async with OPENAI_ADMISSION.slot():
+        reply = await llm.ainvoke(...)
+
+The priority comes from the request context: routes call prioritize() for
+/detect and for answers to PHQ-9 item 9, so those go ahead of chat turns.
+"""
+import os
+import math
+import time
+import heapq
+import asyncio
+import contextvars
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Tuple
+
+from utils.metrics import counter, gauge, histogram
+
+HIGH, NORMAL, LOW = 0, 1, 2
+_PRIORITY_NAMES = {HIGH: "high", NORMAL: "normal", LOW: "low"}
+
+_PRIORITY: contextvars.ContextVar[int] = contextvars.ContextVar("admission_priority", default=NORMAL)
+
+QUEUE_DEPTH = gauge("admission_queue_depth", "Calls waiting for an upstream slot")
+IN_FLIGHT = gauge("admission_in_flight", "Calls holding an upstream slot")
+WAIT_SECONDS = histogram("admission_wait_seconds", "Time spent waiting for an upstream slot")
+# result=admitted|queue_full|timeout|displaced
+ADMISSIONS = counter("admission_total", "Admission decisions per upstream and priority")
+
+
+def prioritize(priority: int = HIGH) -> None:
+    """Upstream calls made by the rest of the current request (and tasks it starts) use `priority`."""
+    _PRIORITY.set(priority)
+
+
+class Overloaded(Exception):
+    """An upstream is saturated; retry after `retry_after` seconds."""
+
+    def __init__(self, upstream: str, retry_after: int):
+        super().__init__(f"{upstream} is overloaded; retry in {retry_after}s.")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class Slot:
+    """A granted admission; release() is idempotent."""
+
+    __slots__ = ("_queue", "_start")
+
+    def __init__(self, queue: Optional["AdmissionQueue"]):
+        self._queue = queue
+        self._start = time.perf_counter()
+
+    def release(self) -> None:
+        if self._queue is not None:
+            queue, self._queue = self._queue, None
+            queue._release(time.perf_counter() - self._start)
+
+
+class AdmissionQueue:
+    """
+    At most `max_concurrency` slots held at once; up to `max_queue` callers
+    wait for one, highest priority first (FIFO within a priority), for at
+    most `max_wait` seconds. A high-priority caller arriving at a full
+    queue displaces the newest lower-priority waiter. max_concurrency <= 0
+    turns admission off.
+    """
+
+    def __init__(self, upstream: str, max_concurrency: int, max_queue: int, max_wait: float):
+        self.upstream = upstream
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []  # (priority, seq, future) heap
+        self._seq = 0
+        self._hold = 1.0  # moving average of slot hold time, for Retry-After
+        QUEUE_DEPTH.set_function(lambda: float(self.waiting), upstream=upstream)
+        IN_FLIGHT.set_function(lambda: float(self.active), upstream=upstream)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained (1..60)."""
+        drain = (self.waiting + 1) * self._hold / max(self.max_concurrency, 1)
+        return min(max(math.ceil(drain), 1), 60)
+
+    def _reject(self, priority: int, reason: str) -> Overloaded:
+        ADMISSIONS.inc(upstream=self.upstream, priority=_PRIORITY_NAMES[priority], result=reason)
+        return Overloaded(self.upstream, self.retry_after())
+
+    def _displace(self, priority: int) -> bool:
+        """Fail the newest waiter of lower priority than `priority`; False if there is none."""
+        victims = [w for w in self._waiters if w[0] > priority and not w[2].done()]
+        if not victims:
+            return False
+        victim_priority, _, fut = max(victims)
+        fut.set_exception(self._reject(victim_priority, "displaced"))
+        return True
+
+    async def acquire(self, priority: Optional[int] = None) -> Slot:
+        """Wait for a slot; raises Overloaded when the queue is full or the wait runs out."""
+        if self.max_concurrency <= 0:
+            return Slot(None)
+        priority = _PRIORITY.get() if priority is None else priority
+        label = _PRIORITY_NAMES[priority]
+        if self.active < self.max_concurrency and not self.waiting:
+            self.active += 1
+            ADMISSIONS.inc(upstream=self.upstream, priority=label, result="admitted")
+            WAIT_SECONDS.observe(0.0, upstream=self.upstream, priority=label)
+            return Slot(self)
+        if self.waiting >= self.max_queue and not self._displace(priority):
+            raise self._reject(priority, "queue_full")
+
+        fut = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        heapq.heappush(self._waiters, (priority, self._seq, fut))
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(fut, self.max_wait)
+        except BaseException as e:
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                self._release(None)  # handed a slot just as the caller gave up: pass it on
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject(priority, "timeout") from None
+            raise
+        finally:
+            self.waiting -= 1
+        ADMISSIONS.inc(upstream=self.upstream, priority=label, result="admitted")
+        WAIT_SECONDS.observe(time.perf_counter() - start, upstream=self.upstream, priority=label)
+        return Slot(self)
+
+    def _release(self, held: Optional[float]) -> None:
+        if held is not None:
+            self._hold = 0.8 * self._hold + 0.2 * held
+        # Hand the slot straight to the next live waiter so newcomers can't jump the queue
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[int] = None) -> AsyncIterator[None]:
+        slot = await self.acquire(priority)
+        try:
+            yield
+        finally:
+            slot.release()
+
+
+# Per-upstream limits (override via env)
+OPENAI_ADMISSION = AdmissionQueue(
+    "openai",
+    max_concurrency=int(os.getenv("ADMIT_OPENAI_CONCURRENCY", "32")),
+    max_queue=int(os.getenv("ADMIT_OPENAI_QUEUE", "64")),
+    max_wait=float(os.getenv("ADMIT_OPENAI_WAIT", "10")),
+)
+OLLAMA_ADMISSION = AdmissionQueue(
+    "ollama",
+    max_concurrency=int(os.getenv("ADMIT_OLLAMA_CONCURRENCY", "16")),
+    max_queue=int(os.getenv("ADMIT_OLLAMA_QUEUE", "64")),
+    max_wait=float(os.getenv("ADMIT_OLLAMA_WAIT", "15")),
+)
@@ -0,0 +1,235 @@
+# utils/cache.py
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from utils.metrics import counter, gauge
+
+# result=hit_memory|hit_disk|miss|coalesced, labelled by cache name
+CACHE_REQUESTS = counter("cache_requests_total", "Cache lookups by cache and result")
+CACHE_HIT_RATIO = gauge("cache_hit_ratio", "Share of lookups served from any cache tier")
+
+_MISSING = object()
+
+
+class TTLCache:
+    """In-memory LRU with a per-entry TTL (seconds, None = no expiry)."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SqliteStore:
+    """
+    Optional on-disk tier (values must be JSON-serialisable).
+    Survives restarts; keeps at most `max_rows`, dropping least recently used.
+    Reads never commit: access times are buffered and written with the next
+    set() (or every `touch_batch` hits). Blocking; async callers go through
+    TieredCache, which runs it in a worker thread.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = 86400, max_rows: int = 100_000, touch_batch: int = 256):
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.touch_batch = touch_batch
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._touched: Dict[str, float] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL, used_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return default
+            value, expires_at = row
+            if expires_at is not None and expires_at < now:
+                return default  # removed by the next _prune()
+            self._touched[key] = now
+            if len(self._touched) >= self.touch_batch:
+                self._flush_touched()
+                self._conn.commit()
+        return json.loads(value)
+
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self._conn.executemany("UPDATE cache SET used_at = ? WHERE key = ?", [(t, k) for k, t in self._touched.items()])
+            self._touched.clear()
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            self._touched.pop(key, None)
+            self._flush_touched()
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                self._prune(now)
+            self._conn.commit()
+
+    def _prune(self, now: float) -> None:
+        self._conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+        self._conn.execute(
+            "DELETE FROM cache WHERE key IN ("
+            " SELECT key FROM cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
+
+
+class TieredCache:
+    """
+    Memory tier in front of an optional disk tier, with hit/miss metrics.
+    get_or_compute() coalesces concurrent misses for the same key.
+    """
+
+    def __init__(self, name: str, memory: TTLCache, disk: Optional[SqliteStore] = None):
+        self.name = name
+        self.memory = memory
+        self.disk = disk
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        CACHE_HIT_RATIO.set_function(self.hit_ratio, cache=name)
+
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return round(self.hits / total, 4) if total else 0.0
+
+    def _count(self, result: str) -> None:
+        CACHE_REQUESTS.inc(cache=self.name, result=result)
+        if result == "miss":
+            self.misses += 1
+        else:
+            self.hits += 1
+
+    def _from_memory(self, key: str) -> Any:
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            self._count("hit_memory")
+        return value
+
+    def _record_disk(self, key: str, value: Any) -> Any:
+        if value is _MISSING:
+            self._count("miss")
+        else:
+            self._count("hit_disk")
+            self.memory.set(key, value)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Blocking lookup (sync callers); async code uses get_or_compute()."""
+        value = self._from_memory(key)
+        if value is _MISSING:
+            value = self._record_disk(key, self.disk.get(key, _MISSING) if self.disk is not None else _MISSING)
+        return default if value is _MISSING else value
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    async def _aget_disk(self, key: str) -> Any:
+        # sqlite reads/commits block on disk: keep them off the event loop
+        if self.disk is None:
+            return self._record_disk(key, _MISSING)
+        return self._record_disk(key, await asyncio.to_thread(self.disk.get, key, _MISSING))
+
+    async def _aset(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value = self._from_memory(key)
+        if value is not _MISSING:
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self._count("miss")
+            CACHE_REQUESTS.inc(cache=self.name, result="coalesced")
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The leader was cancelled (client went away); compute ourselves
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            # The disk lookup runs under the in-flight entry, so concurrent misses share it
+            value = await self._aget_disk(key)
+            if value is _MISSING:
+                value = await compute()
+                await self._aset(key, value)
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody else was waiting
+            raise
+        except BaseException:
+            fut.cancel()
+            raise
+        else:
+            fut.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
@@ -0,0 +1,182 @@
+# utils/metrics.py
+import bisect
+import threading
+from typing import Callable, Dict, List, Tuple, Union
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _key(labels: Dict[str, str]) -> _LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _label_text(key: _LabelKey) -> str:
+    return ",".join(f"{k}={v}" for k, v in key) or "total"
+
+
+class Counter:
+    """Monotonic counter with optional labels, e.g. DETECT_PATH.inc(path="json")."""
+
+    def __init__(self, name: str, help: str = ""):
+        self.name = name
+        self.help = help
+        self._values: Dict[_LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_key(labels), 0)
+
+    def items(self) -> List[Tuple[_LabelKey, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+    def snapshot(self) -> Dict[str, float]:
+        return {_label_text(key): val for key, val in self.items()}
+
+
+class Gauge(Counter):
+    """Point-in-time value; either set() directly or computed on read via set_function()."""
+
+    def __init__(self, name: str, help: str = ""):
+        super().__init__(name, help)
+        self._functions: Dict[_LabelKey, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[_key(labels)] = value
+
+    def set_function(self, fn: Callable[[], float], **labels) -> None:
+        with self._lock:
+            self._functions[_key(labels)] = fn
+
+    def items(self) -> List[Tuple[_LabelKey, float]]:
+        with self._lock:
+            functions = list(self._functions.items())
+        for key, fn in functions:
+            self._values[key] = fn()
+        return super().items()
+
+
+# Seconds; wide enough for both a cache hit and a cold 120 s Ollama call
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, e.g. STAGE_SECONDS.observe(0.2, stage="llm")."""
+
+    def __init__(self, name: str, help: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket (+Inf last)..., sum]
+        self._values: Dict[_LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 2)
+            row[i] += 1
+            row[-1] += value
+
+    def items(self) -> List[Tuple[_LabelKey, List[float]]]:
+        with self._lock:
+            return [(key, list(row)) for key, row in self._values.items()]
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for key, row in self.items():
+            count = sum(row[:-1])
+            out[_label_text(key)] = {
+                "count": count,
+                "sum": round(row[-1], 6),
+                "mean_ms": round(row[-1] / count * 1000, 2) if count else None,
+            }
+        return out
+
+
+Metric = Union[Counter, Histogram]
+
+_REGISTRY: Dict[str, Metric] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _get_or_create(cls, name: str, help: str, **kwargs):
+    with _REGISTRY_LOCK:
+        metric = _REGISTRY.get(name)
+        if metric is None:
+            metric = _REGISTRY[name] = cls(name, help, **kwargs)
+        return metric
+
+
+def counter(name: str, help: str = "") -> Counter:
+    """Get or create a process-wide counter."""
+    return _get_or_create(Counter, name, help)
+
+
+def gauge(name: str, help: str = "") -> Gauge:
+    """Get or create a process-wide gauge."""
+    return _get_or_create(Gauge, name, help)
+
+
+def histogram(name: str, help: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    """Get or create a process-wide histogram."""
+    return _get_or_create(Histogram, name, help, buckets=buckets)
+
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+    """All metrics as plain dicts (served on /metrics)."""
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY.values())
+    return {m.name: m.snapshot() for m in metrics}
+
+
+# ---------- Prometheus text format ----------
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(key: _LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _le(bound: float) -> str:
+    return repr(float(bound))
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY.values())
+    lines = []
+    for m in metrics:
+        kind = "histogram" if isinstance(m, Histogram) else "gauge" if isinstance(m, Gauge) else "counter"
+        if m.help:
+            lines.append(f"# HELP {m.name} {_escape(m.help)}")
+        lines.append(f"# TYPE {m.name} {kind}")
+        if isinstance(m, Histogram):
+            for key, row in m.items():
+                cumulative = 0
+                for bound, n in zip(m.buckets, row):
+                    cumulative += n
+                    lines.append(f"{m.name}_bucket{_labels(key, (('le', _le(bound)),))} {cumulative}")
+                cumulative += row[len(m.buckets)]
+                lines.append(f"{m.name}_bucket{_labels(key, (('le', '+Inf'),))} {cumulative}")
+                lines.append(f"{m.name}_sum{_labels(key)} {row[-1]}")
+                lines.append(f"{m.name}_count{_labels(key)} {cumulative}")
+        else:
+            for key, value in m.items():
+                lines.append(f"{m.name}{_labels(key)} {value}")
+    return "\n".join(lines) + "\n"
@@ -20,4 +20,21 @@ PHQ9_QUESTIONS = [
     { "id": 7, "question": "Trouble concentrating on things, such as reading the newspaper or watching TV", "meaning": "Is it hard to focus on simple tasks like reading or watching shows?" },
     { "id": 8, "question": "Moving or speaking slowly, or being fidgety or restless", "meaning": "Do you notice that you’ve been physically restless or unusually slow?" },
     { "id": 9, "question": "Thoughts that you would be better off dead or of hurting yourself", "meaning": "Have you had any thoughts about harming yourself or not wanting to live?" }
-]
\ No newline at end of file
+]
+
+# Standard PHQ-9 severity bands: (min_score, max_score, level)
+PHQ9_LEVELS = [
+    (0, 4, "Minimal"),
+    (5, 9, "Mild"),
+    (10, 14, "Moderate"),
+    (15, 19, "Moderately Severe"),
+    (20, 27, "Severe"),
+]
+
+
+def level_for_score(score: int) -> str:
+    """Map a total PHQ-9 score (0..27) to its severity level."""
+    for low, high, level in PHQ9_LEVELS:
+        if low <= score <= high:
+            return level
+    raise ValueError(f"PHQ-9 score out of range: {score}")
@@ -0,0 +1,80 @@
+# utils/tokens.py
+from functools import lru_cache
+from typing import List
+
+# Fallback when tiktoken is not installed: ~4 characters per token for English
+_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # The BPE file is downloaded on first use; offline hosts use the estimate
+        print(f"tiktoken unavailable ({e}); estimating token counts")
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    if not text:
+        return 0
+    enc = _encoding(model)
+    if enc is None:
+        return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, budget: int, model: str = "gpt-3.5-turbo") -> str:
+    """Keep the start of `text` within `budget` tokens."""
+    if budget <= 0:
+        return ""
+    enc = _encoding(model)
+    if enc is None:
+        return text[: budget * _CHARS_PER_TOKEN]
+    tokens = enc.encode(text, disallowed_special=())
+    return text if len(tokens) <= budget else enc.decode(tokens[:budget])
+
+
+def fit_recent_lines(lines: List[str], budget: int, model: str = "gpt-3.5-turbo") -> List[str]:
+    """The most recent lines that fit in `budget` tokens, in their original order."""
+    kept: List[str] = []
+    used = 0
+    for line in reversed(lines):
+        cost = count_tokens(line, model) + 1  # + newline
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    kept.reverse()
+    return kept
+
+
+def chunk_lines(lines: List[str], budget: int, model: str = "gpt-3.5-turbo") -> List[List[str]]:
+    """
+    Consecutive runs of `lines`, oldest first, that each fit in `budget`
+    tokens. A single line over the budget is cut down and sent on its own,
+    so every input line lands in exactly one chunk.
+    """
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    used = 0
+    for line in lines:
+        cost = count_tokens(line, model) + 1  # + newline
+        if cost > budget:
+            line, cost = truncate_to_tokens(line, budget - 1, model), budget
+        if current and used + cost > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(line)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks